@@ -0,0 +1,294 @@
+"""
+Benchmark Suite
+Reproducible throughput and latency measurements for ingestion and query paths
+
+Usage:
+    python benchmark.py --documents 200 --queries 200 --output bench.json
+    python benchmark.py --embeddings hash --compare bench_before.json
+"""
+
+import os
+import re
+import json
+import time
+import random
+import argparse
+import hashlib
+import tempfile
+import subprocess
+from pathlib import Path
+from datetime import datetime
+from typing import List, Dict, Any
+import numpy as np
+
+# Hermetic by default: no database needed
+os.environ.setdefault("VECTOR_STORE_BACKEND", "memory")
+
+from document_processor import DocumentProcessor
+from embeddings import create_embedding_generator
+from vector_store import VectorStore
+from rag_engine import RAGEngine
+
+SAMPLE_DIR = Path(__file__).resolve().parent.parent / "tests" / "sample_documents"
+
+
+class HashingEmbeddingGenerator:
+    """Deterministic bag-of-words hashing embedder (no model download)"""
+
+    def __init__(self, dimension: int = 384):
+        self.dimension = dimension
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for word in re.findall(r"\w+", text.lower()):
+            digest = int(hashlib.md5(word.encode()).hexdigest()[:8], 16)
+            vector[digest % self.dimension] += 1.0 if digest & 1 else -1.0
+        return vector
+
+    def generate_embedding(self, text: str) -> List[float]:
+        return self._embed(text).tolist()
+
+    def generate_embeddings_batch(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text).tolist() for text in texts]
+
+    def get_embedding_dimension(self) -> int:
+        return self.dimension
+
+
+class StubInferenceClient:
+    """Stands in for the Hugging Face InferenceClient with a fixed latency"""
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency_ms = latency_ms
+
+    def text_generation(self, prompt: str, **kwargs) -> str:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        return "This is a stubbed answer used for benchmarking. [Document: benchmark, Section: 0]"
+
+
+def generate_corpus(directory: Path, num_documents: int, sentences_per_document: int, seed: int) -> List[Path]:
+    """
+    Write a synthetic corpus built from the sample documents
+
+    Args:
+        directory: Output directory
+        num_documents: Number of documents to generate
+        sentences_per_document: Sentences sampled into each document
+        seed: Random seed
+
+    Returns:
+        Paths of the generated .txt files
+    """
+    sentences = []
+    for path in sorted(SAMPLE_DIR.glob("*")):
+        text = path.read_text(encoding="utf-8")
+        sentences.extend(s.strip() for s in re.split(r"(?<=[.!?])\s+|\n+", text) if len(s.strip()) > 20)
+
+    rng = random.Random(seed)
+    paths = []
+    for i in range(num_documents):
+        body = []
+        for j in range(sentences_per_document):
+            body.append(rng.choice(sentences))
+            if j % 6 == 5:
+                body.append("\n")
+        path = directory / f"synthetic_{i:05d}.txt"
+        path.write_text(" ".join(body), encoding="utf-8")
+        paths.append(path)
+    return paths
+
+
+def percentiles(samples_ms: List[float]) -> Dict[str, float]:
+    """p50/p95/p99 and mean of latency samples"""
+    if not samples_ms:
+        return {}
+    values = np.array(samples_ms)
+    return {
+        "count": len(values),
+        "mean_ms": float(values.mean()),
+        "p50_ms": float(np.percentile(values, 50)),
+        "p95_ms": float(np.percentile(values, 95)),
+        "p99_ms": float(np.percentile(values, 99))
+    }
+
+
+def git_commit() -> str:
+    """Current commit hash, if available"""
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).resolve().parent,
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Run all benchmark stages
+
+    Args:
+        args: Parsed command-line arguments
+
+    Returns:
+        Benchmark report
+    """
+    processor = DocumentProcessor(
+        chunk_size=int(os.getenv("CHUNK_SIZE", "800")),
+        chunk_overlap=int(os.getenv("CHUNK_OVERLAP", "200"))
+    )
+    if args.embeddings == "hash":
+        embedder = HashingEmbeddingGenerator()
+    else:
+        embedder = create_embedding_generator()
+    store = VectorStore()
+    store.clear_all()
+
+    results: Dict[str, Any] = {}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = generate_corpus(Path(tmp), args.documents, args.sentences, args.seed)
+        total_bytes = sum(path.stat().st_size for path in paths)
+
+        # Stage 1: extraction + chunking
+        processed = []
+        start = time.perf_counter()
+        for path in paths:
+            processed.append((path.name, processor.process_document(str(path), "txt", path.name)))
+        process_seconds = time.perf_counter() - start
+
+    num_chunks = sum(len(chunks) for _, chunks in processed)
+    results["process_document"] = {
+        "documents": len(processed),
+        "chunks": num_chunks,
+        "documents_per_s": len(processed) / process_seconds,
+        "chunks_per_s": num_chunks / process_seconds,
+        "mb_per_s": total_bytes / 1e6 / process_seconds
+    }
+
+    # Stage 2: embeddings, one batch per document as in the upload path
+    embedded = []
+    start = time.perf_counter()
+    for name, chunks in processed:
+        embedded.append(embedder.generate_embeddings_batch([text for text, _ in chunks]))
+    embed_seconds = time.perf_counter() - start
+    results["generate_embeddings_batch"] = {
+        "chunks": num_chunks,
+        "chunks_per_s": num_chunks / embed_seconds
+    }
+
+    # Stage 3: storage, through the same record path as ingestion
+    start = time.perf_counter()
+    created_at = datetime.utcnow()
+    for doc_idx, ((name, chunks), embeddings) in enumerate(zip(processed, embedded)):
+        document_id = f"bench-{doc_idx:05d}"
+        store.store_chunk_records([
+            {
+                "chunk_id": f"{document_id}_chunk_{idx}",
+                "document_id": document_id,
+                "document_name": name,
+                "content": text,
+                "embedding": embedding,
+                "metadata": metadata,
+                "chunk_index": metadata["chunk_index"],
+                "total_chunks": metadata["total_chunks"],
+                "created_at": created_at
+            }
+            for idx, ((text, metadata), embedding) in enumerate(zip(chunks, embeddings))
+        ])
+    store_seconds = time.perf_counter() - start
+    results["store_chunk_records"] = {
+        "chunks": num_chunks,
+        "chunks_per_s": num_chunks / store_seconds
+    }
+
+    # Queries: sentences drawn from the corpus
+    rng = random.Random(args.seed + 1)
+    all_texts = [text for _, chunks in processed for text, _ in chunks]
+    questions = []
+    for _ in range(args.queries):
+        words = rng.choice(all_texts).split()
+        offset = rng.randrange(max(1, len(words) - 12))
+        questions.append(" ".join(words[offset:offset + 12]))
+    query_vectors = [embedder.generate_embedding(q) for q in questions]
+
+    # Stage 4: similarity_search (first call loads the index, measured separately)
+    start = time.perf_counter()
+    store.similarity_search(query_vectors[0], top_k=args.top_k)
+    results["index_load_ms"] = (time.perf_counter() - start) * 1000
+
+    latencies = []
+    for vector in query_vectors:
+        start = time.perf_counter()
+        store.similarity_search(vector, top_k=args.top_k)
+        latencies.append((time.perf_counter() - start) * 1000)
+    results["similarity_search"] = percentiles(latencies)
+
+    # Stage 5: end-to-end RAGEngine.query with a stubbed LLM
+    engine = RAGEngine(embedding_generator=embedder, vector_store=store)
+    engine.client = StubInferenceClient(args.llm_latency_ms)
+    engine.min_score = 0.0
+
+    latencies = []
+    for question in questions:
+        start = time.perf_counter()
+        engine.query(question, top_k=args.top_k)
+        latencies.append((time.perf_counter() - start) * 1000)
+    results["rag_query"] = percentiles(latencies)
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat(),
+        "config": {
+            "documents": args.documents,
+            "sentences_per_document": args.sentences,
+            "queries": args.queries,
+            "top_k": args.top_k,
+            "seed": args.seed,
+            "embeddings": args.embeddings,
+            "llm_latency_ms": args.llm_latency_ms,
+            "backend": os.getenv("VECTOR_STORE_BACKEND")
+        },
+        "results": results
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any]):
+    """Print relative changes against a previous report"""
+    print(f"\n📊 {baseline.get('commit')} -> {report.get('commit')}")
+    for stage, metrics in report["results"].items():
+        before = baseline["results"].get(stage)
+        if not isinstance(metrics, dict) or not isinstance(before, dict):
+            continue
+        for name, value in metrics.items():
+            if name in before and before[name]:
+                change = (value - before[name]) / before[name] * 100
+                print(f"  {stage}.{name}: {before[name]:.2f} -> {value:.2f} ({change:+.1f}%)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark ingestion and query paths")
+    parser.add_argument("--documents", type=int, default=100, help="Synthetic documents to generate")
+    parser.add_argument("--sentences", type=int, default=120, help="Sentences per document")
+    parser.add_argument("--queries", type=int, default=200, help="Queries to time")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--embeddings", choices=["model", "hash"], default="model",
+                        help="Configured embedding model, or a hashing embedder for hermetic runs")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="Simulated LLM latency")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="Previous results file to compare against")
+    args = parser.parse_args()
+
+    report = run_benchmark(args)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report["results"], indent=2))
+    print(f"💾 Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(report, json.load(f))
@@ -0,0 +1,294 @@
+"""
+Bulk Indexer
+Offline indexing of a directory tree with parallel extraction and resumable checkpoints
+
+Usage:
+    python bulk_index.py /mnt/share/handbooks --workers 8
+    python bulk_index.py /mnt/share/handbooks --checkpoint handbooks.checkpoint.json
+    python bulk_index.py /mnt/share/acme --namespace acme
+"""
+
+import os
+import json
+import time
+import uuid
+import argparse
+from pathlib import Path
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Iterator, Tuple
+
+from models import Document, DocumentType, ProcessingStatus, DEFAULT_NAMESPACE
+from document_processor import DocumentProcessor, validate_file_type
+from embeddings import create_embedding_generator
+from vector_store import VectorStore
+from ingestion import IngestionPipeline
+from sentence_index import SentenceIndex
+
+# Per-process DocumentProcessor, created by _init_worker
+_processor: Optional[DocumentProcessor] = None
+
+
+def _init_worker(chunk_size: int, chunk_overlap: int):
+    global _processor
+    _processor = DocumentProcessor(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+
+def _process_file(path: str, file_type: str, filename: str):
+    """Extract and chunk one file in a worker process"""
+    try:
+        return _processor.process_document(path, file_type, filename)
+    except Exception as e:
+        # Library exceptions are not always picklable
+        return ValueError(f"{type(e).__name__}: {e}")
+
+
+def discover_files(root: Path) -> List[Tuple[Path, str]]:
+    """
+    Find supported documents below a directory
+
+    Args:
+        root: Directory to walk
+
+    Returns:
+        Sorted list of (path, file type)
+    """
+    files = []
+    for path in sorted(root.rglob("*")):
+        if not path.is_file() or path.name.startswith("."):
+            continue
+        try:
+            files.append((path, validate_file_type(path.name)))
+        except ValueError:
+            continue
+    return files
+
+
+def document_id_for(relative_path: str, stat: os.stat_result, namespace: str = DEFAULT_NAMESPACE) -> str:
+    """Stable document ID, so a resumed run overwrites rather than duplicates"""
+    key = f"{relative_path}:{stat.st_size}:{stat.st_mtime_ns}"
+    if namespace != DEFAULT_NAMESPACE:
+        # The same tree indexed into two namespaces must not share IDs
+        key = f"{namespace}/{key}"
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, key))
+
+
+class Checkpoint:
+    """JSON record of the files that are fully indexed (or failed)"""
+
+    def __init__(self, path: Path, save_every: int = 50):
+        """
+        Load or start a checkpoint
+
+        Args:
+            path: Checkpoint file
+            save_every: Write the file after this many updates
+        """
+        self.path = path
+        self.save_every = save_every
+        self._unsaved = 0
+        self.resumed = path.exists()
+        if self.resumed:
+            with open(path, "r", encoding="utf-8") as f:
+                self.data = json.load(f)
+        else:
+            self.data = {"completed": {}, "failed": {}}
+
+    def is_done(self, relative_path: str, document_id: str, retry_failed: bool) -> bool:
+        """True if the file (in its current version) needs no work"""
+        entry = self.data["completed"].get(relative_path)
+        if entry and entry["document_id"] == document_id:
+            return True
+        entry = self.data["failed"].get(relative_path)
+        return bool(entry and entry["document_id"] == document_id and not retry_failed)
+
+    def previous_document_id(self, relative_path: str) -> Optional[str]:
+        """Document ID the file was last indexed (or failed) under, if any"""
+        entry = self.data["completed"].get(relative_path) or self.data["failed"].get(relative_path)
+        return entry["document_id"] if entry else None
+
+    def record(self, relative_path: str, document_id: str, status: ProcessingStatus, total_chunks: int, error: Optional[str]):
+        """Record a finished file"""
+        entry = {"document_id": document_id, "at": datetime.utcnow().isoformat()}
+        if status == ProcessingStatus.COMPLETED:
+            self.data["failed"].pop(relative_path, None)
+            self.data["completed"][relative_path] = {**entry, "chunks": total_chunks}
+        else:
+            self.data["failed"][relative_path] = {**entry, "error": error}
+
+        self._unsaved += 1
+        if self._unsaved >= self.save_every:
+            self.save()
+
+    def save(self):
+        """Atomically write the checkpoint"""
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f)
+        os.replace(tmp_path, self.path)
+        self._unsaved = 0
+
+
+class CountingEmbeddingGenerator:
+    """Counts the embeddings produced by another generator"""
+
+    def __init__(self, generator):
+        self.generator = generator
+        self.count = 0
+
+    def generate_embeddings_batch(self, texts: List[str]) -> List[List[float]]:
+        embeddings = self.generator.generate_embeddings_batch(texts)
+        self.count += len(embeddings)
+        return embeddings
+
+    def __getattr__(self, name):
+        return getattr(self.generator, name)
+
+
+class Progress:
+    """Periodic throughput report"""
+
+    def __init__(self, total_files: int, report_every: float):
+        self.total_files = total_files
+        self.report_every = report_every
+        self.start = time.perf_counter()
+        self.last_report = self.start
+        self.files = 0
+        self.failed = 0
+        self.chunks = 0
+
+    def maybe_report(self, embeddings: int, force: bool = False):
+        now = time.perf_counter()
+        if not force and now - self.last_report < self.report_every:
+            return
+        self.last_report = now
+        elapsed = max(now - self.start, 1e-9)
+        print(
+            f"📈 {self.files}/{self.total_files} files ({self.failed} failed) | "
+            f"{self.files / elapsed:.1f} files/s, {self.chunks / elapsed:.1f} chunks/s, "
+            f"{embeddings / elapsed:.1f} embeddings/s"
+        )
+
+
+def run_bulk_index(args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Index every supported file below args.root
+
+    Args:
+        args: Parsed command-line arguments
+
+    Returns:
+        Summary counts
+    """
+    root = Path(args.root).resolve()
+    checkpoint = Checkpoint(Path(args.checkpoint or f"{root.name}.checkpoint.json"))
+
+    # Decide what is left to do
+    todo = []
+    stale = []
+    for path, file_type in discover_files(root):
+        relative_path = path.relative_to(root).as_posix()
+        document_id = document_id_for(relative_path, path.stat(), args.namespace)
+        if not checkpoint.is_done(relative_path, document_id, args.retry_failed):
+            todo.append((path, file_type, relative_path, document_id))
+            previous_id = checkpoint.previous_document_id(relative_path)
+            if previous_id is not None and previous_id != document_id:
+                # The file changed since it was indexed: its old version must not stay searchable
+                stale.append((relative_path, previous_id))
+
+    print(f"📂 {len(todo)} files to index under {root}" + (" (resuming)" if checkpoint.resumed else ""))
+    if not todo:
+        return {"files": 0}
+
+    vector_store = VectorStore()
+    for relative_path, previous_id in stale:
+        if vector_store.delete_document(previous_id, args.namespace):
+            print(f"🗑️  Deleted the previous version of {relative_path}")
+    embedder = CountingEmbeddingGenerator(create_embedding_generator())
+    pipeline = IngestionPipeline(
+        DocumentProcessor(args.chunk_size, args.chunk_overlap), embedder, vector_store,
+        sentence_index=SentenceIndex(vector_store.backend, embedder)
+    )
+    if args.embed_batch_size:
+        pipeline.embed_batch_size = args.embed_batch_size
+
+    progress = Progress(len(todo), args.report_every)
+    relative_paths = {document_id: relative_path for _, _, relative_path, document_id in todo}
+
+    def on_status(document_id: str, status: ProcessingStatus, total_chunks: int, error: Optional[str]):
+        if status not in (ProcessingStatus.COMPLETED, ProcessingStatus.FAILED):
+            return
+        checkpoint.record(relative_paths[document_id], document_id, status, total_chunks, error)
+        progress.files += 1
+        progress.failed += status == ProcessingStatus.FAILED
+        progress.maybe_report(embedder.count)
+
+    def processed() -> Iterator[Tuple[str, str, Any]]:
+        with ProcessPoolExecutor(
+            max_workers=args.workers,
+            initializer=_init_worker,
+            initargs=(args.chunk_size, args.chunk_overlap)
+        ) as executor:
+            # Bounded window of in-flight files keeps memory flat on large trees
+            window = deque()
+            queue = iter(todo)
+            for item in queue:
+                window.append((item, executor.submit(_process_file, str(item[0]), item[1], item[0].name)))
+                if len(window) >= args.workers * 4:
+                    break
+
+            while window:
+                (path, file_type, relative_path, document_id), future = window.popleft()
+                next_item = next(queue, None)
+                if next_item is not None:
+                    window.append((next_item, executor.submit(
+                        _process_file, str(next_item[0]), next_item[1], next_item[0].name
+                    )))
+
+                chunks = future.result()
+                vector_store.store_document(Document(
+                    document_id=document_id,
+                    namespace=args.namespace,
+                    filename=path.name,
+                    file_type=DocumentType(file_type),
+                    file_size=path.stat().st_size,
+                    status=ProcessingStatus.PROCESSING
+                ))
+                # An interrupted run (even one that never saved its checkpoint)
+                # may have stored part of this document under the same ID
+                vector_store.remove_document_chunks(document_id, args.namespace)
+                if not isinstance(chunks, Exception):
+                    progress.chunks += len(chunks)
+                yield document_id, path.name, chunks
+
+    try:
+        pipeline.ingest_processed(processed(), on_status, args.namespace)
+    finally:
+        checkpoint.save()
+
+    progress.maybe_report(embedder.count, force=True)
+    return {
+        "files": progress.files,
+        "failed": progress.failed,
+        "chunks": progress.chunks,
+        "embeddings": embedder.count,
+        "seconds": time.perf_counter() - progress.start
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index a directory tree without going through the API")
+    parser.add_argument("root", help="Directory to index")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Extraction processes")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: <root name>.checkpoint.json)")
+    parser.add_argument("--retry-failed", action="store_true", help="Retry files that failed in a previous run")
+    parser.add_argument("--embed-batch-size", type=int, help="Chunks per embedding batch (default: INGEST_EMBED_BATCH_SIZE)")
+    parser.add_argument("--chunk-size", type=int, default=int(os.getenv("CHUNK_SIZE", "800")))
+    parser.add_argument("--chunk-overlap", type=int, default=int(os.getenv("CHUNK_OVERLAP", "200")))
+    parser.add_argument("--report-every", type=float, default=5.0, help="Seconds between throughput reports")
+    parser.add_argument("--namespace", default=DEFAULT_NAMESPACE, help="Namespace to index into")
+    args = parser.parse_args()
+
+    summary = run_bulk_index(args)
+    print(json.dumps(summary, indent=2))
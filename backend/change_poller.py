@@ -0,0 +1,50 @@
+"""
+Change Poller Module
+Background polling of the change log, so every worker sees the others' writes
+"""
+
+import os
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class ChangePoller:
+    """Daemon thread that runs VectorStore.poll_changes() every INDEX_POLL_INTERVAL_MS"""
+
+    def __init__(self, vector_store):
+        """
+        Initialize the poller
+
+        Args:
+            vector_store: VectorStore to keep up to date
+        """
+        self.vector_store = vector_store
+        # 0 disables polling (single worker)
+        self.interval = float(os.getenv("INDEX_POLL_INTERVAL_MS", "1000")) / 1000
+
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the background thread"""
+        if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="change-poller", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background thread after the current poll"""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.vector_store.poll_changes()
+            except Exception as e:
+                # Nothing is marked as seen, so the next poll retries
+                print(f"⚠️  Change poll failed: {e}")
@@ -0,0 +1,179 @@
+"""
+Chat History Module
+Bounded, session-scoped chat history with a write-through ring buffer
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict, deque
+from typing import List, Dict, Any, Optional, Tuple
+from dotenv import load_dotenv
+
+from models import ChatMessage
+from store_backends import VectorStoreBackend
+
+load_dotenv()
+
+# Fields of a stored message record that are returned to clients
+MESSAGE_FIELDS = tuple(ChatMessage.model_fields)
+
+
+class ChatHistoryStore:
+    """
+    Per-session chat history
+
+    Messages are persisted through the storage backend (TTL-expiring in
+    MongoDB) and the most recent ones of active sessions are kept in
+    bounded ring buffers. At most once per CHAT_HISTORY_CHECK_SECONDS a
+    buffer's newest sequence numbers are compared with the backend's, and
+    the buffer is reloaded if another worker wrote since; in between it
+    is served without a database round trip.
+    """
+
+    def __init__(self, backend: VectorStoreBackend):
+        """
+        Initialize the chat history store
+
+        Args:
+            backend: Storage backend that persists the messages
+        """
+        self.backend = backend
+        self.buffer_size = int(os.getenv("CHAT_HISTORY_BUFFER_SIZE", "100"))
+        self.max_sessions = int(os.getenv("CHAT_HISTORY_MAX_SESSIONS", "1000"))
+        # How long a buffer is trusted before it is checked against the backend
+        self.check_seconds = float(os.getenv("CHAT_HISTORY_CHECK_SECONDS", "5"))
+
+        # Guards the buffers and bookkeeping below; never held across a backend call
+        self._lock = threading.Lock()
+        # Striped per-session locks order appends within a session, so
+        # sessions write to the backend concurrently
+        self._session_locks = [threading.Lock() for _ in range(64)]
+        # session_id -> deque of message records, least recently used first
+        self._buffers: "OrderedDict[str, deque]" = OrderedDict()
+        # session_id -> (when its buffer was last known current, messages appended since)
+        self._checked: Dict[str, Tuple[float, int]] = {}
+
+    def _session_lock(self, session_id: str) -> threading.Lock:
+        return self._session_locks[hash(session_id) % len(self._session_locks)]
+
+    def _seed(self, session_id: str) -> deque:
+        """Load a session's most recent messages into a fresh ring buffer"""
+        records = self.backend.get_chat_messages(session_id, None, self.buffer_size)
+        buffer = deque(reversed(records), maxlen=self.buffer_size)
+        with self._lock:
+            self._buffers[session_id] = buffer
+            self._buffers.move_to_end(session_id)
+            self._checked[session_id] = (time.monotonic(), 0)
+            while len(self._buffers) > self.max_sessions:
+                evicted, _ = self._buffers.popitem(last=False)
+                self._checked.pop(evicted, None)
+        return buffer
+
+    def _current_buffer(self, session_id: str) -> deque:
+        """Get a session's ring buffer, reloading it if another worker wrote since the last check"""
+        with self._lock:
+            buffer = self._buffers.get(session_id)
+            if buffer is not None:
+                self._buffers.move_to_end(session_id)
+            checked_at, appended = self._checked.get(session_id, (None, 0))
+
+        if buffer is None:
+            return self._seed(session_id)
+        now = time.monotonic()
+        if checked_at is not None and now - checked_at < self.check_seconds:
+            return buffer
+
+        # The newest stored messages must be the buffer's tail, including the
+        # ones appended here since the last check (others may sit between them)
+        latest = self.backend.latest_chat_seqs(session_id, appended + 1)
+        with self._lock:
+            tail = [record["seq"] for record in reversed(buffer)][:appended + 1]
+        if latest != tail:
+            return self._seed(session_id)
+        with self._lock:
+            self._checked[session_id] = (now, 0)
+        return buffer
+
+    def append(self, session_id: str, messages: List[ChatMessage]):
+        """
+        Append messages to a session
+
+        Args:
+            session_id: Chat session ID
+            messages: Messages in chronological order
+        """
+        with self._session_lock(session_id):
+            buffer = self._current_buffer(session_id)
+
+            with self._lock:
+                # Nanosecond sequence numbers, strictly increasing within the session
+                seq = time.time_ns()
+                if buffer and buffer[-1]["seq"] >= seq:
+                    seq = buffer[-1]["seq"] + 1
+
+            records = []
+            for offset, message in enumerate(messages):
+                record = message.model_dump()
+                record.update(session_id=session_id, seq=seq + offset)
+                records.append(record)
+
+            self.backend.append_chat_messages(records)
+            with self._lock:
+                buffer.extend(records)
+                checked_at, appended = self._checked.get(session_id, (None, 0))
+                self._checked[session_id] = (checked_at, appended + len(records))
+
+    def get_page(self, session_id: str, cursor: Optional[int] = None, limit: int = 50) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """
+        Get a page of a session's history
+
+        Args:
+            session_id: Chat session ID
+            cursor: Return messages older than this sequence number (None = newest)
+            limit: Maximum number of messages
+
+        Returns:
+            Tuple of (messages in chronological order, cursor of the next older page or None);
+            messages are plain dicts in ChatMessage shape, ready to serialize
+        """
+        buffer = self._current_buffer(session_id)
+        with self._lock:
+            records = [record for record in buffer if cursor is None or record["seq"] < cursor]
+            # A buffer that never filled up holds the session's whole history
+            complete = len(buffer) < buffer.maxlen
+
+        if len(records) > limit or complete:
+            has_more = len(records) > limit
+            records = records[-limit:]
+        else:
+            # Page reaches past the buffer: read it from the backend, plus one
+            # extra record to learn whether an older page exists
+            records = self.backend.get_chat_messages(session_id, cursor, limit + 1)
+            has_more = len(records) > limit
+            records = list(reversed(records[:limit]))
+
+        # Records were validated as ChatMessage when appended
+        messages = [{field: record.get(field) for field in MESSAGE_FIELDS} for record in records]
+        next_cursor = records[0]["seq"] if has_more and records else None
+        return messages, next_cursor
+
+    def clear(self, session_id: Optional[str] = None):
+        """
+        Clear one session, or every session
+
+        Args:
+            session_id: Chat session ID (None clears all sessions)
+        """
+        if session_id is None:
+            with self._lock:
+                self._buffers.clear()
+                self._checked.clear()
+            self.backend.clear_chat_messages(None)
+            return
+
+        with self._session_lock(session_id):
+            with self._lock:
+                self._buffers.pop(session_id, None)
+                self._checked.pop(session_id, None)
+            self.backend.clear_chat_messages(session_id)
@@ -0,0 +1,79 @@
+"""
+Compactor Module
+Background removal of deleted documents' chunks and index rows
+"""
+
+import os
+import time
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class Compactor:
+    """Daemon thread that periodically runs VectorStore.compact_deleted(), merges vector segments, evicts idle indexes and writes index snapshots"""
+
+    def __init__(self, vector_store):
+        """
+        Initialize the compactor
+
+        Args:
+            vector_store: VectorStore to compact
+        """
+        self.vector_store = vector_store
+        self.interval = float(os.getenv("COMPACTION_INTERVAL_SECONDS", "30"))
+        self.batch_size = int(os.getenv("COMPACTION_BATCH_SIZE", "500"))
+        # Throttle between chunk batches so compaction does not starve requests
+        self.pause_seconds = float(os.getenv("COMPACTION_BATCH_PAUSE_MS", "50")) / 1000
+        self.snapshot_interval = float(os.getenv("INDEX_SNAPSHOT_INTERVAL_SECONDS", "300"))
+        self._last_snapshot = time.monotonic()
+
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the background thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="compactor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background thread after the current pass"""
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+
+    def wake(self):
+        """Run a pass now instead of waiting for the next interval"""
+        self._wake.set()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stopped.is_set():
+                break
+            try:
+                self.vector_store.compact_deleted(self.batch_size, self.pause_seconds)
+            except Exception as e:
+                # Tombstones stay in place, so the next pass retries
+                print(f"⚠️  Compaction failed: {e}")
+            self.vector_store.evict_idle_indexes()
+
+            try:
+                self.vector_store.merge_segments()
+            except Exception as e:
+                # Segments stay as they are; the next pass retries
+                print(f"⚠️  Segment merge failed: {e}")
+
+            if time.monotonic() - self._last_snapshot >= self.snapshot_interval:
+                self._last_snapshot = time.monotonic()
+                try:
+                    self.vector_store.snapshot_indexes()
+                except Exception as e:
+                    print(f"⚠️  Index snapshot failed: {e}")
@@ -0,0 +1,175 @@
+"""
+Context Builder Module
+Merges overlapping chunks and packs retrieved text into a token budget
+"""
+
+import os
+import re
+from typing import List, Dict, Any, Tuple
+import tiktoken
+from dotenv import load_dotenv
+
+from models import Citation
+
+load_dotenv()
+
+# Characters compared when aligning the overlap of two chunks
+_PROBE_CHARS = 64
+
+
+def merge_overlapping_text(previous: str, following: str) -> str:
+    """
+    Join two overlapping chunk texts without repeating the shared part
+
+    Args:
+        previous: Text of the earlier chunk
+        following: Text of the later chunk, starting inside the earlier one
+
+    Returns:
+        Combined text
+    """
+    # The later chunk usually starts inside the earlier one
+    probe = following[:_PROBE_CHARS]
+    position = previous.rfind(probe) if probe else -1
+    if position >= 0 and previous[position:] == following[:len(previous) - position]:
+        return previous[:position] + following
+
+    # The earlier chunk may have been cut back to a sentence boundary instead
+    tail = previous[-_PROBE_CHARS:]
+    position = following.find(tail) if tail else -1
+    if position >= 0:
+        return previous + following[position + len(tail):]
+
+    return previous + "\n" + following
+
+
+def _citation(result: Dict[str, Any]) -> Citation:
+    chunk = result["chunk"]
+    content = chunk["content"]
+    # Fields come typed from the store: skip per-field validation
+    return Citation.model_construct(
+        document_name=chunk["document_name"],
+        chunk_index=chunk["chunk_index"],
+        content_preview=content[:200] + "..." if len(content) > 200 else content,
+        relevance_score=result["score"]
+    )
+
+
+class ContextBuilder:
+    """
+    Builds the LLM context from retrieved chunks
+
+    Hits from the same document whose token spans (start_token/end_token
+    in the chunk metadata) overlap or touch are merged into one passage
+    with the overlap removed. Passages are then packed best-first into
+    the token budget, and only chunks that made it into the context are
+    cited.
+    """
+
+    def __init__(self, token_budget: int = None):
+        """
+        Initialize the context builder
+
+        Args:
+            token_budget: Maximum context tokens (defaults to RAG_CONTEXT_TOKEN_BUDGET)
+        """
+        self.token_budget = token_budget or int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET", "2000"))
+        # Same encoding the document processor chunks with
+        self.encoding = tiktoken.get_encoding("cl100k_base")
+
+    def merge(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Merge adjacent and overlapping hits of the same document
+
+        Args:
+            results: Search results ({"chunk", "score"})
+
+        Returns:
+            Passages with text, score (best member), document_name and members, best first
+        """
+        by_document: Dict[str, List[Dict[str, Any]]] = {}
+        for result in results:
+            by_document.setdefault(result["chunk"]["document_id"], []).append(result)
+
+        passages = []
+        for document_results in by_document.values():
+            document_results.sort(key=lambda r: (
+                r["chunk"].get("metadata", {}).get("start_token", r["chunk"]["chunk_index"]),
+                r["chunk"]["chunk_index"]
+            ))
+
+            current = None
+            for result in document_results:
+                metadata = result["chunk"].get("metadata", {})
+                start, end = metadata.get("start_token"), metadata.get("end_token")
+
+                mergeable = (
+                    current is not None and start is not None and current["end_token"] is not None
+                    and start <= current["end_token"]
+                )
+                if mergeable:
+                    current["text"] = merge_overlapping_text(current["text"], result["chunk"]["content"])
+                    current["end_token"] = max(current["end_token"], end)
+                    current["score"] = max(current["score"], result["score"])
+                    current["members"].append(result)
+                else:
+                    current = {
+                        "text": result["chunk"]["content"],
+                        "document_name": result["chunk"]["document_name"],
+                        "end_token": end,
+                        "score": result["score"],
+                        "members": [result]
+                    }
+                    passages.append(current)
+
+        passages.sort(key=lambda p: p["score"], reverse=True)
+        return passages
+
+    @staticmethod
+    def _format(number: int, passage: Dict[str, Any], members: List[Dict[str, Any]]) -> str:
+        """Label a passage with its source number, document and the sections it cites"""
+        sections = ", ".join(str(r["chunk"]["chunk_index"]) for r in members)
+        label = "Section" if len(members) == 1 else "Sections"
+        return f"[Source {number}] Document: {passage['document_name']}, {label}: {sections}\n{passage['text']}\n"
+
+    def build(self, results: List[Dict[str, Any]]) -> Tuple[str, List[Citation]]:
+        """
+        Build the prompt context and its citations
+
+        Args:
+            results: Search results ({"chunk", "score"}), best first
+
+        Returns:
+            Tuple of (context, citations of the chunks in the context)
+        """
+        context_parts = []
+        citations = []
+        seen_texts = set()
+        used_tokens = 0
+
+        for passage in self.merge(results):
+            # The same text can be indexed twice (e.g. a re-uploaded file)
+            fingerprint = re.sub(r"\s+", " ", passage["text"]).strip().lower()
+            if fingerprint in seen_texts:
+                continue
+            seen_texts.add(fingerprint)
+
+            members = passage["members"]
+            part = self._format(len(context_parts) + 1, passage, members)
+            tokens = self.encoding.encode(part)
+            remaining = self.token_budget - used_tokens
+            if len(tokens) > remaining:
+                if context_parts:
+                    continue  # A smaller, lower-scoring passage may still fit
+                # Always keep (the start of) the best passage, citing only the
+                # chunks whose text starts inside the part that is kept
+                kept = self.encoding.decode(tokens[:remaining])
+                members = [r for r in members if r["chunk"]["content"][:_PROBE_CHARS] in kept] or members[:1]
+                tokens = self.encoding.encode(self._format(len(context_parts) + 1, passage, members))[:remaining]
+                part = self.encoding.decode(tokens)
+
+            context_parts.append(part)
+            citations.extend(_citation(r) for r in members)
+            used_tokens += len(tokens)
+
+        return "\n\n".join(context_parts), citations
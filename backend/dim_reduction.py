@@ -0,0 +1,160 @@
+"""
+Dimensionality Reduction Module
+PCA projection or Matryoshka truncation of embeddings used for search
+"""
+
+import os
+import hashlib
+from datetime import datetime
+from typing import Dict, Any, Optional
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class EmbeddingReducer:
+    """Reduce embeddings to a configured dimension for scoring"""
+
+    def __init__(self, mode: str = None, target_dim: int = None):
+        """
+        Initialize the reducer
+
+        Args:
+            mode: "none", "pca" or "matryoshka" (defaults to EMBEDDING_REDUCTION)
+            target_dim: Reduced dimension (defaults to EMBEDDING_REDUCED_DIM)
+        """
+        self.mode = (mode or os.getenv("EMBEDDING_REDUCTION", "none")).lower()
+        self.target_dim = target_dim or int(os.getenv("EMBEDDING_REDUCED_DIM", "128"))
+
+        if self.mode not in ("none", "pca", "matryoshka"):
+            raise ValueError(f"Unsupported EMBEDDING_REDUCTION: {self.mode}")
+
+        # PCA parameters (set by fit() or load_record())
+        self.mean: Optional[np.ndarray] = None
+        self.components: Optional[np.ndarray] = None
+        # Set once stored chunks have vectors of this version (fit() or load_record())
+        self.version: Optional[str] = None
+
+    @property
+    def active(self) -> bool:
+        """True if search vectors are reduced (stored chunks must be re-projected first)"""
+        return self.version is not None
+
+    def fit(self, embeddings: np.ndarray):
+        """
+        Fit the projection over a sample of stored embeddings
+
+        Matryoshka truncation has nothing to fit; it only gets its version.
+
+        Args:
+            embeddings: Full-dimension embedding matrix (n x d)
+        """
+        if self.mode == "matryoshka":
+            self.version = f"matryoshka-{self.target_dim}"
+        if self.mode != "pca":
+            return
+
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if embeddings.shape[0] < self.target_dim:
+            raise ValueError(
+                f"Need at least {self.target_dim} embeddings to fit PCA, got {embeddings.shape[0]}"
+            )
+
+        self.mean = embeddings.mean(axis=0)
+        _, _, vt = np.linalg.svd(embeddings - self.mean, full_matrices=False)
+        self.components = vt[:self.target_dim].astype(np.float32)
+
+        digest = hashlib.sha1(self.components.tobytes()).hexdigest()[:12]
+        self.version = f"pca-{self.target_dim}-{digest}"
+
+    def transform(self, embeddings: np.ndarray) -> np.ndarray:
+        """
+        Project embeddings into the search space
+
+        Args:
+            embeddings: A vector (d,) or matrix (n x d)
+
+        Returns:
+            Reduced vector(s), unchanged if the reducer is inactive
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+
+        if self.mode == "matryoshka" and self.active:
+            return embeddings[..., :self.target_dim]
+        if self.mode == "pca" and self.components is not None:
+            return (embeddings - self.mean) @ self.components.T
+        return embeddings
+
+    def to_record(self) -> Dict[str, Any]:
+        """Serialize the projection for persistence"""
+        return {
+            "version": self.version,
+            "mode": self.mode,
+            "target_dim": self.target_dim,
+            "mean": self.mean.tolist() if self.mean is not None else None,
+            "components": self.components.tolist() if self.components is not None else None,
+            "fitted_at": datetime.utcnow()
+        }
+
+    def load_record(self, record: Dict[str, Any]):
+        """
+        Restore a persisted projection
+
+        Args:
+            record: Record produced by to_record()
+        """
+        if record["mode"] != self.mode or record["target_dim"] != self.target_dim:
+            return
+
+        if record.get("components") is not None:
+            self.mean = np.asarray(record["mean"], dtype=np.float32)
+            self.components = np.asarray(record["components"], dtype=np.float32)
+        self.version = record["version"]
+
+
+def _top_k(matrix: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest cosine scores per query"""
+    matrix = matrix / np.clip(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12, None)
+    queries = queries / np.clip(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12, None)
+    scores = queries @ matrix.T
+    return np.argpartition(-scores, k - 1, axis=1)[:, :k]
+
+
+def evaluate_recall(
+    corpus: np.ndarray,
+    queries: np.ndarray,
+    reducer: EmbeddingReducer,
+    k: int = 10
+) -> float:
+    """
+    Measure recall@k of reduced search against full-dimension search
+
+    Args:
+        corpus: Full-dimension embeddings searched
+        queries: Full-dimension embeddings held out of the fit, used as queries
+        reducer: Fitted reducer
+        k: Number of neighbours compared
+
+    Returns:
+        Mean fraction of the exact top-k found by the reduced search
+    """
+    corpus = np.asarray(corpus, dtype=np.float32)
+    queries = np.asarray(queries, dtype=np.float32)
+    if len(queries) == 0 or len(corpus) == 0:
+        return 1.0
+    k = min(k, len(corpus))
+
+    exact = _top_k(corpus, queries, k)
+    approx = _top_k(reducer.transform(corpus), reducer.transform(queries), k)
+
+    hits = [len(set(e) & set(a)) for e, a in zip(exact, approx)]
+    return float(np.mean(hits)) / k
+
+
+if __name__ == "__main__":
+    # Fit (or re-apply) the configured projection over the stored chunks
+    from vector_store import VectorStore
+
+    report = VectorStore().fit_projection()
+    print(report)
@@ -92,3 +92,22 @@ class EmbeddingGenerator:
         # all-MiniLM-L6-v2 produces 384-dimensional vectors
         return self.model.get_sentence_embedding_dimension()
 
+
+
+def create_embedding_generator(model_name: str = None):
+    """
+    Create the embedding generator selected by EMBEDDING_BACKEND
+    
+    Args:
+        model_name: Sentence transformer model to use
+        
+    Returns:
+        EmbeddingGenerator ("torch", default) or OnnxEmbeddingGenerator ("onnx")
+    """
+    backend = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+    
+    if backend == "onnx":
+        from embeddings_onnx import OnnxEmbeddingGenerator
+        return OnnxEmbeddingGenerator(model_name)
+    
+    return EmbeddingGenerator(model_name)
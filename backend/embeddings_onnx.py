@@ -0,0 +1,270 @@
+"""
+Embeddings Module - ONNX Runtime backend
+CPU-optimized embeddings with optional int8 dynamic quantization
+"""
+
+import os
+import json
+import inspect
+import time
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+import numpy as np
+import onnxruntime as ort
+from transformers import AutoTokenizer
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class OnnxEmbeddingGenerator:
+    """Generate embeddings with an ONNX export of the sentence transformer"""
+
+    def __init__(self, model_name: str = None, quantize: Optional[bool] = None):
+        """
+        Initialize ONNX embedding generator (exports the model on first use)
+
+        Args:
+            model_name: Sentence transformer model to use
+            quantize: Apply dynamic int8 quantization (defaults to ONNX_QUANTIZE)
+        """
+        self.model_name = model_name or os.getenv(
+            "EMBEDDING_MODEL",
+            "sentence-transformers/all-MiniLM-L6-v2"
+        )
+        if quantize is None:
+            quantize = os.getenv("ONNX_QUANTIZE", "true").lower() == "true"
+        self.quantize = quantize
+        self.batch_size = int(os.getenv("ONNX_BATCH_SIZE", "32"))
+
+        cache_dir = Path(os.getenv("ONNX_CACHE_DIR", "onnx_models"))
+        self.model_dir = cache_dir / self.model_name.replace("/", "__")
+        model_file = "model.int8.onnx" if self.quantize else "model.onnx"
+        model_path = self.model_dir / model_file
+
+        if not model_path.exists():
+            self._export()
+
+        with open(self.model_dir / "pooling.json", "r", encoding="utf-8") as f:
+            self.pooling = json.load(f)
+
+        self.tokenizer = AutoTokenizer.from_pretrained(str(self.model_dir))
+
+        # Thread settings (0 lets ONNX Runtime decide)
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = int(os.getenv("ONNX_INTRA_OP_THREADS", "0"))
+        options.inter_op_num_threads = int(os.getenv("ONNX_INTER_OP_THREADS", "0"))
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+        self.session = ort.InferenceSession(
+            str(model_path),
+            sess_options=options,
+            providers=["CPUExecutionProvider"]
+        )
+        self.input_names = [inp.name for inp in self.session.get_inputs()]
+
+        print(f"⚡ ONNX embedding model loaded: {model_path}")
+
+    def _export(self):
+        """Export the PyTorch model to ONNX and quantize it"""
+        # Export-only dependencies, not needed once the ONNX file exists
+        import torch
+        from sentence_transformers import SentenceTransformer
+        from sentence_transformers.models import Normalize
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+
+        print(f"📦 Exporting {self.model_name} to ONNX...")
+        self.model_dir.mkdir(parents=True, exist_ok=True)
+
+        st_model = SentenceTransformer(self.model_name, device="cpu")
+        transformer = st_model[0]
+        pooling_module = st_model[1]
+
+        hf_model = transformer.auto_model.eval()
+        tokenizer = transformer.tokenizer
+        tokenizer.save_pretrained(str(self.model_dir))
+
+        # Pooling.pooling_mode on newer sentence-transformers releases
+        pooling_mode = getattr(pooling_module, "pooling_mode", None) or pooling_module.get_pooling_mode_str()
+        pooling = {
+            "mode": "cls" if pooling_mode == "cls" else "mean",
+            "normalize": any(isinstance(module, Normalize) for module in st_model),
+            "max_seq_length": st_model.max_seq_length,
+            "dimension": st_model.get_sentence_embedding_dimension()
+        }
+        with open(self.model_dir / "pooling.json", "w", encoding="utf-8") as f:
+            json.dump(pooling, f)
+
+        # Graph inputs follow the order of the forward() signature
+        dummy = tokenizer(["ONNX export sample"], return_tensors="pt")
+        forward_params = inspect.signature(hf_model.forward).parameters
+        input_names = [name for name in forward_params if name in dummy]
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+        dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+        fp32_path = self.model_dir / "model.onnx"
+        with torch.no_grad():
+            torch.onnx.export(
+                hf_model,
+                ({name: dummy[name] for name in input_names},),
+                str(fp32_path),
+                input_names=input_names,
+                output_names=["last_hidden_state"],
+                dynamic_axes=dynamic_axes,
+                opset_version=14
+            )
+
+        # Dynamic int8 quantization of the weights
+        quantize_dynamic(
+            str(fp32_path),
+            str(self.model_dir / "model.int8.onnx"),
+            weight_type=QuantType.QInt8
+        )
+        print("✅ ONNX export complete!")
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Encode texts with ONNX Runtime
+
+        Args:
+            texts: Cleaned, non-empty texts
+
+        Returns:
+            Embedding matrix (len(texts) x dimension)
+        """
+        # Batch similar lengths together to minimise padding
+        order = np.argsort([len(t) for t in texts])
+        embeddings = np.empty((len(texts), self.pooling["dimension"]), dtype=np.float32)
+
+        for start in range(0, len(texts), self.batch_size):
+            batch_idx = order[start:start + self.batch_size]
+            encoded = self.tokenizer(
+                [texts[i] for i in batch_idx],
+                padding=True,
+                truncation=True,
+                max_length=self.pooling["max_seq_length"],
+                return_tensors="np"
+            )
+            feeds = {
+                name: encoded[name].astype(np.int64)
+                for name in self.input_names if name in encoded
+            }
+            hidden = self.session.run(None, feeds)[0]
+
+            if self.pooling["mode"] == "cls":
+                pooled = hidden[:, 0]
+            else:
+                mask = feeds["attention_mask"][..., None].astype(np.float32)
+                pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+            if self.pooling["normalize"]:
+                pooled = pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+            embeddings[batch_idx] = pooled
+
+        return embeddings
+
+    def generate_embedding(self, text: str) -> List[float]:
+        """
+        Generate embedding for a single text
+
+        Args:
+            text: Text to embed
+
+        Returns:
+            Embedding vector
+        """
+        text = text.replace("\n", " ").strip()
+
+        if not text:
+            raise ValueError("Cannot generate embedding for empty text")
+
+        return self._encode([text])[0].tolist()
+
+    def generate_embeddings_batch(self, texts: List[str]) -> List[List[float]]:
+        """
+        Generate embeddings for multiple texts in batch
+
+        Args:
+            texts: List of texts to embed
+
+        Returns:
+            List of embedding vectors
+        """
+        cleaned_texts = [text.replace("\n", " ").strip() for text in texts]
+        non_empty_texts = [t for t in cleaned_texts if t]
+
+        if not non_empty_texts:
+            raise ValueError("Cannot generate embeddings for empty texts")
+
+        print(f"⚡ Generating {len(non_empty_texts)} embeddings (ONNX)...")
+        return self._encode(non_empty_texts).tolist()
+
+    def get_embedding_dimension(self) -> int:
+        """
+        Get the dimension of embeddings for this model
+
+        Returns:
+            Embedding dimension
+        """
+        return self.pooling["dimension"]
+
+
+def compare_backends(texts: List[str], onnx_generator: OnnxEmbeddingGenerator, reference=None) -> Dict[str, Any]:
+    """
+    Check ONNX embeddings against the PyTorch backend and compare throughput
+
+    Args:
+        texts: Sample texts to embed
+        onnx_generator: ONNX generator under test
+        reference: PyTorch EmbeddingGenerator (created if not given)
+
+    Returns:
+        Parity (cosine agreement) and throughput figures
+    """
+    if reference is None:
+        from embeddings import EmbeddingGenerator
+        reference = EmbeddingGenerator(onnx_generator.model_name)
+
+    # Warm up both backends
+    reference.generate_embeddings_batch(texts[:4])
+    onnx_generator.generate_embeddings_batch(texts[:4])
+
+    start = time.perf_counter()
+    torch_vectors = np.array(reference.generate_embeddings_batch(texts))
+    torch_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    onnx_vectors = np.array(onnx_generator.generate_embeddings_batch(texts))
+    onnx_seconds = time.perf_counter() - start
+
+    cosine = (torch_vectors * onnx_vectors).sum(axis=1) / (
+        np.linalg.norm(torch_vectors, axis=1) * np.linalg.norm(onnx_vectors, axis=1)
+    )
+
+    return {
+        "texts": len(texts),
+        "quantized": onnx_generator.quantize,
+        "min_cosine": float(cosine.min()),
+        "mean_cosine": float(cosine.mean()),
+        "torch_texts_per_s": len(texts) / torch_seconds,
+        "onnx_texts_per_s": len(texts) / onnx_seconds,
+        "speedup": torch_seconds / onnx_seconds
+    }
+
+
+if __name__ == "__main__":
+    # Parity check and throughput comparison on the sample documents
+    from document_processor import DocumentProcessor
+
+    sample_dir = Path(__file__).resolve().parent.parent / "tests" / "sample_documents"
+    processor = DocumentProcessor(chunk_size=128, chunk_overlap=0)
+    sample_texts = []
+    for path in sorted(sample_dir.glob("*.txt")):
+        sample_texts.extend(text for text, _ in processor.process_document(str(path), "txt", path.name))
+
+    report = compare_backends(sample_texts, OnnxEmbeddingGenerator())
+    print(json.dumps(report, indent=2))
+
+    if report["min_cosine"] < 0.99:
+        print("⚠️  ONNX embeddings diverge from the PyTorch backend")
@@ -0,0 +1,57 @@
+"""
+Fast JSON Module
+JSON responses for large payloads, encoded with orjson when it is installed
+"""
+
+import json
+from datetime import date, datetime
+from enum import Enum
+from typing import Any
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # Optional: falls back to the standard library encoder
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    """Encode values the JSON encoders do not handle natively"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return str(value)
+
+
+def dumps(content: Any) -> bytes:
+    """
+    Encode content as JSON
+
+    Args:
+        content: Dicts, lists and scalars (datetimes, enums, NumPy values and
+            pydantic models are converted)
+
+    Returns:
+        UTF-8 JSON
+    """
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    Response that serializes plain dicts directly
+
+    Endpoints returning it skip FastAPI's response-model validation and
+    jsonable_encoder pass, so the content must already have the declared
+    response shape.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
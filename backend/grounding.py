@@ -0,0 +1,214 @@
+"""
+Grounding Module
+Checks generated answers against the retrieved chunks with hashed word shingles
+"""
+
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Iterable
+import numpy as np
+from dotenv import load_dotenv
+
+from metrics import record_cache_lookups
+from sentence_index import SentenceIndex, split_sentences
+from vector_index import normalize_rows
+
+load_dotenv()
+
+_WORD = re.compile(r"\w+")
+# Citation markers the LLM is asked to add; they are not claims
+_CITATION = re.compile(r"\[(?:Document|Source)[^\]]*\]", re.IGNORECASE)
+# Multiplier of the rolling shingle hash
+_HASH_PRIME = np.uint64(1099511628211)
+
+
+def answer_sentences(answer: str) -> List[str]:
+    """Sentences of an answer that make a claim, without citation markers"""
+    sentences = split_sentences(_CITATION.sub(" ", answer), min_chars=10)
+    return [sentence for sentence in sentences if _WORD.search(sentence)]
+
+
+def shingle_hashes(text: str, n: int = 3) -> np.ndarray:
+    """
+    Hashes of the word n-grams of a text
+
+    Args:
+        text: Text to shingle
+        n: Words per shingle (texts with fewer words give one shorter shingle)
+
+    Returns:
+        Sorted unique hashes as uint64
+    """
+    words = _WORD.findall(text.lower())
+    if not words:
+        return np.empty(0, dtype=np.uint64)
+
+    ids = np.fromiter((hash(word) for word in words), dtype=np.int64, count=len(words)).view(np.uint64)
+    n = min(n, len(ids))
+    count = len(ids) - n + 1
+    hashes = ids[:count].copy()
+    for k in range(1, n):
+        hashes = hashes * _HASH_PRIME + ids[k:k + count]
+    return np.unique(hashes)
+
+
+class GroundingVerifier:
+    """
+    Scores how well an answer is supported by the retrieved chunks
+
+    Each answer sentence is scored by the share of its word shingles that
+    occur in the context. Shingle hashes of chunks are computed when a
+    chunk is first retrieved and kept in an LRU cache, so a check is a few
+    vectorized set lookups. Optionally, sentences that are not copied
+    (paraphrases) can also be matched by embedding similarity against the
+    sentence index.
+    """
+
+    def __init__(self, sentence_index: Optional[SentenceIndex] = None, embedding_generator=None):
+        """
+        Initialize the verifier
+
+        Args:
+            sentence_index: Sentence index, for embedding similarity
+            embedding_generator: Embeds answer sentences, for embedding similarity
+        """
+        self.sentence_index = sentence_index
+        self.embedding_generator = embedding_generator
+        self.ngram = int(os.getenv("GROUNDING_NGRAM", "3"))
+        # Sentence score at which a sentence counts as supported
+        self.threshold = float(os.getenv("GROUNDING_THRESHOLD", "0.5"))
+        self.use_embeddings = (
+            os.getenv("GROUNDING_USE_EMBEDDINGS", "false").lower() == "true"
+            and sentence_index is not None and embedding_generator is not None
+        )
+        self.cache_size = int(os.getenv("GROUNDING_CACHE_SIZE", "10000"))
+        # (document_id, chunk_id) -> shingle hashes
+        self._cache: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def chunk_hashes(self, chunk: Dict[str, Any]) -> np.ndarray:
+        """
+        Shingle hashes of a chunk, cached by document and chunk ID
+
+        Args:
+            chunk: Chunk record
+
+        Returns:
+            Sorted unique hashes
+        """
+        key = (chunk.get("document_id"), chunk["chunk_id"])
+        with self._lock:
+            hashes = self._cache.get(key)
+            if hashes is not None:
+                self._cache.move_to_end(key)
+                return hashes
+        return self._hash_chunk(key, chunk)
+
+    def _context_hashes(self, results: List[Dict[str, Any]]) -> List[np.ndarray]:
+        """Shingle hashes of the result chunks, counting cache hits and misses once per check"""
+        keys = [(result["chunk"].get("document_id"), result["chunk"]["chunk_id"]) for result in results]
+        with self._lock:
+            cached = [self._cache.get(key) for key in keys]
+            for key, hashes in zip(keys, cached):
+                if hashes is not None:
+                    self._cache.move_to_end(key)
+        misses = sum(1 for hashes in cached if hashes is None)
+        record_cache_lookups("grounding_chunks", len(keys) - misses, misses)
+        return [
+            hashes if hashes is not None else self._hash_chunk(key, result["chunk"])
+            for key, hashes, result in zip(keys, cached, results)
+        ]
+
+    def _hash_chunk(self, key: tuple, chunk: Dict[str, Any]) -> np.ndarray:
+        """Compute a chunk's shingle hashes and cache them"""
+        hashes = shingle_hashes(chunk["content"], self.ngram)
+        with self._lock:
+            self._cache[key] = hashes
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return hashes
+
+    def invalidate(self, document_ids: Optional[Iterable[str]] = None):
+        """
+        Drop cached hashes of chunks that were deleted or replaced
+
+        Args:
+            document_ids: Documents whose chunks to drop (None = everything)
+        """
+        with self._lock:
+            if document_ids is None:
+                self._cache.clear()
+                return
+            document_ids = set(document_ids)
+            for key in [key for key in self._cache if key[0] in document_ids]:
+                del self._cache[key]
+
+    def verify(self, answer: str, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Score an answer against the chunks it was generated from
+
+        Args:
+            answer: Generated answer
+            results: Search results ({"chunk", "score"}) in the context
+
+        Returns:
+            Dict with "score" (0-1, or None if there is nothing to check),
+            "sentences" and "supported_sentences"
+        """
+        sentences = answer_sentences(answer)
+        if not sentences or not results:
+            return {"score": None, "sentences": len(sentences), "supported_sentences": 0}
+
+        context = np.unique(np.concatenate(self._context_hashes(results)))
+        scores, weights = self._shingle_scores(sentences, context)
+
+        if self.use_embeddings:
+            unsupported = np.flatnonzero(scores < self.threshold)
+            if len(unsupported):
+                chunk_ids = [result["chunk"]["chunk_id"] for result in results]
+                similarities = self._embedding_scores([sentences[i] for i in unsupported], chunk_ids)
+                if similarities is not None:
+                    scores[unsupported] = np.maximum(scores[unsupported], similarities)
+
+        return {
+            "score": float(np.average(scores, weights=weights)),
+            "sentences": len(sentences),
+            "supported_sentences": int((scores >= self.threshold).sum())
+        }
+
+    def verify_text(self, answer: str, context: str) -> Optional[float]:
+        """
+        Score an answer against plain context text (no caching)
+
+        Args:
+            answer: Generated answer
+            context: Context text
+
+        Returns:
+            Score from 0 to 1, or None if the answer has no sentences
+        """
+        sentences = answer_sentences(answer)
+        if not sentences:
+            return None
+        scores, weights = self._shingle_scores(sentences, shingle_hashes(context, self.ngram))
+        return float(np.average(scores, weights=weights))
+
+    def _shingle_scores(self, sentences: List[str], context: np.ndarray):
+        """Share of each sentence's shingles found in the context, and the shingle counts as weights"""
+        hashes = [shingle_hashes(sentence, self.ngram) for sentence in sentences]
+        lengths = np.array([len(h) for h in hashes])
+        # One lookup for all sentences, split back per sentence
+        found = np.isin(np.concatenate(hashes), context).astype(np.float32)
+        scores = np.add.reduceat(found, np.concatenate([[0], np.cumsum(lengths)[:-1]])) / lengths
+        return scores.astype(np.float32), lengths
+
+    def _embedding_scores(self, sentences: List[str], chunk_ids: List[str]) -> Optional[np.ndarray]:
+        """Best similarity of each sentence to an indexed context sentence"""
+        context = self.sentence_index.backend.get_sentences(chunk_ids)
+        if not context:
+            return None
+        matrix = np.asarray([sentence["embedding"] for sentence in context], dtype=np.float32)
+        embedded = normalize_rows(np.asarray(self.embedding_generator.generate_embeddings_batch(sentences), dtype=np.float32))
+        return (embedded @ matrix.T).max(axis=1)
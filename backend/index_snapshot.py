@@ -0,0 +1,265 @@
+"""
+Index Snapshot Module
+On-disk snapshots of per-namespace search indexes for warm restarts
+"""
+
+import os
+import json
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Set, Tuple
+import numpy as np
+from dotenv import load_dotenv
+
+from vector_index import IndexSegment
+
+load_dotenv()
+
+
+class IndexSnapshotStore:
+    """
+    Snapshots of VectorIndex contents with the generation they reflect
+
+    A snapshot of a namespace is a list of parts, each a block of
+    normalized vectors and sign-bit codes (.npy, memory-mapped on load)
+    with the chunk and document IDs of its rows (.npy string arrays), and
+    snapshot.json, which records the parts, the change-log generation,
+    the projection version and the tombstones at the time it was taken.
+    Rows added since the previous snapshot are written as a new part;
+    the parts are rewritten as one only after rows were removed or past
+    INDEX_SNAPSHOT_MAX_PARTS. Files are written under a fresh name and
+    snapshot.json is replaced last, so readers never see a partial
+    snapshot, and a lock file lets one worker write at a time.
+    """
+
+    def __init__(self, directory: str = None):
+        """
+        Initialize the snapshot store
+
+        Args:
+            directory: Snapshot root directory (defaults to INDEX_SNAPSHOT_DIR)
+        """
+        self.directory = Path(directory or os.getenv("INDEX_SNAPSHOT_DIR", "index_snapshots"))
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Past this many parts a snapshot is rewritten as one
+        self.max_parts = int(os.getenv("INDEX_SNAPSHOT_MAX_PARTS", "8"))
+        # A lock older than this was left by a writer that died
+        self.lock_seconds = float(os.getenv("INDEX_SNAPSHOT_LOCK_SECONDS", "600"))
+
+    def _namespace_dir(self, namespace: str) -> Path:
+        return self.directory / namespace
+
+    @staticmethod
+    def _paths(directory: Path, name: str):
+        """Vector, code, chunk-ID and document-ID paths of a snapshot part"""
+        return (
+            directory / f"{name}.vectors.npy",
+            directory / f"{name}.codes.npy",
+            directory / f"{name}.chunk_ids.npy",
+            directory / f"{name}.document_ids.npy"
+        )
+
+    def _read_meta(self, namespace: str) -> Optional[Dict[str, Any]]:
+        path = self._namespace_dir(namespace) / "snapshot.json"
+        if not path.exists():
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _acquire(self, directory: Path) -> bool:
+        """Take the writer lock of a namespace, unless another worker holds it"""
+        path = directory / "snapshot.lock"
+        for _ in range(2):
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                try:
+                    if time.time() - path.stat().st_mtime < self.lock_seconds:
+                        return False
+                except FileNotFoundError:
+                    continue
+                print(f"⚠️  Removing stale snapshot lock {path}")
+                path.unlink(missing_ok=True)
+                continue
+            with os.fdopen(fd, "w") as f:
+                f.write(str(os.getpid()))
+            return True
+        return False
+
+    @staticmethod
+    def _release(directory: Path):
+        (directory / "snapshot.lock").unlink(missing_ok=True)
+
+    def save(
+        self,
+        namespace: str,
+        segments: List[IndexSegment],
+        tombstones: Set[str],
+        generation: int,
+        index_generation: int,
+        version: str,
+        base: Optional[Tuple[str, int]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Write a snapshot of an index
+
+        Rows of tombstoned documents are left out; the tombstones themselves
+        are recorded so the documents stay hidden until they are compacted.
+        If the current snapshot is still the one given as base, only the
+        rows after the base offset are written, as a new part.
+
+        Args:
+            namespace: Namespace of the index
+            segments: Segments of the index (never modified in place, so read without locking)
+            tombstones: Tombstoned document IDs
+            generation: Change-log generation the index reflects
+            index_generation: Generation of the last change to this index
+            version: Projection version of its vectors
+            base: ID of the snapshot the index was last saved to or loaded
+                from, and the number of index rows it holds (None = unknown)
+
+        Returns:
+            Dict with "id" of the new snapshot (None if another worker has
+            already saved this state) and "rows" written; None if another
+            worker is writing
+        """
+        directory = self._namespace_dir(namespace)
+        directory.mkdir(parents=True, exist_ok=True)
+        if not self._acquire(directory):
+            return None
+        try:
+            previous = self._read_meta(namespace)
+            if previous and previous["version"] == version and previous.get("index_generation", -1) >= index_generation:
+                return {"id": None, "rows": 0}
+
+            parts, start = [], 0
+            if (
+                base is not None and previous is not None and previous.get("id") == base[0]
+                and previous["version"] == version and len(previous["parts"]) < self.max_parts
+            ):
+                parts, start = list(previous["parts"]), base[1]
+
+            name = f"snap-{index_generation:012d}-{os.getpid()}"
+            rows = self._write_part(directory, name, segments, tombstones, start)
+            if rows:
+                parts.append(name)
+
+            meta = {
+                "id": uuid.uuid4().hex,
+                "parts": parts,
+                "generation": generation,
+                "index_generation": index_generation,
+                "version": version,
+                "tombstones": sorted(tombstones),
+                "saved_at": time.time()
+            }
+            tmp_path = directory / f"snapshot.json.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            os.replace(tmp_path, directory / "snapshot.json")
+
+            # Files of replaced parts go only once nothing points at them
+            if previous:
+                for old in set(previous.get("parts", [])) - set(parts):
+                    for path in self._paths(directory, old):
+                        path.unlink(missing_ok=True)
+            return {"id": meta["id"], "rows": rows}
+        finally:
+            self._release(directory)
+
+    def _write_part(self, directory: Path, name: str, segments: List[IndexSegment], tombstones: Set[str], start: int) -> int:
+        """Write the live index rows from a row offset on as one part; returns the rows written"""
+        chunk_ids, document_ids, vectors, codes = [], [], [], []
+        offset = 0
+        for segment in segments:
+            skip = max(0, start - offset)
+            offset += len(segment)
+            if skip >= len(segment):
+                continue
+            keep = ~np.isin(segment.document_ids, list(tombstones)) if tombstones else np.ones(len(segment), dtype=bool)
+            if segment.alive is not None:
+                keep &= segment.alive
+            keep[:skip] = False
+            chunk_ids.extend(cid for cid, k in zip(segment.chunk_ids, keep) if k)
+            document_ids.append(segment.document_ids[keep])
+            vectors.append(np.asarray(segment.vectors[keep]))
+            codes.append(np.asarray(segment.codes[keep]))
+
+        rows = len(chunk_ids)
+        if rows:
+            vectors_path, codes_path, chunk_ids_path, document_ids_path = self._paths(directory, name)
+            np.save(vectors_path, np.concatenate(vectors))
+            np.save(codes_path, np.concatenate(codes))
+            np.save(chunk_ids_path, np.array(chunk_ids, dtype=str))
+            np.save(document_ids_path, np.concatenate(document_ids).astype(str))
+        return rows
+
+    def load(self, namespace: str, version: str) -> Optional[Dict[str, Any]]:
+        """
+        Open the latest snapshot of a namespace
+
+        Args:
+            namespace: Namespace
+            version: Projection version the vectors must have
+
+        Returns:
+            Dict with "segments" (memory-mapped IndexSegments, one per part),
+            "id", "generation", "index_generation" and "tombstones"; None if
+            there is no usable snapshot
+        """
+        meta = self._read_meta(namespace)
+        if meta is None or meta["version"] != version or "parts" not in meta:
+            return None
+
+        segments = []
+        for name in meta["parts"]:
+            vectors_path, codes_path, chunk_ids_path, document_ids_path = self._paths(
+                self._namespace_dir(namespace), name
+            )
+            try:
+                segments.append(IndexSegment(
+                    np.load(chunk_ids_path).tolist(),
+                    np.load(document_ids_path).tolist(),
+                    np.load(vectors_path, mmap_mode="r"),
+                    np.load(codes_path, mmap_mode="r")
+                ))
+            except (OSError, ValueError) as e:
+                # Replaced by another worker between reading the meta and the files
+                print(f"⚠️  Could not open snapshot of namespace {namespace}: {e}")
+                return None
+
+        return {
+            "segments": segments,
+            "id": meta["id"],
+            "generation": meta["generation"],
+            "index_generation": meta["index_generation"],
+            "tombstones": meta["tombstones"]
+        }
+
+    def namespaces(self) -> List[str]:
+        """
+        Namespaces that have a snapshot, most recently saved first
+
+        Returns:
+            List of namespaces
+        """
+        saved = []
+        for path in self.directory.glob("*/snapshot.json"):
+            saved.append((path.stat().st_mtime, path.parent.name))
+        return [namespace for _, namespace in sorted(saved, reverse=True)]
+
+    def remove(self, namespace: str):
+        """
+        Delete the snapshot of a namespace
+
+        Args:
+            namespace: Namespace
+        """
+        meta = self._read_meta(namespace)
+        if meta is None:
+            return
+        (self._namespace_dir(namespace) / "snapshot.json").unlink(missing_ok=True)
+        for name in meta.get("parts", []):
+            for path in self._paths(self._namespace_dir(namespace), name):
+                path.unlink(missing_ok=True)
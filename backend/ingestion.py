@@ -0,0 +1,427 @@
+"""
+Ingestion Module
+Shared ingestion pipeline, archive extraction and bulk upload jobs
+"""
+
+import os
+import re
+import uuid
+import tarfile
+import zipfile
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Callable, Iterator, Iterable, Tuple, BinaryIO, Union
+from pymongo.errors import BulkWriteError
+from dotenv import load_dotenv
+
+from models import ProcessingStatus, IngestionJob, FileIngestionStatus, DEFAULT_NAMESPACE, NAMESPACE_PATTERN
+from document_processor import DocumentProcessor
+from vector_store import VectorStore
+from store_backends import failed_writes
+from metrics import INGEST_STAGE_SECONDS, time_stage
+
+load_dotenv()
+
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2")
+
+# Called as on_status(document_id, status, total_chunks, error_message)
+StatusCallback = Callable[[str, ProcessingStatus, int, Optional[str]], None]
+
+# (document_id, document_name, chunks from DocumentProcessor or the error that prevented them)
+ProcessedDocument = Tuple[str, str, Union[List[Tuple[str, dict]], Exception]]
+
+
+def is_archive(filename: str) -> bool:
+    """True if the filename looks like a supported archive"""
+    return filename.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def iter_archive(fileobj: BinaryIO, filename: str) -> Iterator[Tuple[str, BinaryIO]]:
+    """
+    Stream the regular files of a zip or tar archive
+
+    Entries are yielded one at a time as readable streams, so nothing is
+    extracted to memory as a whole. Only base names are returned, which
+    rules out path traversal.
+
+    Args:
+        fileobj: Archive contents (zip needs a seekable file)
+        filename: Archive filename, used to detect the format
+
+    Returns:
+        Iterator of (entry name, stream)
+    """
+    if filename.lower().endswith(".zip"):
+        with zipfile.ZipFile(fileobj) as archive:
+            for info in archive.infolist():
+                name = Path(info.filename).name
+                if info.is_dir() or not name or info.filename.startswith("__MACOSX/"):
+                    continue
+                with archive.open(info) as stream:
+                    yield name, stream
+    else:
+        # "r|*" reads the tar sequentially (any compression) without seeking
+        with tarfile.open(fileobj=fileobj, mode="r|*") as archive:
+            for member in archive:
+                name = Path(member.name).name
+                if not member.isfile() or not name:
+                    continue
+                stream = archive.extractfile(member)
+                if stream is not None:
+                    yield name, stream
+
+
+def save_stream(stream: BinaryIO, path: Path, max_size: int) -> int:
+    """
+    Copy a stream to a file, enforcing a size limit
+
+    Args:
+        stream: Source stream
+        path: Destination path
+        max_size: Maximum size in bytes
+
+    Returns:
+        Number of bytes written
+
+    Raises:
+        ValueError: If the stream is larger than max_size (the file is removed)
+    """
+    size = 0
+    with open(path, "wb") as f:
+        while True:
+            block = stream.read(1024 * 1024)
+            if not block:
+                break
+            size += len(block)
+            if size > max_size:
+                break
+            f.write(block)
+
+    if size > max_size:
+        path.unlink(missing_ok=True)
+        raise ValueError(f"File too large. Maximum size: {max_size / 1024 / 1024}MB")
+    return size
+
+
+class IngestionJobRegistry:
+    """
+    In-process registry of bulk upload jobs
+
+    Only the most recent jobs are kept. Jobs live in the worker that
+    accepted the upload.
+    """
+
+    def __init__(self):
+        """Initialize an empty registry"""
+        self.max_jobs = int(os.getenv("INGEST_MAX_JOBS", "100"))
+        self._lock = threading.Lock()
+        self._jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+
+    def create(self) -> IngestionJob:
+        """Register a new, pending job"""
+        job = IngestionJob(job_id=str(uuid.uuid4()), status=ProcessingStatus.PENDING)
+        with self._lock:
+            self._jobs[job.job_id] = job
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        """Get a snapshot of a job"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.model_copy(deep=True) if job is not None else None
+
+    def add_file(self, job: IngestionJob, status: FileIngestionStatus):
+        """Add a file to a job"""
+        with self._lock:
+            job.files.append(status)
+
+    def status_callback(self, job: IngestionJob) -> StatusCallback:
+        """
+        Status callback that updates the job's file entries
+
+        Args:
+            job: Job whose files are being ingested
+
+        Returns:
+            Callback for IngestionPipeline.ingest
+        """
+        def on_status(document_id: str, status: ProcessingStatus, total_chunks: int, error_message: Optional[str]):
+            with self._lock:
+                for entry in job.files:
+                    if entry.document_id == document_id:
+                        entry.status = status
+                        entry.total_chunks = total_chunks
+                        entry.error_message = error_message
+
+                self._refresh(job)
+
+        return on_status
+
+    def finish(self, job: IngestionJob):
+        """Settle the status of a job that has nothing (left) to process"""
+        with self._lock:
+            self._refresh(job)
+
+    @staticmethod
+    def _refresh(job: IngestionJob):
+        """Derive the job status from its files"""
+        finished = (ProcessingStatus.COMPLETED, ProcessingStatus.FAILED)
+        if all(entry.status in finished for entry in job.files):
+            failed = all(entry.status == ProcessingStatus.FAILED for entry in job.files)
+            job.status = ProcessingStatus.FAILED if failed else ProcessingStatus.COMPLETED
+            job.completed_at = datetime.utcnow()
+        else:
+            job.status = ProcessingStatus.PROCESSING
+
+
+class IngestionPipeline:
+    """
+    Process, embed and store documents
+
+    Chunks of consecutive documents share embedding batches, and the
+    chunk records of finished documents are written in large unordered
+    bulk inserts. A document's chunks are only written once all of them
+    have embeddings, and chunks of a document whose insert partly failed
+    are removed again, so a failed document leaves nothing behind.
+    """
+
+    def __init__(
+        self,
+        document_processor: DocumentProcessor,
+        embedding_generator,
+        vector_store: VectorStore,
+        summarizer=None,
+        sentence_index=None
+    ):
+        """
+        Initialize the pipeline
+
+        Args:
+            document_processor: Extracts and chunks files
+            embedding_generator: Embedding generator
+            vector_store: Vector store to write to
+            summarizer: Optional DocumentSummarizer notified of completed documents
+            sentence_index: Optional SentenceIndex that stored chunks are added to
+        """
+        self.document_processor = document_processor
+        self.embedding_generator = embedding_generator
+        self.vector_store = vector_store
+        self.summarizer = summarizer
+        self.sentence_index = sentence_index
+        self.embed_batch_size = int(os.getenv("INGEST_EMBED_BATCH_SIZE", "256"))
+        self.insert_batch_size = int(os.getenv("INGEST_INSERT_BATCH_SIZE", "1000"))
+
+    def ingest(
+        self,
+        files: List[Dict[str, Any]],
+        on_status: Optional[StatusCallback] = None,
+        namespace: str = DEFAULT_NAMESPACE
+    ):
+        """
+        Ingest uploaded files whose document records already exist
+
+        Each file is removed once it has been processed.
+
+        Args:
+            files: Dicts with document_id, file_path, file_type and filename
+            on_status: Optional callback for every document status change
+            namespace: Namespace the documents belong to
+        """
+        def processed() -> Iterator[ProcessedDocument]:
+            for item in files:
+                self.set_status(item["document_id"], ProcessingStatus.PROCESSING, on_status)
+                try:
+                    with time_stage(INGEST_STAGE_SECONDS, "process_document"):
+                        chunks = self.document_processor.process_document(
+                            item["file_path"], item["file_type"], item["filename"]
+                        )
+                except Exception as e:
+                    chunks = e
+                finally:
+                    if os.path.exists(item["file_path"]):
+                        os.remove(item["file_path"])
+                yield item["document_id"], item["filename"], chunks
+
+        self.ingest_processed(processed(), on_status, namespace)
+
+    def ingest_processed(
+        self,
+        documents: Iterable[ProcessedDocument],
+        on_status: Optional[StatusCallback] = None,
+        namespace: str = DEFAULT_NAMESPACE
+    ):
+        """
+        Embed and store documents that have already been chunked
+
+        Args:
+            documents: (document_id, document_name, chunks or error) in any number
+            on_status: Optional callback for every document status change
+            namespace: Namespace the documents belong to
+        """
+        if not re.match(NAMESPACE_PATTERN, namespace):
+            raise ValueError(f"Invalid namespace: {namespace}")
+        state = _IngestionState(self, on_status, namespace)
+
+        for document_id, document_name, chunks in documents:
+            if isinstance(chunks, Exception):
+                self.set_status(document_id, ProcessingStatus.FAILED, on_status, error_message=str(chunks))
+                continue
+
+            state.add_document(document_id, document_name, chunks)
+            while len(state.pending) >= self.embed_batch_size:
+                state.embed_pending(self.embed_batch_size)
+
+        while state.pending:
+            state.embed_pending(self.embed_batch_size)
+        state.flush_inserts()
+
+    def set_status(
+        self,
+        document_id: str,
+        status: ProcessingStatus,
+        on_status: Optional[StatusCallback] = None,
+        total_chunks: int = 0,
+        error_message: Optional[str] = None
+    ):
+        """Record a document status change and report it to the callback"""
+        self.vector_store.update_document_status(
+            document_id,
+            status,
+            total_chunks=total_chunks if status == ProcessingStatus.COMPLETED else None,
+            error_message=error_message
+        )
+        if status == ProcessingStatus.COMPLETED and total_chunks and self.summarizer is not None:
+            self.summarizer.on_document_completed(document_id)
+        if on_status is not None:
+            on_status(document_id, status, total_chunks, error_message)
+
+
+class _IngestionState:
+    """Buffers of one IngestionPipeline.ingest run"""
+
+    def __init__(self, pipeline: IngestionPipeline, on_status: Optional[StatusCallback], namespace: str):
+        self.pipeline = pipeline
+        self.on_status = on_status
+        self.namespace = namespace
+        # (document_id, document_name, chunk_text, metadata) awaiting embeddings
+        self.pending: List[Tuple[str, str, str, dict]] = []
+        # document_id -> embedded chunk records, until the document is complete
+        self.embedded: Dict[str, List[Dict[str, Any]]] = {}
+        self.expected: Dict[str, int] = {}
+        self.failed = set()
+        # Complete documents whose chunks wait for the next bulk insert
+        self.inserts: List[Dict[str, Any]] = []
+        self.insert_documents: List[str] = []
+
+    def set_status(self, document_id: str, status: ProcessingStatus, total_chunks: int = 0, error_message: Optional[str] = None):
+        self.pipeline.set_status(document_id, status, self.on_status, total_chunks, error_message)
+
+    def add_document(self, document_id: str, document_name: str, chunks: List[Tuple[str, dict]]):
+        # Embedders skip blank texts, which would shift every later vector in
+        # the batch onto the wrong chunk: drop them and renumber the rest
+        chunks = [(text, metadata) for text, metadata in chunks if text.strip()]
+        chunks = [
+            (text, {**metadata, "chunk_index": i, "total_chunks": len(chunks)})
+            for i, (text, metadata) in enumerate(chunks)
+        ]
+        if not chunks:
+            self.set_status(document_id, ProcessingStatus.COMPLETED, total_chunks=0)
+            return
+        self.expected[document_id] = len(chunks)
+        self.embedded[document_id] = []
+        self.pending.extend((document_id, document_name, text, metadata) for text, metadata in chunks)
+
+    def fail(self, document_ids, error: Exception):
+        for document_id in document_ids:
+            if document_id not in self.failed:
+                self.failed.add(document_id)
+                self.embedded.pop(document_id, None)
+                self.set_status(document_id, ProcessingStatus.FAILED, error_message=str(error))
+
+    def fail_stored(self, document_ids, error: Exception):
+        """Fail documents whose insert failed, removing whatever of them was written"""
+        for document_id in document_ids:
+            try:
+                self.pipeline.vector_store.remove_document_chunks(document_id, self.namespace)
+            except Exception as e:
+                print(f"⚠️  Could not remove chunks of failed document {document_id}: {e}")
+        self.fail(document_ids, error)
+
+    def embed_pending(self, batch_size: int):
+        """Embed one cross-document batch of pending chunks"""
+        batch, self.pending = self.pending[:batch_size], self.pending[batch_size:]
+        batch = [entry for entry in batch if entry[0] not in self.failed]
+        if not batch:
+            return
+
+        try:
+            with time_stage(INGEST_STAGE_SECONDS, "embed"):
+                embeddings = self.pipeline.embedding_generator.generate_embeddings_batch([entry[2] for entry in batch])
+            if len(embeddings) != len(batch):
+                raise ValueError(f"Expected {len(batch)} embeddings, got {len(embeddings)}")
+        except Exception as e:
+            self.fail({entry[0] for entry in batch}, e)
+            return
+
+        # Plain records in DocumentChunk shape: the store validates the batch
+        # once instead of a model being built and dumped per chunk
+        created_at = datetime.utcnow()
+        for (document_id, document_name, text, metadata), embedding in zip(batch, embeddings):
+            if document_id in self.failed:
+                continue
+            chunks = self.embedded[document_id]
+            chunks.append({
+                "chunk_id": f"{document_id}_chunk_{metadata['chunk_index']}",
+                "document_id": document_id,
+                "document_name": document_name,
+                "content": text,
+                "embedding": embedding,
+                "metadata": metadata,
+                "chunk_index": metadata["chunk_index"],
+                "total_chunks": metadata["total_chunks"],
+                "created_at": created_at,
+                "namespace": self.namespace
+            })
+            if len(chunks) == self.expected[document_id]:
+                self.inserts.extend(self.embedded.pop(document_id))
+                self.insert_documents.append(document_id)
+
+        if len(self.inserts) >= self.pipeline.insert_batch_size:
+            self.flush_inserts()
+
+    def flush_inserts(self):
+        """Write the buffered chunks of complete documents in one bulk insert"""
+        if not self.inserts:
+            return
+        chunks, document_ids = self.inserts, self.insert_documents
+        self.inserts, self.insert_documents = [], []
+
+        try:
+            with time_stage(INGEST_STAGE_SECONDS, "store"):
+                self.pipeline.vector_store.store_chunk_records(chunks)
+        except BulkWriteError as e:
+            # The other rows were written and indexed: only fail the documents of the failed rows
+            failed = {chunks[i]["document_id"] for i in failed_writes(e)}
+            self.fail_stored(failed, e)
+            chunks = [chunk for chunk in chunks if chunk["document_id"] not in failed]
+            document_ids = [document_id for document_id in document_ids if document_id not in failed]
+        except Exception as e:
+            self.fail_stored(document_ids, e)
+            return
+        if not chunks:
+            return
+
+        if self.pipeline.sentence_index is not None:
+            # Only the extractive fallback depends on it, so a failure is not fatal
+            try:
+                with time_stage(INGEST_STAGE_SECONDS, "sentences"):
+                    self.pipeline.sentence_index.index_chunks(chunks)
+            except Exception as e:
+                print(f"⚠️  Sentence indexing failed: {e}")
+
+        for document_id in document_ids:
+            self.set_status(document_id, ProcessingStatus.COMPLETED, total_chunks=self.expected[document_id])
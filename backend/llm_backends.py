@@ -0,0 +1,86 @@
+"""
+LLM Backends Module
+Text generation backends: Hugging Face Inference API or a local model
+"""
+
+import os
+from typing import Protocol
+from huggingface_hub import InferenceClient
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class LLMBackend(Protocol):
+    """Text generation used by RAGEngine"""
+
+    model_name: str
+
+    def generate(self, prompt: str, max_new_tokens: int, temperature: float) -> str: ...
+    def close(self) -> None: ...
+
+
+class HuggingFaceInferenceBackend:
+    """Remote generation through the Hugging Face Inference API"""
+
+    def __init__(self, model_name: str = None):
+        """
+        Initialize the inference client
+
+        Args:
+            model_name: Hub model ID (defaults to LLM_MODEL)
+        """
+        self.model_name = model_name or os.getenv("LLM_MODEL", "mistralai/Mistral-7B-Instruct-v0.2")
+
+        # Get Hugging Face token (optional, free!)
+        hf_token = os.getenv("HUGGINGFACE_API_TOKEN")
+
+        if not hf_token or hf_token == "hf_your_token_here_optional":
+            print("⚠️  No Hugging Face token found. Using public inference (may be slower)")
+            print("💡 Get a FREE token at: https://huggingface.co/settings/tokens")
+            self.client = InferenceClient()
+        else:
+            print("✅ Using Hugging Face with your token")
+            self.client = InferenceClient(token=hf_token)
+
+    def generate(self, prompt: str, max_new_tokens: int, temperature: float) -> str:
+        """
+        Generate a completion
+
+        Args:
+            prompt: Prompt text
+            max_new_tokens: Maximum tokens to generate
+            temperature: Sampling temperature
+
+        Returns:
+            Generated text (without the prompt)
+        """
+        return self.client.text_generation(
+            prompt,
+            model=self.model_name,
+            max_new_tokens=max_new_tokens,
+            temperature=temperature,
+            return_full_text=False
+        )
+
+    def close(self):
+        """Nothing to release"""
+
+
+def create_llm_backend() -> LLMBackend:
+    """
+    Create the generation backend selected by LLM_BACKEND
+
+    Returns:
+        HuggingFaceInferenceBackend ("huggingface", default) or
+        LocalTransformersBackend ("local")
+    """
+    backend = os.getenv("LLM_BACKEND", "huggingface").lower()
+
+    if backend == "local":
+        from llm_local import LocalTransformersBackend
+        return LocalTransformersBackend()
+
+    if backend != "huggingface":
+        raise ValueError(f"Unsupported LLM_BACKEND: {backend}")
+    return HuggingFaceInferenceBackend()
@@ -0,0 +1,193 @@
+"""
+LLM Backends Module - local transformers backend
+CPU generation from a local model directory, batching concurrent prompts
+"""
+
+import os
+import time
+import queue
+import threading
+from concurrent.futures import Future
+from typing import List, Optional
+import torch
+from transformers import AutoTokenizer, AutoModelForCausalLM
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class _GenerationRequest:
+    """A prompt waiting for the batching worker"""
+
+    def __init__(self, prompt: str, max_new_tokens: int, temperature: float):
+        self.prompt = prompt
+        self.max_new_tokens = max_new_tokens
+        self.temperature = temperature
+        self.future: Future = Future()
+
+
+class LocalTransformersBackend:
+    """
+    Generate with a small instruction model loaded from disk
+
+    Prompts submitted concurrently (query requests, summary map tasks)
+    are collected for up to LLM_BATCH_WAIT_MS by a single worker thread
+    and generated together in one padded forward pass per decoding step.
+    Nothing is downloaded: the model directory must already contain the
+    weights and tokenizer.
+    """
+
+    def __init__(self, model_path: str = None):
+        """
+        Load the model and start the batching worker
+
+        Args:
+            model_path: Local model directory (defaults to LLM_LOCAL_MODEL_PATH)
+        """
+        self.model_name = model_path or os.getenv("LLM_LOCAL_MODEL_PATH")
+        if not self.model_name:
+            raise ValueError("LLM_LOCAL_MODEL_PATH environment variable not set")
+
+        # Upper bound on any request's max_new_tokens
+        self.max_new_tokens = int(os.getenv("LLM_MAX_NEW_TOKENS", "512"))
+        self.max_input_tokens = int(os.getenv("LLM_MAX_INPUT_TOKENS", "3072"))
+        self.max_batch_size = int(os.getenv("LLM_MAX_BATCH_SIZE", "8"))
+        self.batch_wait = float(os.getenv("LLM_BATCH_WAIT_MS", "10")) / 1000
+        threads = int(os.getenv("LLM_THREADS", "0"))
+        if threads > 0:
+            torch.set_num_threads(threads)
+
+        print(f"🖥️  Loading local LLM from {self.model_name}")
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_name, local_files_only=True)
+        # Decoder-only models continue from the right, so pad (and cut) on the left
+        self.tokenizer.padding_side = "left"
+        self.tokenizer.truncation_side = "left"
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        self.model = AutoModelForCausalLM.from_pretrained(self.model_name, local_files_only=True)
+        self.model.eval()
+        print(f"✅ Local LLM loaded ({torch.get_num_threads()} threads)")
+
+        self._queue: "queue.Queue[Optional[_GenerationRequest]]" = queue.Queue()
+        # Guards _closed, so nothing is queued behind the stop marker
+        self._lock = threading.Lock()
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name="llm-batcher", daemon=True)
+        self._worker.start()
+
+    def generate(self, prompt: str, max_new_tokens: int, temperature: float) -> str:
+        """
+        Generate a completion (blocks until the batch containing it is done)
+
+        Args:
+            prompt: Prompt text
+            max_new_tokens: Maximum tokens to generate (capped at LLM_MAX_NEW_TOKENS)
+            temperature: Sampling temperature (0 = greedy)
+
+        Returns:
+            Generated text (without the prompt)
+
+        Raises:
+            RuntimeError: If the backend was closed
+        """
+        request = _GenerationRequest(prompt, min(max_new_tokens, self.max_new_tokens), temperature)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Local LLM backend is closed")
+            self._queue.put(request)
+        return request.future.result()
+
+    def close(self):
+        """Stop the batching worker once queued requests are done; later requests fail"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+
+    def _fail_pending(self):
+        """Fail requests still queued when the worker stops, so no caller waits forever"""
+        while True:
+            try:
+                request = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if request is not None:
+                request.future.set_exception(RuntimeError("Local LLM backend is closed"))
+
+    def _run(self):
+        """Worker loop: collect a batch, generate, repeat"""
+        while True:
+            first = self._queue.get()
+            if first is None:
+                self._fail_pending()
+                return
+
+            batch = [first]
+            deadline = time.monotonic() + self.batch_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if request is None:
+                    self._queue.put(None)  # Stop after this batch
+                    break
+                batch.append(request)
+
+            # Sampling settings are per forward pass, so split by temperature
+            groups = {}
+            for request in batch:
+                groups.setdefault(request.temperature, []).append(request)
+
+            for requests in groups.values():
+                try:
+                    outputs = self._generate_batch(requests)
+                except Exception as e:
+                    for request in requests:
+                        request.future.set_exception(e)
+                    continue
+                for request, output in zip(requests, outputs):
+                    request.future.set_result(output)
+
+    def _format(self, prompt: str) -> str:
+        """Wrap the prompt in the model's chat template, if it has one"""
+        if getattr(self.tokenizer, "chat_template", None):
+            return self.tokenizer.apply_chat_template(
+                [{"role": "user", "content": prompt}],
+                tokenize=False,
+                add_generation_prompt=True
+            )
+        return prompt
+
+    def _generate_batch(self, requests: List[_GenerationRequest]) -> List[str]:
+        """Generate all requests (same temperature) in one padded batch"""
+        inputs = self.tokenizer(
+            [self._format(request.prompt) for request in requests],
+            return_tensors="pt",
+            padding=True,
+            truncation=True,
+            max_length=self.max_input_tokens
+        )
+
+        temperature = requests[0].temperature
+        options = {
+            "max_new_tokens": max(request.max_new_tokens for request in requests),
+            "pad_token_id": self.tokenizer.pad_token_id,
+            "do_sample": temperature > 0
+        }
+        if temperature > 0:
+            options["temperature"] = temperature
+
+        with torch.inference_mode():
+            output = self.model.generate(**inputs, **options)
+
+        # Each request keeps only the tokens it asked for
+        new_tokens = output[:, inputs["input_ids"].shape[1]:]
+        return [
+            self.tokenizer.decode(tokens[:request.max_new_tokens], skip_special_tokens=True).strip()
+            for request, tokens in zip(requests, new_tokens)
+        ]
@@ -4,23 +4,33 @@ Document Q&A Assistant with RAG (No API costs!)
 """
 
 import os
+import re
 import uuid
 import time
+import tarfile
+import zipfile
 from pathlib import Path
-from typing import List
-from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks
+from typing import List, Optional
+from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks, Response, Header, Query
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 
 from models import (
-    Document, DocumentChunk, ProcessingStatus, DocumentType,
-    UploadResponse, QueryRequest, QueryResponse, KnowledgeBaseStats,
-    ChatMessage, ErrorResponse
+    Document, ProcessingStatus, DocumentType,
+    UploadResponse, BulkUploadResponse, IngestionJob, FileIngestionStatus, QueryRequest, QueryResponse, QueryTimings, KnowledgeBaseStats,
+    ChatMessage, ChatHistoryPage, ErrorResponse, DEFAULT_NAMESPACE, NAMESPACE_PATTERN
 )
 from document_processor import DocumentProcessor, validate_file_type
-from embeddings import EmbeddingGenerator
+from embeddings import create_embedding_generator
 from vector_store import VectorStore
 from rag_engine import RAGEngine
+from slow_query_log import SlowQueryLog
+from chat_history import ChatHistoryStore
+from compactor import Compactor
+from change_poller import ChangePoller
+from ingestion import IngestionPipeline, IngestionJobRegistry, is_archive, iter_archive, save_stream
+from metrics import CONTENT_TYPE_LATEST, render_metrics
+from fast_json import FastJSONResponse
 
 load_dotenv()
 
@@ -45,16 +55,67 @@ document_processor = DocumentProcessor(
     chunk_size=int(os.getenv("CHUNK_SIZE", "800")),
     chunk_overlap=int(os.getenv("CHUNK_OVERLAP", "200"))
 )
-embedding_generator = EmbeddingGenerator()
+embedding_generator = create_embedding_generator()
 vector_store = VectorStore()
-rag_engine = RAGEngine()
+rag_engine = RAGEngine(embedding_generator, vector_store)
+slow_query_log = SlowQueryLog(vector_store.backend)
+chat_history = ChatHistoryStore(vector_store.backend)
+compactor = Compactor(vector_store)
+change_poller = ChangePoller(vector_store)
+ingestion_pipeline = IngestionPipeline(
+    document_processor, embedding_generator, vector_store,
+    summarizer=rag_engine.summarizer,
+    sentence_index=rag_engine.sentence_index
+)
+ingestion_jobs = IngestionJobRegistry()
 
 # Upload directory
 UPLOAD_DIR = Path("uploads")
 UPLOAD_DIR.mkdir(exist_ok=True)
 
-# Chat history (in-memory, would use database in production)
-chat_history: List[ChatMessage] = []
+
+def resolve_session_id(session_id: Optional[str], header_session_id: Optional[str]) -> str:
+    """
+    Pick the chat session from the query parameter or X-Session-ID header
+
+    Raises:
+        HTTPException: If neither is given
+    """
+    session_id = session_id or header_session_id
+    if not session_id:
+        raise HTTPException(status_code=400, detail="session_id query parameter or X-Session-ID header is required")
+    return session_id
+
+
+def resolve_namespace(namespace: Optional[str], header_namespace: Optional[str]) -> str:
+    """
+    Pick the namespace from the query parameter or X-Namespace header
+
+    Raises:
+        HTTPException: If the namespace is not valid
+    """
+    namespace = namespace or header_namespace or DEFAULT_NAMESPACE
+    if not re.match(NAMESPACE_PATTERN, namespace):
+        raise HTTPException(status_code=400, detail="Namespace must be 1-64 letters, digits, '-' or '_'")
+    return namespace
+
+
+@app.on_event("startup")
+async def start_background_workers():
+    """Restore snapshotted search indexes and start the compactor and change poller"""
+    vector_store.restore_indexes()
+    compactor.start()
+    change_poller.start()
+
+
+@app.on_event("shutdown")
+async def stop_background_workers():
+    """Stop the compactor and change poller, snapshot the search indexes, stop the summarizer and LLM backend"""
+    change_poller.stop()
+    compactor.stop()
+    vector_store.snapshot_indexes()
+    rag_engine.summarizer.shutdown()
+    rag_engine.llm.close()
 
 
 @app.get("/")
@@ -73,21 +134,28 @@ async def root():
 async def health_check():
     """Health check endpoint"""
     try:
-        stats = vector_store.get_stats()
+        vector_store.ping()
         return {
             "status": "healthy",
-            "database": "connected",
-            "stats": stats
+            "database": "connected"
         }
     except Exception as e:
         raise HTTPException(status_code=503, detail=f"Service unhealthy: {str(e)}")
 
 
+# Plain def: the status count (a database aggregation) runs in the thread pool, not on the event loop
+@app.get("/metrics")
+def metrics():
+    """Prometheus metrics endpoint"""
+    return Response(content=render_metrics(vector_store), media_type=CONTENT_TYPE_LATEST)
+
+
 async def process_document_background(
     document_id: str,
     file_path: str,
     file_type: str,
-    filename: str
+    filename: str,
+    namespace: str = DEFAULT_NAMESPACE
 ):
     """
     Background task to process document
@@ -97,73 +165,34 @@ async def process_document_background(
         file_path: Path to uploaded file
         file_type: Type of file
         filename: Original filename
+        namespace: Namespace of the document
     """
-    try:
-        # Update status to processing
-        vector_store.update_document_status(document_id, ProcessingStatus.PROCESSING)
-        
-        # Process document
-        chunks = document_processor.process_document(file_path, file_type, filename)
-        
-        # Generate embeddings for chunks
-        chunk_texts = [chunk[0] for chunk in chunks]
-        embeddings = embedding_generator.generate_embeddings_batch(chunk_texts)
-        
-        # Create DocumentChunk objects
-        document_chunks = []
-        for idx, ((chunk_text, metadata), embedding) in enumerate(zip(chunks, embeddings)):
-            chunk = DocumentChunk(
-                chunk_id=f"{document_id}_chunk_{idx}",
-                document_id=document_id,
-                document_name=filename,
-                content=chunk_text,
-                embedding=embedding,
-                metadata=metadata,
-                chunk_index=metadata["chunk_index"],
-                total_chunks=metadata["total_chunks"]
-            )
-            document_chunks.append(chunk)
-        
-        # Store chunks in vector store
-        vector_store.store_chunks_batch(document_chunks)
-        
-        # Update document status to completed
-        vector_store.update_document_status(
-            document_id,
-            ProcessingStatus.COMPLETED,
-            total_chunks=len(document_chunks)
-        )
-        
-        # Clean up uploaded file
-        os.remove(file_path)
-        
-    except Exception as e:
-        # Update status to failed
-        vector_store.update_document_status(
-            document_id,
-            ProcessingStatus.FAILED,
-            error_message=str(e)
-        )
-        
-        # Clean up file if it exists
-        if os.path.exists(file_path):
-            os.remove(file_path)
+    ingestion_pipeline.ingest([{
+        "document_id": document_id,
+        "file_path": file_path,
+        "file_type": file_type,
+        "filename": filename
+    }], namespace=namespace)
 
 
 @app.post("/api/upload", response_model=UploadResponse)
 async def upload_document(
     background_tasks: BackgroundTasks,
-    file: UploadFile = File(...)
+    file: UploadFile = File(...),
+    namespace: Optional[str] = None,
+    x_namespace: Optional[str] = Header(None)
 ):
     """
     Upload and process a document
     
     Args:
         file: Uploaded file
+        namespace: Namespace to add it to (or X-Namespace header; default: "default")
         
     Returns:
         Upload response with document ID
     """
+    namespace = resolve_namespace(namespace, x_namespace)
     try:
         # Validate file type
         file_type = validate_file_type(file.filename)
@@ -192,6 +221,7 @@ async def upload_document(
         # Create document metadata
         document = Document(
             document_id=document_id,
+            namespace=namespace,
             filename=file.filename,
             file_type=DocumentType(file_type),
             file_size=file_size,
@@ -207,7 +237,8 @@ async def upload_document(
             document_id,
             str(file_path),
             file_type,
-            file.filename
+            file.filename,
+            namespace
         )
         
         return UploadResponse(
@@ -223,8 +254,132 @@ async def upload_document(
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
 
+# Plain def: archive extraction, file writes and the bulk insert block, so they run in the thread pool
+@app.post("/api/upload/bulk", response_model=BulkUploadResponse)
+def upload_bulk(
+    background_tasks: BackgroundTasks,
+    files: List[UploadFile] = File(...),
+    namespace: Optional[str] = None,
+    x_namespace: Optional[str] = Header(None)
+):
+    """
+    Upload many documents, or zip/tar archives of documents, as one job
+    
+    Args:
+        files: Uploaded files and archives
+        namespace: Namespace to add them to (or X-Namespace header; default: "default")
+        
+    Returns:
+        Bulk upload response with the job ID
+    """
+    namespace = resolve_namespace(namespace, x_namespace)
+    max_size = int(os.getenv("MAX_FILE_SIZE_MB", "10")) * 1024 * 1024
+    max_files = int(os.getenv("BULK_UPLOAD_MAX_FILES", "500"))
+    job = ingestion_jobs.create()
+    documents, items = [], []
+    
+    def accept(filename: str, stream):
+        """Validate and save one file, recording it on the job"""
+        if len(items) >= max_files:
+            raise ValueError(f"Too many files. Maximum per upload: {max_files}")
+        file_type = validate_file_type(filename)
+        document_id = str(uuid.uuid4())
+        file_path = UPLOAD_DIR / f"{document_id}_{filename}"
+        file_size = save_stream(stream, file_path, max_size)
+        
+        documents.append(Document(
+            document_id=document_id,
+            namespace=namespace,
+            filename=filename,
+            file_type=DocumentType(file_type),
+            file_size=file_size,
+            status=ProcessingStatus.PENDING
+        ))
+        items.append({
+            "document_id": document_id,
+            "file_path": str(file_path),
+            "file_type": file_type,
+            "filename": filename
+        })
+        ingestion_jobs.add_file(job, FileIngestionStatus(
+            filename=filename,
+            document_id=document_id,
+            status=ProcessingStatus.PENDING
+        ))
+    
+    def reject(filename: str, error: Exception):
+        ingestion_jobs.add_file(job, FileIngestionStatus(
+            filename=filename,
+            status=ProcessingStatus.FAILED,
+            error_message=str(error)
+        ))
+    
+    try:
+        for upload in files:
+            if is_archive(upload.filename):
+                try:
+                    for name, stream in iter_archive(upload.file, upload.filename):
+                        try:
+                            accept(name, stream)
+                        except ValueError as e:
+                            reject(name, e)
+                except (zipfile.BadZipFile, tarfile.TarError) as e:
+                    reject(upload.filename, ValueError(f"Unreadable archive: {e}"))
+            else:
+                try:
+                    accept(upload.filename, upload.file)
+                except ValueError as e:
+                    reject(upload.filename, e)
+        
+        # One bulk write for all document records
+        vector_store.store_documents_batch(documents)
+        
+    except Exception as e:
+        for item in items:
+            if os.path.exists(item["file_path"]):
+                os.remove(item["file_path"])
+        raise HTTPException(status_code=500, detail=f"Bulk upload failed: {str(e)}")
+    
+    rejected = len(ingestion_jobs.get(job.job_id).files) - len(items)
+    if items:
+        background_tasks.add_task(ingestion_pipeline.ingest, items, ingestion_jobs.status_callback(job), namespace)
+    else:
+        ingestion_jobs.finish(job)
+    
+    return BulkUploadResponse(
+        success=bool(items),
+        job_id=job.job_id,
+        accepted=len(items),
+        rejected=rejected,
+        message=f"{len(items)} documents accepted, {rejected} rejected. Processing in background."
+    )
+
+
+@app.get("/api/upload/jobs/{job_id}", response_model=IngestionJob)
+async def get_ingestion_job(job_id: str):
+    """
+    Get the status of a bulk upload job
+    
+    Args:
+        job_id: Job ID returned by /api/upload/bulk
+        
+    Returns:
+        Job with per-file status
+    """
+    job = ingestion_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+# Plain def: FastAPI runs it in its thread pool, so concurrent queries overlap
+# (and their prompts can share a batch on the local LLM backend)
 @app.post("/api/query", response_model=QueryResponse)
-async def query_documents(request: QueryRequest):
+def query_documents(
+    request: QueryRequest,
+    x_session_id: Optional[str] = Header(None),
+    x_namespace: Optional[str] = Header(None)
+):
     """
     Query the knowledge base
     
@@ -234,30 +389,36 @@ async def query_documents(request: QueryRequest):
     Returns:
         Query response with answer and citations
     """
+    # An explicit namespace in the body wins over the header
+    namespace = request.namespace if "namespace" in request.model_fields_set else resolve_namespace(None, x_namespace)
     try:
         start_time = time.time()
         
         # Query RAG engine
-        answer, citations = rag_engine.query(request.question, request.top_k)
+        timings = {}
+        grounding = {}
+        answer, citations = rag_engine.query(
+            request.question, request.top_k, timings, request.mmr_lambda, grounding, namespace
+        )
         
         processing_time = time.time() - start_time
+        slow_query_log.maybe_log(request.question, request.top_k, processing_time * 1000, timings)
         
-        # Add to chat history
-        chat_history.append(ChatMessage(
-            role="user",
-            content=request.question
-        ))
-        chat_history.append(ChatMessage(
-            role="assistant",
-            content=answer,
-            citations=citations
-        ))
+        # Add to the session's chat history
+        session_id = request.session_id or x_session_id or str(uuid.uuid4())
+        chat_history.append(session_id, [
+            ChatMessage(role="user", content=request.question),
+            ChatMessage(role="assistant", content=answer, citations=citations)
+        ])
         
         return QueryResponse(
             answer=answer,
             citations=citations,
             retrieved_chunks=len(citations),
-            processing_time=processing_time
+            processing_time=processing_time,
+            timings=QueryTimings(**timings) if request.include_timings else None,
+            session_id=session_id,
+            grounding_score=grounding.get("score")
         )
         
     except Exception as e:
@@ -265,49 +426,75 @@ async def query_documents(request: QueryRequest):
 
 
 @app.get("/api/documents", response_model=KnowledgeBaseStats)
-async def get_documents():
+async def get_documents(
+    cursor: Optional[str] = None,
+    limit: int = Query(default=100, ge=1, le=1000),
+    fields: Optional[str] = None,
+    namespace: Optional[str] = None,
+    x_namespace: Optional[str] = Header(None)
+):
     """
-    Get all documents and knowledge base stats
+    Get a page of documents and knowledge base stats
     
+    Args:
+        cursor: next_cursor of the previous page (omit for the first page)
+        limit: Maximum number of documents
+        fields: Comma-separated Document fields to return (default: all)
+        namespace: Namespace to list (or X-Namespace header; default: "default")
+        
     Returns:
         Knowledge base statistics
     """
+    namespace = resolve_namespace(namespace, x_namespace)
+    field_list = [field.strip() for field in fields.split(",") if field.strip()] if fields else None
+    unknown = set(field_list or ()) - set(Document.model_fields)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown document fields: {', '.join(sorted(unknown))}")
+    
     try:
-        documents = vector_store.get_all_documents()
-        stats = vector_store.get_stats()
-        
-        # Convert to Document models
-        doc_models = [Document(**doc) for doc in documents]
-        
-        return KnowledgeBaseStats(
-            total_documents=stats["total_documents"],
-            total_chunks=stats["total_chunks"],
-            documents=doc_models
-        )
+        documents, next_cursor = vector_store.list_documents(cursor, limit, field_list, namespace)
+        stats = vector_store.get_stats(namespace)
+        
+        # Large pages: serialize the records directly instead of through the response model
+        return FastJSONResponse({
+            "total_documents": stats["total_documents"],
+            "total_chunks": stats["total_chunks"],
+            "documents": documents,
+            "next_cursor": next_cursor,
+            "namespace": namespace
+        })
         
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get documents: {str(e)}")
 
 
 @app.get("/api/documents/{document_id}/summary")
-async def get_document_summary(document_id: str):
+def get_document_summary(
+    document_id: str,
+    namespace: Optional[str] = None,
+    x_namespace: Optional[str] = Header(None)
+):
     """
     Get a summary of a specific document
     
     Args:
         document_id: Document ID to summarize
+        namespace: Namespace of the document (or X-Namespace header; default: "default")
         
     Returns:
         Document summary
     """
+    namespace = resolve_namespace(namespace, x_namespace)
     try:
         # Check if document exists
-        document = vector_store.get_document(document_id)
+        document = vector_store.get_document(document_id, namespace)
         if not document:
             raise HTTPException(status_code=404, detail="Document not found")
         
-        # Generate summary
-        summary = rag_engine.summarize_document(document_id)
+        # Stored summary, generated on first request if missing or stale
+        summary = rag_engine.summarize_document(document_id, document)
         
         return {
             "document_id": document_id,
@@ -322,22 +509,31 @@ async def get_document_summary(document_id: str):
 
 
 @app.delete("/api/documents/{document_id}")
-async def delete_document(document_id: str):
+async def delete_document(
+    document_id: str,
+    namespace: Optional[str] = None,
+    x_namespace: Optional[str] = Header(None)
+):
     """
     Delete a document and its chunks
     
     Args:
         document_id: Document ID to delete
+        namespace: Namespace of the document (or X-Namespace header; default: "default")
         
     Returns:
         Success message
     """
+    namespace = resolve_namespace(namespace, x_namespace)
     try:
-        success = vector_store.delete_document(document_id)
+        success = vector_store.delete_document(document_id, namespace)
         
         if not success:
             raise HTTPException(status_code=404, detail="Document not found")
         
+        # Chunks are removed in the background
+        compactor.wake()
+        
         return {"success": True, "message": "Document deleted successfully"}
         
     except HTTPException:
@@ -347,13 +543,24 @@ async def delete_document(document_id: str):
 
 
 @app.post("/api/reset")
-async def reset_knowledge_base():
+async def reset_knowledge_base(namespace: Optional[str] = None, x_namespace: Optional[str] = Header(None)):
     """
     Clear all documents and chunks
     
+    Args:
+        namespace: Only clear this namespace (or X-Namespace header; default: everything)
+    
     Returns:
         Success message
     """
+    if namespace or x_namespace:
+        namespace = resolve_namespace(namespace, x_namespace)
+        try:
+            vector_store.clear_all(namespace)
+            return {"success": True, "message": f"Namespace {namespace} reset successfully"}
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Reset failed: {str(e)}")
+    
     try:
         vector_store.clear_all()
         chat_history.clear()
@@ -364,26 +571,45 @@ async def reset_knowledge_base():
         raise HTTPException(status_code=500, detail=f"Reset failed: {str(e)}")
 
 
-@app.get("/api/chat/history")
-async def get_chat_history():
+@app.get("/api/chat/history", response_model=ChatHistoryPage)
+async def get_chat_history(
+    session_id: Optional[str] = None,
+    cursor: Optional[int] = None,
+    limit: int = Query(default=50, ge=1, le=200),
+    x_session_id: Optional[str] = Header(None)
+):
     """
-    Get chat history
+    Get a page of a session's chat history
     
+    Args:
+        session_id: Chat session (or X-Session-ID header)
+        cursor: next_cursor of the previous page (omit for the newest messages)
+        limit: Maximum number of messages
+        
     Returns:
-        List of chat messages
+        Messages oldest first, with the cursor of the next older page
     """
-    return {"messages": chat_history}
+    session_id = resolve_session_id(session_id, x_session_id)
+    messages, next_cursor = chat_history.get_page(session_id, cursor, limit)
+    return FastJSONResponse({"session_id": session_id, "messages": messages, "next_cursor": next_cursor})
 
 
 @app.delete("/api/chat/clear")
-async def clear_chat_history():
+async def clear_chat_history(
+    session_id: Optional[str] = None,
+    x_session_id: Optional[str] = Header(None)
+):
     """
-    Clear chat history
+    Clear a session's chat history
     
+    Args:
+        session_id: Chat session (or X-Session-ID header)
+        
     Returns:
         Success message
     """
-    chat_history.clear()
+    session_id = resolve_session_id(session_id, x_session_id)
+    chat_history.clear(session_id)
     return {"success": True, "message": "Chat history cleared"}
 
 
@@ -0,0 +1,168 @@
+"""
+Metrics Module
+Prometheus metrics for query and ingestion stages
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Optional
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
+from dotenv import load_dotenv
+
+from models import ProcessingStatus
+
+load_dotenv()
+
+# Documents by status are counted with a database aggregation, at most this often
+STATUS_COUNTS_TTL_SECONDS = float(os.getenv("METRICS_STATUS_TTL_SECONDS", "60"))
+
+# Latency buckets in seconds, from sub-millisecond search to multi-second LLM calls
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+QUERY_STAGE_SECONDS = Histogram(
+    "rag_query_stage_seconds",
+    "Query latency per stage",
+    ["stage"],
+    buckets=LATENCY_BUCKETS
+)
+
+INGEST_STAGE_SECONDS = Histogram(
+    "rag_ingest_stage_seconds",
+    "Ingestion latency per stage",
+    ["stage"],
+    buckets=LATENCY_BUCKETS
+)
+
+CACHE_REQUESTS = Counter(
+    "rag_cache_requests_total",
+    "Cache lookups by cache and result",
+    ["cache", "result"]
+)
+
+CACHE_HIT_RATIO = Gauge(
+    "rag_cache_hit_ratio",
+    "Fraction of cache lookups that hit since startup",
+    ["cache"]
+)
+
+LLM_ATTEMPTS = Counter(
+    "rag_llm_attempts_total",
+    "LLM generation attempts by outcome",
+    ["outcome"]
+)
+
+LLM_RETRIES = Counter(
+    "rag_llm_retries_total",
+    "LLM generation retries after a failed attempt"
+)
+
+INDEX_VECTORS = Gauge(
+    "rag_index_vectors",
+    "Vectors in the loaded search indexes"
+)
+
+INDEX_BYTES = Gauge(
+    "rag_index_bytes",
+    "Bytes held by search index vectors and codes"
+)
+
+INDEX_NAMESPACES = Gauge(
+    "rag_index_namespaces",
+    "Namespaces with a search index in memory"
+)
+
+DOCUMENTS_BY_STATUS = Gauge(
+    "rag_documents",
+    "Documents by processing status",
+    ["status"]
+)
+
+# Running hit/lookup tallies behind CACHE_HIT_RATIO (per process)
+_cache_tallies = {}
+_cache_tallies_lock = threading.Lock()
+
+# When DOCUMENTS_BY_STATUS was last refreshed (monotonic seconds)
+_status_counts_at: Optional[float] = None
+
+
+@contextmanager
+def time_stage(
+    histogram: Histogram,
+    stage: str,
+    timings: Optional[Dict[str, Any]] = None,
+    key: Optional[str] = None
+):
+    """
+    Observe the duration of a block in a stage histogram
+
+    Args:
+        histogram: QUERY_STAGE_SECONDS or INGEST_STAGE_SECONDS
+        stage: Stage label
+        timings: Optional per-request breakdown to add the duration to (in ms)
+        key: Breakdown key (defaults to "<stage>_ms")
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        histogram.labels(stage=stage).observe(elapsed)
+        if timings is not None:
+            key = key or f"{stage}_ms"
+            timings[key] = timings.get(key, 0.0) + elapsed * 1000
+
+
+def record_cache_lookups(cache: str, hits: int, misses: int):
+    """
+    Count cache hits and misses
+
+    Args:
+        cache: Cache name
+        hits: Number of hits
+        misses: Number of misses
+    """
+    if hits:
+        CACHE_REQUESTS.labels(cache=cache, result="hit").inc(hits)
+    if misses:
+        CACHE_REQUESTS.labels(cache=cache, result="miss").inc(misses)
+
+    with _cache_tallies_lock:
+        total_hits, total = _cache_tallies.get(cache, (0, 0))
+        total_hits, total = total_hits + hits, total + hits + misses
+        _cache_tallies[cache] = (total_hits, total)
+        if total:
+            CACHE_HIT_RATIO.labels(cache=cache).set(total_hits / total)
+
+
+def render_metrics(vector_store) -> bytes:
+    """
+    Refresh scrape-time gauges and render the exposition format
+
+    Index figures are read on every scrape; document counts by status
+    are refreshed once per METRICS_STATUS_TTL_SECONDS.
+
+    Args:
+        vector_store: VectorStore to read index and document figures from
+
+    Returns:
+        Prometheus text exposition
+    """
+    index_stats = vector_store.index_stats()
+    INDEX_VECTORS.set(index_stats["vectors"])
+    INDEX_BYTES.set(index_stats["bytes"])
+    INDEX_NAMESPACES.set(index_stats["namespaces"])
+
+    global _status_counts_at
+    now = time.monotonic()
+    if _status_counts_at is None or now - _status_counts_at >= STATUS_COUNTS_TTL_SECONDS:
+        _status_counts_at = now
+        counts = vector_store.count_documents_by_status()
+        for status in ProcessingStatus:
+            DOCUMENTS_BY_STATUS.labels(status=status.value).set(counts.get(status.value, 0))
+
+    return generate_latest()
@@ -4,6 +4,12 @@ from datetime import datetime
 from enum import Enum
 
 
+# Namespace used when none is given (and for records written before namespaces existed)
+DEFAULT_NAMESPACE = "default"
+# Namespaces end up in storage keys and directory names
+NAMESPACE_PATTERN = r"^[A-Za-z0-9_-]{1,64}$"
+
+
 class DocumentType(str, Enum):
     """Supported document types"""
     PDF = "pdf"
@@ -31,6 +37,7 @@ class DocumentChunk(BaseModel):
     chunk_index: int
     total_chunks: int
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    namespace: str = Field(default=DEFAULT_NAMESPACE, pattern=NAMESPACE_PATTERN)
 
 
 class Document(BaseModel):
@@ -44,6 +51,9 @@ class Document(BaseModel):
     uploaded_at: datetime = Field(default_factory=datetime.utcnow)
     processed_at: Optional[datetime] = None
     error_message: Optional[str] = None
+    summary: Optional[str] = None
+    summary_version: Optional[str] = None  # Content version the summary was made from
+    namespace: str = Field(default=DEFAULT_NAMESPACE, pattern=NAMESPACE_PATTERN)
 
 
 class UploadResponse(BaseModel):
@@ -55,6 +65,33 @@ class UploadResponse(BaseModel):
     total_chunks: Optional[int] = None
 
 
+class FileIngestionStatus(BaseModel):
+    """Status of one file in a bulk upload"""
+    filename: str
+    document_id: Optional[str] = None  # None if the file was rejected
+    status: ProcessingStatus
+    total_chunks: int = 0
+    error_message: Optional[str] = None
+
+
+class IngestionJob(BaseModel):
+    """A bulk upload and the status of each of its files"""
+    job_id: str
+    status: ProcessingStatus
+    files: List[FileIngestionStatus] = Field(default_factory=list)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    completed_at: Optional[datetime] = None
+
+
+class BulkUploadResponse(BaseModel):
+    """Response for a bulk upload"""
+    success: bool
+    job_id: str
+    accepted: int
+    rejected: int
+    message: str
+
+
 class Citation(BaseModel):
     """Citation information for an answer"""
     document_name: str
@@ -67,6 +104,26 @@ class QueryRequest(BaseModel):
     """Request for querying the knowledge base"""
     question: str
     top_k: int = Field(default=5, ge=1, le=10)
+    include_timings: bool = False
+    # MMR relevance/diversity trade-off (1.0 = pure relevance); server default if omitted
+    mmr_lambda: Optional[float] = Field(default=None, ge=0.0, le=1.0)
+    session_id: Optional[str] = None  # Chat session (a new one is started if omitted)
+    namespace: str = Field(default=DEFAULT_NAMESPACE, pattern=NAMESPACE_PATTERN)  # Tenant corpus to search
+
+
+class QueryTimings(BaseModel):
+    """Per-stage timing breakdown of a query"""
+    embed_ms: float = 0.0
+    search_ms: float = 0.0
+    fetch_ms: float = 0.0  # Loading the hit chunks from the backend
+    rerank_ms: float = 0.0
+    context_ms: float = 0.0
+    chunks_scanned: int = 0
+    llm_ms: float = 0.0
+    llm_attempts: int = 0
+    fallback_used: bool = False
+    fallback_ms: float = 0.0
+    grounding_ms: float = 0.0
 
 
 class QueryResponse(BaseModel):
@@ -75,6 +132,10 @@ class QueryResponse(BaseModel):
     citations: List[Citation]
     retrieved_chunks: int
     processing_time: float
+    timings: Optional[QueryTimings] = None
+    session_id: Optional[str] = None
+    # Share of the answer found in the retrieved chunks (None if nothing was checked)
+    grounding_score: Optional[float] = None
 
 
 class ChatMessage(BaseModel):
@@ -83,13 +144,23 @@ class ChatMessage(BaseModel):
     content: str
     citations: Optional[List[Citation]] = None
     timestamp: datetime = Field(default_factory=datetime.utcnow)
+    seq: Optional[int] = None  # Position in the session, used as pagination cursor
+
+
+class ChatHistoryPage(BaseModel):
+    """A page of a session's chat history, oldest message first"""
+    session_id: str
+    messages: List[ChatMessage]
+    next_cursor: Optional[int] = None  # Pass back as cursor for older messages
 
 
 class KnowledgeBaseStats(BaseModel):
-    """Statistics about the knowledge base"""
+    """Statistics about the knowledge base with a page of documents"""
     total_documents: int
     total_chunks: int
-    documents: List[Document]
+    documents: List[Dict[str, Any]]  # Document records, limited to the requested fields
+    next_cursor: Optional[str] = None  # Pass back as cursor for the next page
+    namespace: str = DEFAULT_NAMESPACE
 
 
 class ErrorResponse(BaseModel):
@@ -4,13 +4,20 @@ No API costs - completely free!
 """
 
 import os
-from typing import List, Tuple
-from huggingface_hub import InferenceClient
+import time
+from typing import List, Tuple, Dict, Any, Optional
 from dotenv import load_dotenv
 
-from models import Citation
-from embeddings import EmbeddingGenerator
+from models import Citation, DEFAULT_NAMESPACE
+from llm_backends import create_llm_backend
+from embeddings import create_embedding_generator
 from vector_store import VectorStore
+from reranker import CrossEncoderReranker
+from context_builder import ContextBuilder
+from summarizer import DocumentSummarizer
+from sentence_index import SentenceIndex
+from grounding import GroundingVerifier
+from metrics import QUERY_STAGE_SECONDS, LLM_ATTEMPTS, LLM_RETRIES, time_stage
 
 load_dotenv()
 
@@ -18,25 +25,40 @@ load_dotenv()
 class RAGEngine:
     """FREE Retrieval-Augmented Generation engine using Hugging Face"""
     
-    def __init__(self):
-        """Initialize FREE RAG engine"""
-        # Get Hugging Face token (optional, free!)
-        hf_token = os.getenv("HUGGINGFACE_API_TOKEN")
-        
-        if not hf_token or hf_token == "hf_your_token_here_optional":
-            print("⚠️  No Hugging Face token found. Using public inference (may be slower)")
-            print("💡 Get a FREE token at: https://huggingface.co/settings/tokens")
-            self.client = InferenceClient()
-        else:
-            print("✅ Using Hugging Face with your token")
-            self.client = InferenceClient(token=hf_token)
+    def __init__(self, embedding_generator=None, vector_store: VectorStore = None):
+        """
+        Initialize FREE RAG engine
         
-        # Free, high-quality model
-        self.model = os.getenv("LLM_MODEL", "mistralai/Mistral-7B-Instruct-v0.2")
+        Args:
+            embedding_generator: Shared embedding generator (created if not given)
+            vector_store: Shared vector store (created if not given)
+        """
+        # Remote Hugging Face inference (default) or a local model (LLM_BACKEND)
+        self.llm = create_llm_backend()
+        self.model = self.llm.model_name
         self.temperature = float(os.getenv("LLM_TEMPERATURE", "0.1"))
+        self.min_score = float(os.getenv("RAG_MIN_SCORE", "0.7"))
+        # Optional MMR diversity selection (unset = plain top-k)
+        mmr_lambda = os.getenv("RAG_MMR_LAMBDA", "")
+        self.mmr_lambda = float(mmr_lambda) if mmr_lambda else None
+        self.mmr_candidates = int(os.getenv("RAG_MMR_CANDIDATES", "50"))
+        
+        self.embedding_generator = embedding_generator or create_embedding_generator()
+        self.vector_store = vector_store or VectorStore()
+        self.context_builder = ContextBuilder()
+        self.summarizer = DocumentSummarizer(self._complete, self.vector_store)
+        self.sentence_index = SentenceIndex(self.vector_store.backend, self.embedding_generator)
+        self.fallback_sentences = int(os.getenv("FALLBACK_SENTENCES", "3"))
+        self.grounding = GroundingVerifier(self.sentence_index, self.embedding_generator)
+        
+        # Optional cross-encoder re-ranking stage
+        if os.getenv("ENABLE_RERANKER", "false").lower() == "true":
+            self.reranker = CrossEncoderReranker()
+        else:
+            self.reranker = None
         
-        self.embedding_generator = EmbeddingGenerator()
-        self.vector_store = VectorStore()
+        # Cached chunk state follows deletes and replacements made by any worker
+        self.vector_store.add_change_listener(self._invalidate_caches)
         
         self.system_prompt = """You are a precise document Q&A assistant. Your role is to answer questions STRICTLY based on the provided context from uploaded documents.
 
@@ -53,63 +75,95 @@ Remember: Accuracy and grounding are paramount. When in doubt, say you don't kno
         
         print(f"🆓 FREE RAG engine initialized with model: {self.model}")
     
-    def query(self, question: str, top_k: int = 5) -> Tuple[str, List[Citation]]:
+    def query(
+        self,
+        question: str,
+        top_k: int = 5,
+        timings: Optional[Dict[str, Any]] = None,
+        mmr_lambda: Optional[float] = None,
+        grounding: Optional[Dict[str, Any]] = None,
+        namespace: str = DEFAULT_NAMESPACE
+    ) -> Tuple[str, List[Citation]]:
         """
         Query the knowledge base and generate answer (FREE!)
         
         Args:
             question: User's question
             top_k: Number of chunks to retrieve
+            timings: Optional dict filled with the per-stage breakdown
+                (see QueryTimings)
+            mmr_lambda: MMR relevance/diversity trade-off (defaults to RAG_MMR_LAMBDA)
+            grounding: Optional dict filled with the answer's grounding check
+                (score, sentences, supported_sentences)
+            namespace: Namespace to search
             
         Returns:
             Tuple of (answer, citations)
         """
+        start_time = time.perf_counter()
+        
         # Generate query embedding (free!)
-        query_embedding = self.embedding_generator.generate_embedding(question)
+        with time_stage(QUERY_STAGE_SECONDS, "embed", timings):
+            query_embedding = self.embedding_generator.generate_embedding(question)
         
-        # Retrieve relevant chunks
+        # Retrieve relevant chunks (more candidates when re-ranking)
+        search_k = max(top_k, self.reranker.candidates) if self.reranker else top_k
+        # Times the index search and the chunk fetch as separate stages
         results = self.vector_store.similarity_search(
             query_embedding=query_embedding,
-            top_k=top_k,
-            min_score=0.7
+            top_k=search_k,
+            min_score=self.min_score,
+            stats=timings,
+            mmr_lambda=mmr_lambda if mmr_lambda is not None else self.mmr_lambda,
+            mmr_candidates=self.mmr_candidates,
+            namespace=namespace
         )
         
+        if self.reranker and len(results) > 1:
+            elapsed_ms = (time.perf_counter() - start_time) * 1000
+            if self.reranker.within_budget(question, results, elapsed_ms):
+                with time_stage(QUERY_STAGE_SECONDS, "rerank", timings):
+                    results = self.reranker.rerank(question, results, top_k)
+            else:
+                print("⏱️  Latency budget spent, skipping re-ranking")
+        results = results[:top_k]
+        
         if not results:
             return (
                 "I couldn't find this information in the uploaded document.",
                 []
             )
         
-        # Build context from retrieved chunks
-        context_parts = []
-        citations = []
+        # Build context: merge overlapping chunks, pack into the token budget
+        with time_stage(QUERY_STAGE_SECONDS, "context", timings):
+            context, citations = self.context_builder.build(results)
         
-        for idx, result in enumerate(results):
-            chunk = result["chunk"]
-            score = result["score"]
-            
-            context_parts.append(
-                f"[Source {idx + 1}] Document: {chunk['document_name']}, "
-                f"Section: {chunk['chunk_index']}\n{chunk['content']}\n"
-            )
-            
-            # Create citation
-            citation = Citation(
-                document_name=chunk["document_name"],
-                chunk_index=chunk["chunk_index"],
-                content_preview=chunk["content"][:200] + "..." if len(chunk["content"]) > 200 else chunk["content"],
-                relevance_score=score
-            )
-            citations.append(citation)
-        
-        context = "\n\n".join(context_parts)
+        # Chunks that made it into the context
+        cited = {(citation.document_name, citation.chunk_index) for citation in citations}
+        context_results = [
+            result for result in results
+            if (result["chunk"]["document_name"], result["chunk"]["chunk_index"]) in cited
+        ]
+        context_chunk_ids = [result["chunk"]["chunk_id"] for result in context_results]
         
         # Generate answer using free LLM
-        answer = self._generate_answer(question, context, citations)
+        answer = self._generate_answer(question, context, citations, timings, query_embedding, context_chunk_ids)
+        
+        if grounding is not None:
+            with time_stage(QUERY_STAGE_SECONDS, "grounding", timings):
+                grounding.update(self.grounding.verify(answer, context_results))
         
         return answer, citations
     
-    def _generate_answer(self, question: str, context: str, citations: List[Citation]) -> str:
+    def _generate_answer(
+        self,
+        question: str,
+        context: str,
+        citations: List[Citation],
+        timings: Optional[Dict[str, Any]] = None,
+        query_embedding: Optional[List[float]] = None,
+        chunk_ids: Optional[List[str]] = None
+    ) -> str:
         """
         Generate answer using FREE Hugging Face LLM with retry logic
         
@@ -117,6 +171,9 @@ Remember: Accuracy and grounding are paramount. When in doubt, say you don't kno
             question: User's question
             context: Retrieved context
             citations: Citations list
+            timings: Optional per-request breakdown (llm_ms, llm_attempts, fallback_used)
+            query_embedding: Question embedding, for the sentence-level fallback
+            chunk_ids: Chunks in the context, for the sentence-level fallback
             
         Returns:
             Generated answer
@@ -133,26 +190,28 @@ Please provide a precise answer based ONLY on the context above. Include citatio
         # Try Hugging Face API with retry logic
         max_retries = 2
         for attempt in range(max_retries):
+            if attempt > 0:
+                LLM_RETRIES.inc()
+            if timings is not None:
+                timings["llm_attempts"] = attempt + 1
             try:
                 print(f"🆓 Generating answer with FREE AI model (attempt {attempt + 1}/{max_retries})...")
                 
-                # Use free Hugging Face inference
-                response = self.client.text_generation(
-                    user_prompt,
-                    model=self.model,
-                    max_new_tokens=500,
-                    temperature=self.temperature,
-                    return_full_text=False
-                )
+                with time_stage(QUERY_STAGE_SECONDS, "llm_generate", timings, "llm_ms"):
+                    response = self.llm.generate(user_prompt, 500, self.temperature)
                 
                 answer = response.strip()
                 
                 # Check if we got a valid answer
                 if answer and len(answer) > 20:
+                    LLM_ATTEMPTS.labels(outcome="success").inc()
                     print("✅ Successfully generated answer with AI")
                     return answer
                 
+                LLM_ATTEMPTS.labels(outcome="empty").inc()
+                
             except Exception as e:
+                LLM_ATTEMPTS.labels(outcome="error").inc()
                 print(f"⚠️  Attempt {attempt + 1} failed: {e}")
                 if attempt < max_retries - 1:
                     import time
@@ -161,7 +220,37 @@ Please provide a precise answer based ONLY on the context above. Include citatio
         
         # If all retries failed, use intelligent fallback
         print("💡 Using intelligent fallback: extractive summarization")
-        return self._intelligent_fallback(question, citations)
+        if timings is not None:
+            timings["fallback_used"] = True
+        with time_stage(QUERY_STAGE_SECONDS, "fallback", timings):
+            if query_embedding is not None and chunk_ids:
+                answer = self._sentence_fallback(query_embedding, chunk_ids)
+                if answer:
+                    return answer
+            # Chunks indexed before the sentence index existed
+            return self._intelligent_fallback(question, citations)
+    
+    def _sentence_fallback(self, query_embedding: List[float], chunk_ids: List[str]) -> Optional[str]:
+        """
+        Extractive answer from the indexed sentences most similar to the question
+        
+        Args:
+            query_embedding: Question embedding
+            chunk_ids: Chunks to answer from
+            
+        Returns:
+            Answer with citations, or None if the chunks have no indexed sentences
+        """
+        ranked = self.sentence_index.rank(query_embedding, chunk_ids, self.fallback_sentences)
+        if not ranked:
+            return None
+        
+        # One line per sentence, each with its own source
+        lines = [
+            f"- {sentence['text']} [Source: {sentence['document_name']}, Section {sentence['chunk_index']}]"
+            for sentence, _ in ranked
+        ]
+        return "Based on the uploaded documents:\n\n" + "\n".join(lines)
     
     def _intelligent_fallback(self, question: str, citations: List[Citation]) -> str:
         """
@@ -248,56 +337,74 @@ Please provide a precise answer based ONLY on the context above. Include citatio
         """
         return self._intelligent_fallback("", citations)
     
-    def summarize_document(self, document_id: str) -> str:
+    def _invalidate_caches(self, changes: List[Dict[str, Any]]):
+        """
+        Drop cached chunk state made stale by logged changes
+        
+        Deleted, compacted and (re-)inserted documents are evicted by ID:
+        a re-indexed document reuses its chunk IDs for new content.
+        
+        Args:
+            changes: Change-log entries
+        """
+        if any(change["op"] in ("clear", "reload") for change in changes):
+            document_ids = None
+        else:
+            document_ids = {
+                document_id for change in changes if change["op"] in ("delete", "compact", "insert")
+                for document_id in change["document_ids"]
+            }
+            if not document_ids:
+                return
+        
+        self.grounding.invalidate(document_ids)
+        if self.reranker:
+            self.reranker.invalidate(document_ids)
+    
+    def _complete(self, prompt: str, max_new_tokens: int, temperature: float) -> str:
         """
-        Generate a summary of a document
+        Run a plain completion on the LLM
+        
+        Args:
+            prompt: Prompt text
+            max_new_tokens: Maximum tokens to generate
+            temperature: Sampling temperature
+            
+        Returns:
+            Generated text
+        """
+        return self.llm.generate(prompt, max_new_tokens, temperature).strip()
+    
+    def summarize_document(self, document_id: str, document: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Get the summary of a document
+        
+        The stored summary is returned while it is current; otherwise the
+        whole document is summarized (map-reduce) and the result stored.
         
         Args:
             document_id: Document ID to summarize
+            document: Document record, if already loaded
             
         Returns:
             Document summary
         """
-        # Get all chunks for this document
-        all_chunks = self.vector_store.get_document_chunks(document_id)
-        
-        if not all_chunks:
+        document = document or self.vector_store.get_document(document_id)
+        if not document:
             return "Document not found or has no content."
         
-        # Get document name
-        doc_name = all_chunks[0].get('document_name', 'Unknown')
-        total_chunks = len(all_chunks)
+        doc_name = document.get("filename", "Unknown")
+        total_chunks = document.get("total_chunks", 0)
         
-        # Take first few chunks for summary (beginning of document)
-        summary_chunks = all_chunks[:min(3, total_chunks)]
-        
-        # Combine content
-        combined_content = '\n\n'.join([chunk['content'][:500] for chunk in summary_chunks])
-        
-        # Try to generate AI summary
-        summary_prompt = f"""Provide a concise summary (3-4 sentences) of this document based on the following excerpt:
-
-{combined_content}
-
-Summary:"""
-        
-        try:
-            response = self.client.text_generation(
-                summary_prompt,
-                model=self.model,
-                max_new_tokens=200,
-                temperature=0.3,
-                return_full_text=False
-            )
-            
-            summary = response.strip()
-            if summary and len(summary) > 20:
-                return f"**{doc_name}**\n\n{summary}\n\n*Document contains {total_chunks} sections*"
-        
-        except Exception as e:
-            print(f"⚠️  AI summary failed: {e}")
+        summary = self.summarizer.get_summary(document)
+        if summary:
+            return f"**{doc_name}**\n\n{summary}\n\n*Document contains {total_chunks} sections*"
         
         # Fallback: extractive summary
+        all_chunks = self.vector_store.get_document_chunks(document_id, document.get("namespace"))
+        if not all_chunks:
+            return "Document not found or has no content."
+        
         first_chunk = all_chunks[0]['content']
         preview = first_chunk[:400] + "..." if len(first_chunk) > 400 else first_chunk
         
@@ -305,7 +412,7 @@ Summary:"""
 
 {preview}
 
-*This document contains {total_chunks} sections. Upload complete.*"""
+*This document contains {len(all_chunks)} sections. Upload complete.*"""
 
     
     def validate_answer_grounding(self, answer: str, context: str) -> bool:
@@ -319,19 +426,8 @@ Summary:"""
         Returns:
             True if answer appears grounded
         """
-        # Simple heuristic: check if key phrases from answer appear in context
-        # This is a basic implementation; production systems would use more sophisticated methods
-        
         if "couldn't find" in answer.lower():
             return True  # Valid response for no information
         
-        # Extract key phrases (simple word-based approach)
-        answer_words = set(answer.lower().split())
-        context_words = set(context.lower().split())
-        
-        # Check overlap
-        overlap = len(answer_words & context_words)
-        overlap_ratio = overlap / len(answer_words) if answer_words else 0
-        
-        # At least 30% of answer words should appear in context
-        return overlap_ratio >= 0.3
+        score = self.grounding.verify_text(answer, context)
+        return score is None or score >= self.grounding.threshold
@@ -0,0 +1,167 @@
+"""
+Re-ranker Module
+Cross-encoder re-ranking of retrieved chunks (runs locally on CPU)
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Iterable
+from sentence_transformers import CrossEncoder
+from dotenv import load_dotenv
+
+from metrics import record_cache_lookups
+
+load_dotenv()
+
+
+class CrossEncoderReranker:
+    """Re-rank retrieval candidates with a local cross-encoder"""
+
+    def __init__(self, model_name: str = None):
+        """
+        Initialize the cross-encoder re-ranker
+
+        Args:
+            model_name: Hugging Face model name or local path of the cross-encoder
+        """
+        self.model_name = model_name or os.getenv(
+            "RERANKER_MODEL",
+            "cross-encoder/ms-marco-MiniLM-L-6-v2"
+        )
+        self.candidates = int(os.getenv("RERANK_CANDIDATES", "20"))
+        self.batch_size = int(os.getenv("RERANK_BATCH_SIZE", "32"))
+        self.cache_size = int(os.getenv("RERANK_CACHE_SIZE", "10000"))
+        # Total query latency budget in ms (0 = no budget)
+        self.latency_budget_ms = float(os.getenv("RERANK_LATENCY_BUDGET_MS", "0"))
+
+        # (question, document_id, chunk_id) -> cross-encoder score
+        self._cache: "OrderedDict[tuple, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Running estimate of the cost of scoring one pair, in ms
+        self._ms_per_pair: Optional[float] = None
+
+        print(f"🔁 Loading re-ranker model: {self.model_name}")
+        # A local directory is loaded as-is, without contacting the hub
+        self.model = CrossEncoder(self.model_name, device="cpu")
+        print("✅ Re-ranker model loaded!")
+
+    def _cache_key(self, question: str, chunk: Dict[str, Any]) -> tuple:
+        """Build the pair cache key for a question and chunk"""
+        chunk_key = chunk.get("chunk_id") or hash(chunk["content"])
+        return (question.strip().lower(), chunk.get("document_id"), chunk_key)
+
+    def invalidate(self, document_ids: Optional[Iterable[str]] = None):
+        """
+        Drop cached scores of chunks that were deleted or replaced
+
+        Args:
+            document_ids: Documents whose chunks to drop (None = everything)
+        """
+        with self._lock:
+            if document_ids is None:
+                self._cache.clear()
+                return
+            document_ids = set(document_ids)
+            for key in [key for key in self._cache if key[1] in document_ids]:
+                del self._cache[key]
+
+    def estimated_cost_ms(self, question: str, results: List[Dict[str, Any]]) -> float:
+        """
+        Estimate how long re-ranking these results would take
+
+        Args:
+            question: User's question
+            results: Retrieval results
+
+        Returns:
+            Estimated cost in milliseconds (0 if nothing needs scoring)
+        """
+        keys = [self._cache_key(question, result["chunk"]) for result in results]
+        with self._lock:
+            uncached = sum(1 for key in keys if key not in self._cache)
+        if uncached == 0 or self._ms_per_pair is None:
+            return 0.0
+        return uncached * self._ms_per_pair
+
+    def within_budget(self, question: str, results: List[Dict[str, Any]], elapsed_ms: float) -> bool:
+        """
+        Check whether re-ranking still fits in the latency budget
+
+        Args:
+            question: User's question
+            results: Retrieval results
+            elapsed_ms: Time already spent on this query
+
+        Returns:
+            True if re-ranking should run
+        """
+        if self.latency_budget_ms <= 0:
+            return True
+
+        projected = elapsed_ms + self.estimated_cost_ms(question, results)
+        return projected < self.latency_budget_ms
+
+    def rerank(
+        self,
+        question: str,
+        results: List[Dict[str, Any]],
+        top_k: int
+    ) -> List[Dict[str, Any]]:
+        """
+        Score (question, chunk) pairs in one batch and keep the best top_k
+
+        Args:
+            question: User's question
+            results: Retrieval results ({"chunk", "score"} dicts)
+            top_k: Number of results to keep
+
+        Returns:
+            Re-ranked results, each with an added "rerank_score"
+        """
+        if not results:
+            return results
+
+        keys = [self._cache_key(question, result["chunk"]) for result in results]
+        with self._lock:
+            scores_by_key = {key: self._cache[key] for key in keys if key in self._cache}
+        missing = [i for i, key in enumerate(keys) if key not in scores_by_key]
+        record_cache_lookups("rerank_pairs", len(keys) - len(missing), len(missing))
+
+        if missing:
+            pairs = [(question, results[i]["chunk"]["content"]) for i in missing]
+
+            start = time.perf_counter()
+            scores = self.model.predict(
+                pairs,
+                batch_size=self.batch_size,
+                show_progress_bar=False
+            )
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+            # Exponential moving average of the per-pair cost
+            per_pair = elapsed_ms / len(pairs)
+            if self._ms_per_pair is None:
+                self._ms_per_pair = per_pair
+            else:
+                self._ms_per_pair = 0.8 * self._ms_per_pair + 0.2 * per_pair
+
+            for i, score in zip(missing, scores):
+                scores_by_key[keys[i]] = float(score)
+
+        # Refresh LRU order and store new scores
+        with self._lock:
+            for key in keys:
+                self._cache[key] = scores_by_key[key]
+                self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+        reranked = [
+            {**result, "rerank_score": scores_by_key[key]}
+            for key, result in zip(keys, results)
+        ]
+
+        reranked.sort(key=lambda x: x["rerank_score"], reverse=True)
+        return reranked[:top_k]
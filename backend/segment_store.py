@@ -0,0 +1,377 @@
+"""
+Segment Store Module
+Append-only, memory-mapped on-disk vector segments
+"""
+
+import os
+import json
+import threading
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+import numpy as np
+from dotenv import load_dotenv
+
+from vector_index import IndexSegment, normalize_rows, pack_sign_bits
+
+load_dotenv()
+
+# Rows copied per step when a merge streams segments into a new file
+_MERGE_BLOCK_ROWS = 65536
+
+
+class SegmentStore:
+    """
+    On-disk vector segments served from the OS page cache
+
+    Each segment is three files: normalized float32 vectors and packed
+    sign-bit codes as .npy (opened with np.memmap), plus a sidecar
+    .ids.json table mapping row offsets to chunk and document IDs.
+    manifest.json lists the live segments, the projection version of the
+    vectors, the change-log generation they reflect and, per segment, the
+    documents deleted since it was written (a document re-indexed under
+    the same ID stays visible in newer segments).
+
+    Deleted rows are masked when a segment is opened and dropped when
+    that segment is next rewritten by merge(). Merges are planned per
+    segment: segments holding deleted rows are rewritten on their own,
+    and past VECTOR_SEGMENT_MAX_SEGMENTS the smallest segments are merged
+    together, so large segments are rarely rewritten. Merges stream to
+    disk and are run by the compactor, not by writers.
+    """
+
+    def __init__(self, directory: str = None):
+        """
+        Initialize the segment store
+
+        Args:
+            directory: Segment directory (defaults to VECTOR_SEGMENT_DIR)
+        """
+        self.directory = Path(directory or os.getenv("VECTOR_SEGMENT_DIR", "vector_segments"))
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Merge the smallest segments once more than this many exist
+        self.max_segments = int(os.getenv("VECTOR_SEGMENT_MAX_SEGMENTS", "8"))
+        self._lock = threading.RLock()
+        self.manifest = self._read_manifest()
+        # Opened segments by name, so ID tables are parsed once
+        self._segments: Dict[str, IndexSegment] = {}
+        self._documents: Dict[str, set] = {}
+
+    @property
+    def _manifest_path(self) -> Path:
+        return self.directory / "manifest.json"
+
+    def _read_manifest(self) -> Dict[str, Any]:
+        """Read the manifest, or start an empty one"""
+        if self._manifest_path.exists():
+            with open(self._manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            manifest.setdefault("generation", None)
+            manifest.setdefault("deleted", {})
+            return manifest
+        return {
+            "version": None,
+            "generation": None,
+            "segments": [],
+            "next_segment": 1,
+            "deleted": {}
+        }
+
+    def _write_manifest(self):
+        """Atomically replace the manifest"""
+        tmp_path = self._manifest_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f)
+        os.replace(tmp_path, self._manifest_path)
+
+    def _paths(self, name: str):
+        """Vector, code and ID-table paths of a segment"""
+        return (
+            self.directory / f"{name}.vectors.npy",
+            self.directory / f"{name}.codes.npy",
+            self.directory / f"{name}.ids.json"
+        )
+
+    def _next_name(self) -> str:
+        """Reserve the name of a new segment"""
+        name = f"seg-{self.manifest['next_segment']:06d}"
+        self.manifest["next_segment"] += 1
+        return name
+
+    def _write_ids(self, name: str, chunk_ids: List[str], document_ids: List[str]):
+        with open(self._paths(name)[2], "w", encoding="utf-8") as f:
+            json.dump({"chunk_ids": list(chunk_ids), "document_ids": list(document_ids)}, f)
+
+    def _remove_files(self, name: str):
+        """Delete a segment's files"""
+        self._segments.pop(name, None)
+        self._documents.pop(name, None)
+        for path in self._paths(name):
+            try:
+                path.unlink(missing_ok=True)
+            except OSError:
+                # Still mapped by a reader (Windows); left for manual cleanup
+                print(f"⚠️  Could not remove {path}")
+
+    def _open_segment(self, name: str) -> IndexSegment:
+        """Open a segment with its arrays memory-mapped and deleted rows masked"""
+        segment = self._segments.get(name)
+        if segment is None:
+            vectors_path, codes_path, ids_path = self._paths(name)
+            with open(ids_path, "r", encoding="utf-8") as f:
+                ids = json.load(f)
+            segment = IndexSegment(
+                ids["chunk_ids"],
+                ids["document_ids"],
+                np.load(vectors_path, mmap_mode="r"),
+                np.load(codes_path, mmap_mode="r")
+            )
+            self._segments[name] = segment
+            self._documents[name] = set(ids["document_ids"])
+        self._mask_deleted(segment, self.manifest["deleted"].get(name, []))
+        return segment
+
+    @staticmethod
+    def _mask_deleted(segment: IndexSegment, document_ids: List[str]):
+        """Mark the rows of deleted documents as not alive"""
+        if not document_ids:
+            return
+        dead = np.isin(segment.document_ids, document_ids)
+        if dead.any():
+            alive = segment.alive.copy() if segment.alive is not None else np.ones(len(segment), dtype=bool)
+            alive[dead] = False
+            segment.alive = alive
+
+    def reusable_generation(self, version: str) -> Optional[int]:
+        """
+        Change-log generation the segments reflect
+
+        Args:
+            version: Projection version of the search vectors
+
+        Returns:
+            The generation to replay changes from, or None if the segments
+            hold other vectors or predate generation tracking
+        """
+        if self.manifest["version"] != version:
+            return None
+        return self.manifest["generation"]
+
+    def set_generation(self, generation: int):
+        """
+        Record that the segments reflect every change up to a generation
+
+        Args:
+            generation: Change-log generation
+        """
+        with self._lock:
+            if self.manifest["generation"] != generation:
+                self.manifest["generation"] = generation
+                self._write_manifest()
+
+    def live_rows(self) -> int:
+        """Number of rows not deleted"""
+        with self._lock:
+            return sum(len(segment) - self._deleted_rows(name, segment) for name, segment in self._named_segments())
+
+    def _named_segments(self):
+        return [(name, self._open_segment(name)) for name in self.manifest["segments"]]
+
+    def _deleted_rows(self, name: str, segment: IndexSegment) -> int:
+        deleted = self.manifest["deleted"].get(name)
+        return int(np.isin(segment.document_ids, deleted).sum()) if deleted else 0
+
+    def append(self, chunk_ids: List[str], document_ids: List[str], vectors: np.ndarray) -> IndexSegment:
+        """
+        Append vectors as a new segment
+
+        Args:
+            chunk_ids: Chunk IDs
+            document_ids: Document ID of each chunk
+            vectors: Search vectors (n x d)
+
+        Returns:
+            The new segment, memory-mapped
+        """
+        vectors = normalize_rows(np.asarray(vectors, dtype=np.float32))
+        with self._lock:
+            name = self._next_name()
+            vectors_path, codes_path, _ = self._paths(name)
+            np.save(vectors_path, vectors)
+            np.save(codes_path, pack_sign_bits(vectors))
+            self._write_ids(name, chunk_ids, document_ids)
+
+            self.manifest["segments"].append(name)
+            self._write_manifest()
+            return self._open_segment(name)
+
+    def delete_document(self, document_id: str) -> int:
+        """
+        Mask a document's rows until the segments holding them are merged
+
+        Args:
+            document_id: Document ID
+
+        Returns:
+            Number of rows masked
+        """
+        with self._lock:
+            names = [
+                name for name in self.manifest["segments"]
+                if document_id in self._document_set(name)
+                and document_id not in self.manifest["deleted"].get(name, [])
+            ]
+            if not names:
+                return 0
+            for name in names:
+                self.manifest["deleted"].setdefault(name, []).append(document_id)
+            self._write_manifest()
+
+            rows = 0
+            for name in names:
+                segment = self._segments[name]
+                self._mask_deleted(segment, [document_id])
+                rows += int((segment.document_ids == document_id).sum())
+            return rows
+
+    def _document_set(self, name: str) -> set:
+        if name not in self._documents:
+            self._open_segment(name)
+        return self._documents[name]
+
+    def merge_plan(self) -> List[List[str]]:
+        """
+        Groups of segments that should each be rewritten as one
+
+        Returns:
+            Segments holding deleted rows (one group each), then the
+            smallest segments if there are more than VECTOR_SEGMENT_MAX_SEGMENTS
+        """
+        with self._lock:
+            names = list(self.manifest["segments"])
+            dirty = [name for name in names if self.manifest["deleted"].get(name)]
+            groups = [[name] for name in dirty]
+
+            if len(names) > self.max_segments:
+                clean = sorted(
+                    (name for name in names if name not in dirty),
+                    key=lambda name: len(self._open_segment(name))
+                )
+                smallest = clean[:max(2, len(names) - self.max_segments + 1)]
+                if len(smallest) >= 2:
+                    groups.append(smallest)
+            return groups
+
+    def needs_merge(self) -> bool:
+        """True if segments should be merged"""
+        return bool(self.merge_plan())
+
+    def merge(self, names: List[str]) -> Optional[str]:
+        """
+        Rewrite segments as one, dropping deleted rows
+
+        Rows are streamed into the new files block by block, so memory use
+        does not grow with the segment size. Segments appended meanwhile
+        are kept; if the merged segments were removed meanwhile (reset),
+        the result is discarded.
+
+        Args:
+            names: Segments to merge
+
+        Returns:
+            Name of the new segment, or None if nothing was left or merged
+        """
+        with self._lock:
+            if not all(name in self.manifest["segments"] for name in names):
+                return None
+            deleted = {old: list(self.manifest["deleted"].get(old, [])) for old in names}
+            segments = [self._open_segment(old) for old in names]
+            name = self._next_name()
+            self._write_manifest()
+
+        keeps = [
+            ~np.isin(segment.document_ids, deleted[old]) if deleted[old] else np.ones(len(segment), dtype=bool)
+            for old, segment in zip(names, segments)
+        ]
+        rows = sum(int(keep.sum()) for keep in keeps)
+
+        if rows:
+            vectors_path, codes_path, _ = self._paths(name)
+            vectors = np.lib.format.open_memmap(
+                vectors_path, mode="w+", dtype=np.float32, shape=(rows, segments[0].vectors.shape[1])
+            )
+            codes = np.lib.format.open_memmap(
+                codes_path, mode="w+", dtype=np.uint8, shape=(rows, segments[0].codes.shape[1])
+            )
+            chunk_ids, document_ids = [], []
+            position = 0
+            for segment, keep in zip(segments, keeps):
+                for start in range(0, len(segment), _MERGE_BLOCK_ROWS):
+                    block = keep[start:start + _MERGE_BLOCK_ROWS]
+                    count = int(block.sum())
+                    vectors[position:position + count] = segment.vectors[start:start + _MERGE_BLOCK_ROWS][block]
+                    codes[position:position + count] = segment.codes[start:start + _MERGE_BLOCK_ROWS][block]
+                    position += count
+                chunk_ids.extend(cid for cid, k in zip(segment.chunk_ids, keep) if k)
+                document_ids.extend(segment.document_ids[keep].tolist())
+            vectors.flush()
+            codes.flush()
+            del vectors, codes
+            self._write_ids(name, chunk_ids, document_ids)
+
+        with self._lock:
+            current = self.manifest["segments"]
+            if not all(old in current for old in names):
+                if rows:
+                    self._remove_files(name)
+                return None
+            position = current.index(names[0])
+            remaining = [old for old in current if old not in names]
+            self.manifest["segments"] = remaining[:position] + ([name] if rows else []) + remaining[position:]
+            # Deletes made during the merge carry over to the new segment
+            carried = sorted({
+                document_id for old in names
+                for document_id in self.manifest["deleted"].pop(old, [])
+                if document_id not in deleted[old]
+            })
+            if rows and carried:
+                self.manifest["deleted"][name] = carried
+            self._write_manifest()
+
+            # Old files are unlinked only after the manifest no longer lists them
+            for old in names:
+                self._remove_files(old)
+
+        print(f"🧱 Merged {len(names)} vector segments ({rows} vectors)")
+        return name if rows else None
+
+    def load(self) -> List[IndexSegment]:
+        """
+        Open all live segments
+
+        Returns:
+            Memory-mapped segments
+        """
+        with self._lock:
+            return [self._open_segment(name) for name in self.manifest["segments"]]
+
+    def reset(self, version: Optional[str]):
+        """
+        Remove all segments and start over
+
+        Args:
+            version: Projection version of the vectors that will be appended
+        """
+        with self._lock:
+            for name in self.manifest["segments"]:
+                self._remove_files(name)
+            self._segments.clear()
+            self._documents.clear()
+
+            self.manifest = {
+                "version": version,
+                "generation": None,
+                "segments": [],
+                "next_segment": self.manifest["next_segment"],
+                "deleted": {}
+            }
+            self._write_manifest()
@@ -0,0 +1,160 @@
+"""
+Sentence Index Module
+Sentence-level embeddings of stored chunks, used for extractive answers
+"""
+
+import os
+import re
+from typing import List, Dict, Any, Tuple
+import numpy as np
+from dotenv import load_dotenv
+
+from models import DEFAULT_NAMESPACE
+from store_backends import VectorStoreBackend
+from vector_index import normalize_rows
+
+load_dotenv()
+
+# Sentence ends, or line breaks (list items are sentences of their own)
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n+")
+# List bullets and numbering in front of a sentence
+_LIST_MARKER = re.compile(r"^(?:[-*•]|\d+[.)])\s+")
+
+
+def split_sentences(text: str, min_chars: int = 20) -> List[str]:
+    """
+    Split text into sentences
+
+    Args:
+        text: Text to split
+        min_chars: Shorter fragments are dropped
+
+    Returns:
+        Sentences in order, without markdown headings and list markers
+    """
+    sentences = (_LIST_MARKER.sub("", sentence.strip()) for sentence in _SENTENCE_BOUNDARY.split(text))
+    return [
+        sentence for sentence in sentences
+        if len(sentence) >= min_chars and not sentence.startswith("#")
+    ]
+
+
+def chunk_sentences(chunk: Dict[str, Any], min_chars: int = 20) -> List[str]:
+    """
+    Sentences of a chunk, without the fragments cut at its boundaries
+
+    Chunks overlap, so a sentence cut at one chunk's edge is whole in its
+    neighbour.
+
+    Args:
+        chunk: Chunk record to split
+        min_chars: Shorter fragments are dropped
+
+    Returns:
+        Sentences in order
+    """
+    sentences = split_sentences(chunk["content"], min_chars)
+    if sentences and chunk["chunk_index"] > 0 and not sentences[0][0].isupper() and not sentences[0][0].isdigit():
+        sentences = sentences[1:]
+    if sentences and chunk["chunk_index"] < chunk["total_chunks"] - 1 and not sentences[-1].endswith((".", "!", "?")):
+        sentences = sentences[:-1]
+    return sentences
+
+
+class SentenceIndex:
+    """
+    Embedded sentences of every chunk
+
+    Sentences are split and embedded in batches at ingest and stored per
+    chunk. At query time the sentences of the retrieved chunks are fetched
+    in one call and ranked with a single matrix-vector product.
+    """
+
+    def __init__(self, backend: VectorStoreBackend, embedding_generator):
+        """
+        Initialize the sentence index
+
+        Args:
+            backend: Storage backend
+            embedding_generator: Embedding generator (same model as the chunks)
+        """
+        self.backend = backend
+        self.embedding_generator = embedding_generator
+        self.enabled = os.getenv("SENTENCE_INDEX", "true").lower() == "true"
+        self.min_chars = int(os.getenv("SENTENCE_MIN_CHARS", "20"))
+        self.batch_size = int(os.getenv("INGEST_EMBED_BATCH_SIZE", "256"))
+
+    def index_chunks(self, chunks: List[Dict[str, Any]]) -> int:
+        """
+        Split, embed and store the sentences of chunks
+
+        Args:
+            chunks: Stored chunk records
+
+        Returns:
+            Number of sentences stored
+        """
+        if not self.enabled:
+            return 0
+
+        records = [
+            {
+                "sentence_id": f"{chunk['chunk_id']}_s{position}",
+                "chunk_id": chunk["chunk_id"],
+                "document_id": chunk["document_id"],
+                "namespace": chunk.get("namespace", DEFAULT_NAMESPACE),
+                "document_name": chunk["document_name"],
+                "chunk_index": chunk["chunk_index"],
+                "position": position,
+                "text": sentence
+            }
+            for chunk in chunks
+            for position, sentence in enumerate(chunk_sentences(chunk, self.min_chars))
+        ]
+
+        stored = 0
+        for start in range(0, len(records), self.batch_size):
+            batch = records[start:start + self.batch_size]
+            embeddings = self.embedding_generator.generate_embeddings_batch([record["text"] for record in batch])
+            # Stored normalized, so ranking is a plain dot product
+            vectors = normalize_rows(np.asarray(embeddings, dtype=np.float32))
+            for record, vector in zip(batch, vectors):
+                record["embedding"] = vector.tolist()
+            stored += self.backend.insert_sentences(batch)
+        return stored
+
+    def rank(self, query_embedding: List[float], chunk_ids: List[str], limit: int = 3) -> List[Tuple[Dict[str, Any], float]]:
+        """
+        Rank the sentences of the given chunks by similarity to the query
+
+        Args:
+            query_embedding: Query embedding
+            chunk_ids: Chunks to take sentences from
+            limit: Number of sentences to return
+
+        Returns:
+            List of (sentence record, score), best first; empty if the chunks have no indexed sentences
+        """
+        if not self.enabled or not chunk_ids:
+            return []
+
+        sentences = self.backend.get_sentences(chunk_ids)
+        if not sentences:
+            return []
+
+        matrix = np.asarray([sentence["embedding"] for sentence in sentences], dtype=np.float32)
+        query = normalize_rows(np.asarray(query_embedding, dtype=np.float32)[None, :])[0]
+        scores = matrix @ query
+
+        # Overlapping chunks repeat sentences: keep each text once
+        ranked = []
+        seen = set()
+        for i in np.argsort(-scores):
+            key = " ".join(sentences[i]["text"].lower().split())
+            if key in seen:
+                continue
+            seen.add(key)
+            ranked.append((sentences[i], float(scores[i])))
+            if len(ranked) >= limit:
+                break
+        return ranked
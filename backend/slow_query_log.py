@@ -0,0 +1,102 @@
+"""
+Slow Query Log Module
+Sampled, structured log of queries above a latency threshold
+"""
+
+import os
+import random
+import hashlib
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Dict, Any
+import numpy as np
+from dotenv import load_dotenv
+
+from store_backends import VectorStoreBackend
+
+load_dotenv()
+
+
+class SlowQueryLog:
+    """
+    Records the timing breakdown of slow queries in the storage backend
+
+    A query is slow if it took longer than SLOW_QUERY_THRESHOLD_MS and,
+    once enough queries were seen, longer than SLOW_QUERY_PERCENTILE of
+    the recent ones, so only outliers are logged whatever the usual LLM
+    latency is.
+    """
+
+    def __init__(self, backend: VectorStoreBackend):
+        """
+        Initialize the slow query log
+
+        Args:
+            backend: Storage backend that persists the records
+        """
+        self.backend = backend
+        # Floor: faster queries are never logged
+        self.threshold_ms = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "5000"))
+        # Percentile of recent query times a query must exceed (0 = floor only)
+        self.percentile = float(os.getenv("SLOW_QUERY_PERCENTILE", "99"))
+        # Fraction of slow queries actually written, to stay cheap under load
+        self.sample_rate = float(os.getenv("SLOW_QUERY_SAMPLE_RATE", "1.0"))
+
+        self._recent_ms = deque(maxlen=int(os.getenv("SLOW_QUERY_WINDOW", "1000")))
+        self._lock = threading.Lock()
+
+    def current_threshold_ms(self, total_ms: float) -> float:
+        """
+        Record a query time and get the threshold it is judged against
+
+        Args:
+            total_ms: End-to-end processing time
+
+        Returns:
+            The floor, or the percentile of recent queries if higher
+        """
+        with self._lock:
+            self._recent_ms.append(total_ms)
+            if self.percentile <= 0 or len(self._recent_ms) < min(100, self._recent_ms.maxlen):
+                return self.threshold_ms
+            recent = np.fromiter(self._recent_ms, dtype=np.float64, count=len(self._recent_ms))
+        return max(self.threshold_ms, float(np.percentile(recent, self.percentile)))
+
+    def maybe_log(self, question: str, top_k: int, total_ms: float, timings: Dict[str, Any]) -> bool:
+        """
+        Log the query if it is slow and sampled
+
+        Args:
+            question: User's question (only its hash is stored)
+            top_k: Requested number of chunks
+            total_ms: End-to-end processing time
+            timings: Per-stage breakdown
+
+        Returns:
+            True if a record was written
+        """
+        threshold_ms = self.current_threshold_ms(total_ms)
+        if total_ms <= threshold_ms or random.random() >= self.sample_rate:
+            return False
+
+        record = {
+            "question_hash": hashlib.sha256(question.strip().lower().encode("utf-8")).hexdigest()[:16],
+            "question_length": len(question),
+            "top_k": top_k,
+            "total_ms": total_ms,
+            "threshold_ms": threshold_ms,
+            "timings": timings,
+            "sample_rate": self.sample_rate,
+            "logged_at": datetime.utcnow()
+        }
+
+        try:
+            self.backend.log_slow_query(record)
+        except Exception as e:
+            # Diagnostics must never fail the query
+            print(f"⚠️  Could not write slow query log: {e}")
+            return False
+
+        print(f"🐢 Slow query ({total_ms:.0f} ms) logged as {record['question_hash']}")
+        return True
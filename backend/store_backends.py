@@ -0,0 +1,977 @@
+"""
+Store Backends Module
+Storage backends behind VectorStore: MongoDB and in-memory
+"""
+
+import os
+import copy
+import random
+import threading
+from collections import deque, Counter
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Iterator, Tuple, Protocol
+from pymongo import MongoClient, UpdateOne, ReturnDocument
+from pymongo.errors import DuplicateKeyError, CollectionInvalid, BulkWriteError
+from dotenv import load_dotenv
+
+from models import DEFAULT_NAMESPACE
+
+load_dotenv()
+
+# Documents that are deleted but not yet compacted carry this flag
+NOT_DELETED = {"deleted": {"$ne": True}}
+
+# Fields never returned with search hits
+VECTOR_FIELDS = ("embedding", "search_embedding")
+
+# Document listing order; also the fields every listing page includes
+DOCUMENT_SORT_FIELDS = ("uploaded_at", "document_id")
+
+
+def namespace_of(record: Dict[str, Any]) -> str:
+    """Namespace of a stored record (records from before namespaces are in the default one)"""
+    return record.get("namespace") or DEFAULT_NAMESPACE
+
+
+def failed_writes(error: BulkWriteError) -> set:
+    """Positions of the records an unordered insert could not write"""
+    return {write_error["index"] for write_error in error.details.get("writeErrors", [])}
+
+
+def duplicate_key_error(failed: List[int], inserted: int) -> BulkWriteError:
+    """
+    The error MongoDB raises for an unordered insert that hit existing keys
+
+    Args:
+        failed: Positions of the duplicate records
+        inserted: Number of records written
+
+    Returns:
+        BulkWriteError with one duplicate-key write error per failed record
+    """
+    return BulkWriteError({
+        "writeErrors": [{"index": i, "code": 11000, "errmsg": "E11000 duplicate key error"} for i in failed],
+        "nInserted": inserted
+    })
+
+
+def namespace_filter(namespace: Optional[str]) -> Dict[str, Any]:
+    """
+    MongoDB filter for the records of a namespace
+
+    Args:
+        namespace: Namespace (None = all namespaces)
+
+    Returns:
+        Filter fragment
+    """
+    if namespace is None:
+        return {}
+    if namespace == DEFAULT_NAMESPACE:
+        # Also matches records without the field
+        return {"namespace": {"$in": [DEFAULT_NAMESPACE, None]}}
+    return {"namespace": namespace}
+
+
+def encode_document_cursor(record: Dict[str, Any]) -> str:
+    """Cursor pointing just past a listed document"""
+    return f"{record['uploaded_at'].isoformat()}|{record['document_id']}"
+
+
+def decode_document_cursor(cursor: str) -> Tuple[datetime, str]:
+    """
+    Parse a document listing cursor
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    uploaded_at, _, document_id = cursor.partition("|")
+    if not document_id:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return datetime.fromisoformat(uploaded_at), document_id
+
+
+class VectorStoreBackend(Protocol):
+    """
+    Storage operations VectorStore needs
+
+    Records are plain dictionaries in the shape of the pydantic models.
+    Scoring itself happens in VectorStore's index, fed by iter_vectors().
+    A namespace argument of None means all namespaces.
+    """
+
+    # Documents
+    def upsert_document(self, record: Dict[str, Any]) -> Optional[str]: ...
+    def insert_documents(self, records: List[Dict[str, Any]]) -> int: ...
+    def get_document(self, document_id: str, namespace: Optional[str] = None) -> Optional[Dict[str, Any]]: ...
+    def list_documents(
+        self,
+        cursor: Optional[str] = None,
+        limit: Optional[int] = None,
+        fields: Optional[List[str]] = None,
+        namespace: Optional[str] = None
+    ) -> List[Dict[str, Any]]: ...
+    def update_document(self, document_id: str, fields: Dict[str, Any]) -> bool: ...
+    def mark_document_deleted(self, document_id: str, namespace: Optional[str] = None) -> Optional[str]: ...
+    def list_deleted_documents(self, namespace: Optional[str] = None) -> List[Dict[str, Any]]: ...
+    def delete_document(self, document_id: str) -> bool: ...
+    def count_documents(self, namespace: Optional[str] = None) -> int: ...
+    def count_documents_by_status(self, namespace: Optional[str] = None) -> Dict[str, int]: ...
+
+    # Chunks
+    def upsert_chunk(self, record: Dict[str, Any]) -> bool: ...
+    def insert_chunks(self, records: List[Dict[str, Any]]) -> int: ...
+    def get_chunks(self, document_id: str, namespace: Optional[str] = None) -> List[Dict[str, Any]]: ...
+    def get_chunks_by_ids(self, chunk_ids: List[str], namespace: Optional[str] = None) -> List[Dict[str, Any]]: ...
+    def delete_chunks(self, document_id: str, limit: Optional[int] = None, namespace: Optional[str] = None) -> int: ...
+    def count_chunks(self, namespace: Optional[str] = None) -> int: ...
+
+    # Sentence index
+    def insert_sentences(self, records: List[Dict[str, Any]]) -> int: ...
+    def get_sentences(self, chunk_ids: List[str]) -> List[Dict[str, Any]]: ...
+    def delete_sentences(self, document_id: str) -> int: ...
+
+    # Search vectors
+    def iter_vectors(
+        self,
+        vector_field: str,
+        version: Optional[str],
+        namespace: Optional[str] = None,
+        document_ids: Optional[List[str]] = None
+    ) -> Iterator[Dict[str, Any]]: ...
+    def count_vectors(self, vector_field: str, version: Optional[str], namespace: Optional[str] = None) -> int: ...
+    def sample_embeddings(self, size: int) -> List[List[float]]: ...
+    def iter_embeddings(self) -> Iterator[Tuple[str, List[float]]]: ...
+    def set_search_vectors(self, updates: List[Tuple[str, List[float], str]]) -> None: ...
+    def save_projection(self, record: Dict[str, Any]) -> None: ...
+    def latest_projection(self, mode: str, target_dim: int) -> Optional[Dict[str, Any]]: ...
+
+    # Change log: a global generation counter and the writes it numbered
+    def record_change(self, op: str, namespace: Optional[str], document_ids: Optional[List[str]] = None) -> int: ...
+    def current_generation(self) -> int: ...
+    def changes_since(self, generation: int, limit: int = 1000) -> List[Dict[str, Any]]: ...
+
+    # Chat history
+    def append_chat_messages(self, records: List[Dict[str, Any]]) -> None: ...
+    def get_chat_messages(self, session_id: str, before_seq: Optional[int], limit: int) -> List[Dict[str, Any]]: ...
+    def latest_chat_seqs(self, session_id: str, limit: int) -> List[int]: ...
+    def clear_chat_messages(self, session_id: Optional[str]) -> None: ...
+
+    # Diagnostics
+    def log_slow_query(self, record: Dict[str, Any]) -> None: ...
+
+    # Admin
+    def ping(self) -> bool: ...
+    def clear(self, namespace: Optional[str] = None) -> None: ...
+
+
+class MongoBackend:
+    """MongoDB storage backend"""
+
+    def __init__(self, mongodb_uri: str = None, db_name: str = None):
+        """
+        Initialize MongoDB connection
+
+        Args:
+            mongodb_uri: Connection string (defaults to MONGODB_URI)
+            db_name: Database name (defaults to MONGODB_DB_NAME)
+        """
+        mongodb_uri = mongodb_uri or os.getenv("MONGODB_URI")
+        db_name = db_name or os.getenv("MONGODB_DB_NAME", "document_qa")
+
+        if not mongodb_uri:
+            raise ValueError("MONGODB_URI environment variable not set")
+
+        self.client = MongoClient(mongodb_uri)
+        self.db = self.client[db_name]
+
+        # Collections
+        self.chunks_collection = self.db["chunks"]
+        self.documents_collection = self.db["documents"]
+        self.sentences_collection = self.db["sentences"]
+        self.projections_collection = self.db["projections"]
+        self.chat_collection = self.db["chat_messages"]
+        self.stats_collection = self.db["stats"]
+        self.slow_queries_collection = self._capped_collection(
+            "slow_queries",
+            int(os.getenv("SLOW_QUERY_LOG_MAX_BYTES", str(16 * 1024 * 1024)))
+        )
+        # Oldest changes fall off; readers further behind rebuild from scratch
+        self.changes_collection = self._capped_collection(
+            "changes",
+            int(os.getenv("CHANGE_LOG_MAX_BYTES", str(64 * 1024 * 1024)))
+        )
+
+        # Create indexes
+        self._create_indexes()
+        self._init_stats()
+
+    def _create_indexes(self):
+        """Create necessary indexes"""
+        # Index for document_id lookups
+        self.chunks_collection.create_index("document_id")
+        self.documents_collection.create_index("document_id", unique=True)
+        self.documents_collection.create_index([("uploaded_at", -1), ("document_id", -1)])
+        self.documents_collection.create_index([("namespace", 1), ("uploaded_at", -1), ("document_id", -1)])
+        self.documents_collection.create_index("deleted", sparse=True)
+
+        # Index for chunk_id
+        self.chunks_collection.create_index("chunk_id", unique=True)
+
+        # Index for reduced search vectors
+        self.chunks_collection.create_index("projection_version")
+
+        # Per-namespace index loads
+        self.chunks_collection.create_index([("namespace", 1), ("projection_version", 1)])
+
+        # Sentence index: fetched by chunk, removed by document
+        self.sentences_collection.create_index("sentence_id", unique=True)
+        self.sentences_collection.create_index("chunk_id")
+        self.sentences_collection.create_index("document_id")
+        self.sentences_collection.create_index("namespace")
+
+        # Change log: read in generation order
+        self.changes_collection.create_index("generation")
+
+        # Chat history: paged per session, expired by MongoDB's TTL monitor
+        self.chat_collection.create_index([("session_id", 1), ("seq", -1)])
+        self.chat_collection.create_index(
+            "timestamp",
+            expireAfterSeconds=int(float(os.getenv("CHAT_HISTORY_TTL_HOURS", "168")) * 3600)
+        )
+
+    def _init_stats(self):
+        """Seed the write-maintained counters from a full count, once"""
+        if self.stats_collection.find_one({"_id": "knowledge_base"}) is None:
+            self.stats_collection.update_one(
+                {"_id": "knowledge_base"},
+                {"$setOnInsert": {
+                    "documents": self.documents_collection.count_documents({}),
+                    "chunks": self.chunks_collection.count_documents({})
+                }},
+                upsert=True
+            )
+
+        # Counters kept before namespaces existed have no per-namespace split yet
+        if self.stats_collection.find_one({"_id": "knowledge_base", "namespaces": {"$exists": False}}):
+            namespaces: Dict[str, Dict[str, int]] = {}
+            for field, collection, match in (
+                ("documents", self.documents_collection, NOT_DELETED),
+                ("chunks", self.chunks_collection, {})
+            ):
+                for row in collection.aggregate([
+                    {"$match": match},
+                    {"$group": {"_id": {"$ifNull": ["$namespace", DEFAULT_NAMESPACE]}, "count": {"$sum": 1}}}
+                ]):
+                    namespaces.setdefault(row["_id"], {"documents": 0, "chunks": 0})[field] = row["count"]
+            self.stats_collection.update_one(
+                {"_id": "knowledge_base", "namespaces": {"$exists": False}},
+                {"$set": {"namespaces": namespaces}}
+            )
+
+    def _bump_stats(self, namespace: str, documents: int = 0, chunks: int = 0):
+        """Adjust the document and chunk counters, in total and for one namespace"""
+        if documents or chunks:
+            self._bump_counts({namespace: documents} if documents else {}, {namespace: chunks} if chunks else {})
+
+    def _bump_counts(self, documents: Dict[str, int], chunks: Dict[str, int]):
+        """Adjust the counters of several namespaces in one write"""
+        inc: Dict[str, int] = {}
+        for field, counts in (("documents", documents), ("chunks", chunks)):
+            for namespace, count in counts.items():
+                if count:
+                    inc[field] = inc.get(field, 0) + count
+                    inc[f"namespaces.{namespace}.{field}"] = count
+        if inc:
+            self.stats_collection.update_one({"_id": "knowledge_base"}, {"$inc": inc}, upsert=True)
+
+    @staticmethod
+    def _inserted_by_namespace(records: List[Dict[str, Any]], error: Optional[BulkWriteError] = None) -> Dict[str, int]:
+        """Count the records an unordered insert wrote, per namespace"""
+        failed = failed_writes(error) if error else set()
+        return Counter(namespace_of(record) for i, record in enumerate(records) if i not in failed)
+
+    def _stat(self, name: str, namespace: Optional[str] = None) -> int:
+        stats = self.stats_collection.find_one({"_id": "knowledge_base"})
+        if not stats:
+            return 0
+        if namespace is not None:
+            stats = stats.get("namespaces", {}).get(namespace, {})
+        return max(0, stats.get(name, 0))
+
+    def _capped_collection(self, name: str, max_bytes: int):
+        """Get a capped collection, creating it on first use"""
+        if name not in self.db.list_collection_names():
+            try:
+                self.db.create_collection(name, capped=True, size=max_bytes)
+            except CollectionInvalid:
+                pass  # Created concurrently by another worker
+        return self.db[name]
+
+    @staticmethod
+    def _vector_filter(vector_field: str, version: Optional[str]) -> Dict[str, Any]:
+        """Filter selecting chunks that have the requested vectors"""
+        if version is not None:
+            return {"projection_version": version}
+        return {vector_field: {"$exists": True}}
+
+    def upsert_document(self, record: Dict[str, Any]) -> Optional[str]:
+        try:
+            self.documents_collection.insert_one(dict(record))
+            self._bump_stats(namespace_of(record), documents=1)
+            return None
+        except DuplicateKeyError:
+            # Update existing document; a deleted one is live again
+            previous = self.documents_collection.find_one_and_update(
+                {"document_id": record["document_id"]},
+                {"$set": record, "$unset": {"deleted": "", "deleted_at": ""}},
+                projection={"_id": 0, "deleted": 1, "namespace": 1}
+            )
+        if previous is None or not previous.get("deleted"):
+            return None
+        # Tombstoned documents were uncounted when marked
+        self._bump_stats(namespace_of(record), documents=1)
+        return namespace_of(previous)
+
+    def insert_documents(self, records: List[Dict[str, Any]]) -> int:
+        try:
+            result = self.documents_collection.insert_many([dict(record) for record in records], ordered=False)
+        except BulkWriteError as e:
+            self._bump_counts(self._inserted_by_namespace(records, e), {})
+            raise
+        self._bump_counts(self._inserted_by_namespace(records), {})
+        return len(result.inserted_ids)
+
+    def get_document(self, document_id: str, namespace: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        return self.documents_collection.find_one({
+            "document_id": document_id, **NOT_DELETED, **namespace_filter(namespace)
+        })
+
+    def list_documents(
+        self,
+        cursor: Optional[str] = None,
+        limit: Optional[int] = None,
+        fields: Optional[List[str]] = None,
+        namespace: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        query: Dict[str, Any] = {**NOT_DELETED, **namespace_filter(namespace)}
+        if cursor:
+            uploaded_at, document_id = decode_document_cursor(cursor)
+            query["$or"] = [
+                {"uploaded_at": {"$lt": uploaded_at}},
+                {"uploaded_at": uploaded_at, "document_id": {"$lt": document_id}}
+            ]
+
+        projection: Dict[str, Any] = {"_id": 0}
+        if fields:
+            projection.update({field: 1 for field in (*fields, *DOCUMENT_SORT_FIELDS)})
+
+        documents = self.documents_collection.find(query, projection).sort(
+            [(field, -1) for field in DOCUMENT_SORT_FIELDS]
+        )
+        if limit:
+            documents = documents.limit(limit)
+        return list(documents)
+
+    def update_document(self, document_id: str, fields: Dict[str, Any]) -> bool:
+        result = self.documents_collection.update_one(
+            {"document_id": document_id},
+            {"$set": fields}
+        )
+        return result.modified_count > 0
+
+    def mark_document_deleted(self, document_id: str, namespace: Optional[str] = None) -> Optional[str]:
+        document = self.documents_collection.find_one_and_update(
+            {"document_id": document_id, **NOT_DELETED, **namespace_filter(namespace)},
+            {"$set": {"deleted": True, "deleted_at": datetime.utcnow()}},
+            projection={"_id": 0, "document_id": 1, "namespace": 1}
+        )
+        if document is None:
+            return None
+        self._bump_stats(namespace_of(document), documents=-1)
+        return namespace_of(document)
+
+    def list_deleted_documents(self, namespace: Optional[str] = None) -> List[Dict[str, Any]]:
+        return [
+            {"document_id": document["document_id"], "namespace": namespace_of(document)}
+            for document in self.documents_collection.find(
+                {"deleted": True, **namespace_filter(namespace)},
+                {"_id": 0, "document_id": 1, "namespace": 1}
+            )
+        ]
+
+    def delete_document(self, document_id: str) -> bool:
+        document = self.documents_collection.find_one_and_delete({"document_id": document_id})
+        if document is None:
+            return False
+        if not document.get("deleted"):
+            # Tombstoned documents were already uncounted when marked
+            self._bump_stats(namespace_of(document), documents=-1)
+        return True
+
+    def count_documents(self, namespace: Optional[str] = None) -> int:
+        return self._stat("documents", namespace)
+
+    def count_documents_by_status(self, namespace: Optional[str] = None) -> Dict[str, int]:
+        return {
+            row["_id"]: row["count"]
+            for row in self.documents_collection.aggregate([
+                {"$match": {**NOT_DELETED, **namespace_filter(namespace)}},
+                {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+            ])
+        }
+
+    def upsert_chunk(self, record: Dict[str, Any]) -> bool:
+        try:
+            self.chunks_collection.insert_one(dict(record))
+            self._bump_stats(namespace_of(record), chunks=1)
+            return True
+        except DuplicateKeyError:
+            # Update existing chunk
+            self.chunks_collection.update_one(
+                {"chunk_id": record["chunk_id"]},
+                {"$set": record}
+            )
+            return False
+
+    def insert_chunks(self, records: List[Dict[str, Any]]) -> int:
+        try:
+            result = self.chunks_collection.insert_many(records, ordered=False)
+        except BulkWriteError as e:
+            # Count what the unordered insert did write before re-raising
+            self._bump_counts({}, self._inserted_by_namespace(records, e))
+            raise
+        self._bump_counts({}, self._inserted_by_namespace(records))
+        return len(result.inserted_ids)
+
+    def get_chunks(self, document_id: str, namespace: Optional[str] = None) -> List[Dict[str, Any]]:
+        return list(self.chunks_collection.find(
+            {"document_id": document_id, **namespace_filter(namespace)}
+        ).sort("chunk_index", 1))
+
+    def get_chunks_by_ids(self, chunk_ids: List[str], namespace: Optional[str] = None) -> List[Dict[str, Any]]:
+        return list(self.chunks_collection.find(
+            {"chunk_id": {"$in": chunk_ids}, **namespace_filter(namespace)},
+            {field: 0 for field in VECTOR_FIELDS}
+        ))
+
+    def delete_chunks(self, document_id: str, limit: Optional[int] = None, namespace: Optional[str] = None) -> int:
+        query: Dict[str, Any] = {"document_id": document_id, **namespace_filter(namespace)}
+        # Select (one batch of) IDs first: delete_many has no limit and does not
+        # return the namespace the counters need
+        cursor = self.chunks_collection.find(query, {"_id": 1, "namespace": 1})
+        chunks = list(cursor.limit(limit) if limit else cursor)
+        if not chunks:
+            return 0
+        deleted = self.chunks_collection.delete_many({"_id": {"$in": [chunk["_id"] for chunk in chunks]}}).deleted_count
+        self._bump_stats(namespace_of(chunks[0]), chunks=-deleted)
+        return deleted
+
+    def count_chunks(self, namespace: Optional[str] = None) -> int:
+        return self._stat("chunks", namespace)
+
+    def insert_sentences(self, records: List[Dict[str, Any]]) -> int:
+        try:
+            return len(self.sentences_collection.insert_many(records, ordered=False).inserted_ids)
+        except BulkWriteError as e:
+            # Sentences of a re-indexed chunk may already exist
+            return e.details.get("nInserted", 0)
+
+    def get_sentences(self, chunk_ids: List[str]) -> List[Dict[str, Any]]:
+        return list(self.sentences_collection.find({"chunk_id": {"$in": chunk_ids}}, {"_id": 0}))
+
+    def delete_sentences(self, document_id: str) -> int:
+        return self.sentences_collection.delete_many({"document_id": document_id}).deleted_count
+
+    def iter_vectors(
+        self,
+        vector_field: str,
+        version: Optional[str],
+        namespace: Optional[str] = None,
+        document_ids: Optional[List[str]] = None
+    ) -> Iterator[Dict[str, Any]]:
+        query = {**self._vector_filter(vector_field, version), **namespace_filter(namespace)}
+        if document_ids is not None:
+            query["document_id"] = {"$in": list(document_ids)}
+        return self.chunks_collection.find(
+            query,
+            {"_id": 0, "chunk_id": 1, "document_id": 1, vector_field: 1}
+        ).batch_size(5000)
+
+    def count_vectors(self, vector_field: str, version: Optional[str], namespace: Optional[str] = None) -> int:
+        return self.chunks_collection.count_documents(
+            {**self._vector_filter(vector_field, version), **namespace_filter(namespace)}
+        )
+
+    def sample_embeddings(self, size: int) -> List[List[float]]:
+        return [
+            chunk["embedding"] for chunk in self.chunks_collection.aggregate([
+                {"$match": {"embedding": {"$exists": True}}},
+                {"$sample": {"size": size}},
+                {"$project": {"embedding": 1}}
+            ])
+        ]
+
+    def iter_embeddings(self) -> Iterator[Tuple[str, List[float]]]:
+        cursor = self.chunks_collection.find(
+            {"embedding": {"$exists": True}},
+            {"_id": 0, "chunk_id": 1, "embedding": 1}
+        )
+        for chunk in cursor:
+            yield chunk["chunk_id"], chunk["embedding"]
+
+    def set_search_vectors(self, updates: List[Tuple[str, List[float], str]]) -> None:
+        if not updates:
+            return
+        self.chunks_collection.bulk_write([
+            UpdateOne(
+                {"chunk_id": chunk_id},
+                {"$set": {"search_embedding": vector, "projection_version": version}}
+            )
+            for chunk_id, vector, version in updates
+        ], ordered=False)
+
+    def save_projection(self, record: Dict[str, Any]) -> None:
+        self.projections_collection.insert_one(dict(record))
+
+    def latest_projection(self, mode: str, target_dim: int) -> Optional[Dict[str, Any]]:
+        return self.projections_collection.find_one(
+            {"mode": mode, "target_dim": target_dim},
+            sort=[("fitted_at", -1)]
+        )
+
+    def record_change(self, op: str, namespace: Optional[str], document_ids: Optional[List[str]] = None) -> int:
+        counter = self.stats_collection.find_one_and_update(
+            {"_id": "generation"},
+            {"$inc": {"value": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        generation = counter["value"]
+        self.changes_collection.insert_one({
+            "generation": generation,
+            "op": op,
+            "namespace": namespace,
+            "document_ids": list(document_ids or ()),
+            "at": datetime.utcnow()
+        })
+        return generation
+
+    def current_generation(self) -> int:
+        counter = self.stats_collection.find_one({"_id": "generation"})
+        return counter["value"] if counter else 0
+
+    def changes_since(self, generation: int, limit: int = 1000) -> List[Dict[str, Any]]:
+        return list(
+            self.changes_collection.find({"generation": {"$gt": generation}}, {"_id": 0})
+            .sort("generation", 1)
+            .limit(limit)
+        )
+
+    def append_chat_messages(self, records: List[Dict[str, Any]]) -> None:
+        if records:
+            self.chat_collection.insert_many([dict(record) for record in records], ordered=True)
+
+    def get_chat_messages(self, session_id: str, before_seq: Optional[int], limit: int) -> List[Dict[str, Any]]:
+        query: Dict[str, Any] = {"session_id": session_id}
+        if before_seq is not None:
+            query["seq"] = {"$lt": before_seq}
+        return list(self.chat_collection.find(query, {"_id": 0}).sort("seq", -1).limit(limit))
+
+    def latest_chat_seqs(self, session_id: str, limit: int) -> List[int]:
+        latest = self.chat_collection.find({"session_id": session_id}, {"_id": 0, "seq": 1}).sort("seq", -1).limit(limit)
+        return [record["seq"] for record in latest]
+
+    def clear_chat_messages(self, session_id: Optional[str]) -> None:
+        self.chat_collection.delete_many({} if session_id is None else {"session_id": session_id})
+
+    def log_slow_query(self, record: Dict[str, Any]) -> None:
+        self.slow_queries_collection.insert_one(dict(record))
+
+    def ping(self) -> bool:
+        self.client.admin.command("ping")
+        return True
+
+    def clear(self, namespace: Optional[str] = None) -> None:
+        if namespace is not None:
+            query = namespace_filter(namespace)
+            self.chunks_collection.delete_many(query)
+            self.documents_collection.delete_many(query)
+            self.sentences_collection.delete_many(query)
+            self._bump_counts(
+                {namespace: -self._stat("documents", namespace)},
+                {namespace: -self._stat("chunks", namespace)}
+            )
+            return
+
+        # Dropping is O(1) compared to deleting every record
+        self.chunks_collection.drop()
+        self.documents_collection.drop()
+        self.sentences_collection.drop()
+        self._create_indexes()
+        self.stats_collection.update_one(
+            {"_id": "knowledge_base"},
+            {"$set": {"documents": 0, "chunks": 0, "namespaces": {}}},
+            upsert=True
+        )
+
+
+class InMemoryBackend:
+    """In-process storage backend with the same semantics as MongoBackend"""
+
+    def __init__(self):
+        """Initialize empty collections"""
+        self._lock = threading.RLock()
+        self.documents: Dict[str, Dict[str, Any]] = {}
+        # Deleted documents awaiting compaction
+        self.deleted_documents: Dict[str, Dict[str, Any]] = {}
+        self.chunks: Dict[str, Dict[str, Any]] = {}
+        # chunk_id -> sentence records, in sentence order
+        self.sentences: Dict[str, List[Dict[str, Any]]] = {}
+        self.projections: List[Dict[str, Any]] = []
+        self.slow_queries = deque(maxlen=1000)
+        self.generation = 0
+        self.changes = deque(maxlen=int(os.getenv("CHANGE_LOG_MAX_ENTRIES", "100000")))
+        # session_id -> messages, oldest first (bounded like the MongoDB TTL)
+        self.chat: Dict[str, deque] = {}
+        self.chat_max_messages = int(os.getenv("CHAT_HISTORY_MAX_MESSAGES", "1000"))
+
+    @staticmethod
+    def _in_namespace(record: Dict[str, Any], namespace: Optional[str]) -> bool:
+        return namespace is None or namespace_of(record) == namespace
+
+    @staticmethod
+    def _has_vectors(chunk: Dict[str, Any], vector_field: str, version: Optional[str]) -> bool:
+        if version is not None:
+            return chunk.get("projection_version") == version
+        return vector_field in chunk
+
+    def upsert_document(self, record: Dict[str, Any]) -> Optional[str]:
+        with self._lock:
+            deleted = self.deleted_documents.pop(record["document_id"], None)
+            existing = self.documents.get(record["document_id"]) or deleted or {}
+            document = {**existing, **copy.deepcopy(record)}
+            document.pop("deleted", None)
+            document.pop("deleted_at", None)
+            self.documents[record["document_id"]] = document
+            return namespace_of(deleted) if deleted is not None else None
+
+    def insert_documents(self, records: List[Dict[str, Any]]) -> int:
+        failed = []
+        with self._lock:
+            # Unordered insert like MongoDB's: duplicates fail, the rest still go in
+            for i, record in enumerate(records):
+                if record["document_id"] in self.documents or record["document_id"] in self.deleted_documents:
+                    failed.append(i)
+                else:
+                    self.documents[record["document_id"]] = copy.deepcopy(record)
+        if failed:
+            raise duplicate_key_error(failed, len(records) - len(failed))
+        return len(records)
+
+    def get_document(self, document_id: str, namespace: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            document = self.documents.get(document_id)
+            if document is None or not self._in_namespace(document, namespace):
+                return None
+            return copy.deepcopy(document)
+
+    def list_documents(
+        self,
+        cursor: Optional[str] = None,
+        limit: Optional[int] = None,
+        fields: Optional[List[str]] = None,
+        namespace: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        with self._lock:
+            documents = sorted(
+                (document for document in self.documents.values() if self._in_namespace(document, namespace)),
+                key=lambda document: (document["uploaded_at"], document["document_id"]),
+                reverse=True
+            )
+            if cursor:
+                position = decode_document_cursor(cursor)
+                documents = [
+                    document for document in documents
+                    if (document["uploaded_at"], document["document_id"]) < position
+                ]
+            if limit:
+                documents = documents[:limit]
+
+            keep = set(fields or ()) | set(DOCUMENT_SORT_FIELDS)
+            return [
+                copy.deepcopy({k: v for k, v in document.items() if k in keep} if fields else document)
+                for document in documents
+            ]
+
+    def update_document(self, document_id: str, fields: Dict[str, Any]) -> bool:
+        with self._lock:
+            document = self.documents.get(document_id)
+            if document is None:
+                return False
+            modified = any(document.get(key) != value for key, value in fields.items())
+            document.update(copy.deepcopy(fields))
+            return modified
+
+    def mark_document_deleted(self, document_id: str, namespace: Optional[str] = None) -> Optional[str]:
+        with self._lock:
+            document = self.documents.get(document_id)
+            if document is None or not self._in_namespace(document, namespace):
+                return None
+            del self.documents[document_id]
+            document.update(deleted=True, deleted_at=datetime.utcnow())
+            self.deleted_documents[document_id] = document
+            return namespace_of(document)
+
+    def list_deleted_documents(self, namespace: Optional[str] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                {"document_id": document_id, "namespace": namespace_of(document)}
+                for document_id, document in self.deleted_documents.items()
+                if self._in_namespace(document, namespace)
+            ]
+
+    def delete_document(self, document_id: str) -> bool:
+        with self._lock:
+            live = self.documents.pop(document_id, None)
+            deleted = self.deleted_documents.pop(document_id, None)
+            return live is not None or deleted is not None
+
+    def count_documents(self, namespace: Optional[str] = None) -> int:
+        if namespace is None:
+            return len(self.documents)
+        with self._lock:
+            return sum(1 for document in self.documents.values() if self._in_namespace(document, namespace))
+
+    def count_documents_by_status(self, namespace: Optional[str] = None) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        with self._lock:
+            for document in self.documents.values():
+                if not self._in_namespace(document, namespace):
+                    continue
+                status = getattr(document["status"], "value", document["status"])
+                counts[status] = counts.get(status, 0) + 1
+        return counts
+
+    def upsert_chunk(self, record: Dict[str, Any]) -> bool:
+        with self._lock:
+            existing = self.chunks.get(record["chunk_id"])
+            if existing is not None:
+                existing.update(copy.deepcopy(record))
+                return False
+            self.chunks[record["chunk_id"]] = copy.deepcopy(record)
+            return True
+
+    def insert_chunks(self, records: List[Dict[str, Any]]) -> int:
+        failed = []
+        with self._lock:
+            # Unordered insert like MongoDB's: duplicates fail, the rest still go in
+            for i, record in enumerate(records):
+                if record["chunk_id"] in self.chunks:
+                    failed.append(i)
+                else:
+                    self.chunks[record["chunk_id"]] = copy.deepcopy(record)
+        if failed:
+            raise duplicate_key_error(failed, len(records) - len(failed))
+        return len(records)
+
+    def get_chunks(self, document_id: str, namespace: Optional[str] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            chunks = [
+                copy.deepcopy(chunk) for chunk in self.chunks.values()
+                if chunk["document_id"] == document_id and self._in_namespace(chunk, namespace)
+            ]
+        chunks.sort(key=lambda chunk: chunk["chunk_index"])
+        return chunks
+
+    def get_chunks_by_ids(self, chunk_ids: List[str], namespace: Optional[str] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                {k: copy.deepcopy(v) for k, v in self.chunks[chunk_id].items() if k not in VECTOR_FIELDS}
+                for chunk_id in chunk_ids
+                if chunk_id in self.chunks and self._in_namespace(self.chunks[chunk_id], namespace)
+            ]
+
+    def delete_chunks(self, document_id: str, limit: Optional[int] = None, namespace: Optional[str] = None) -> int:
+        with self._lock:
+            doomed = [
+                cid for cid, chunk in self.chunks.items()
+                if chunk["document_id"] == document_id and self._in_namespace(chunk, namespace)
+            ]
+            doomed = doomed[:limit] if limit else doomed
+            for chunk_id in doomed:
+                del self.chunks[chunk_id]
+            return len(doomed)
+
+    def count_chunks(self, namespace: Optional[str] = None) -> int:
+        if namespace is None:
+            return len(self.chunks)
+        with self._lock:
+            return sum(1 for chunk in self.chunks.values() if self._in_namespace(chunk, namespace))
+
+    def insert_sentences(self, records: List[Dict[str, Any]]) -> int:
+        inserted = 0
+        with self._lock:
+            for record in records:
+                sentences = self.sentences.setdefault(record["chunk_id"], [])
+                if all(existing["sentence_id"] != record["sentence_id"] for existing in sentences):
+                    sentences.append(copy.deepcopy(record))
+                    inserted += 1
+        return inserted
+
+    def get_sentences(self, chunk_ids: List[str]) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                copy.deepcopy(record)
+                for chunk_id in chunk_ids
+                for record in self.sentences.get(chunk_id, ())
+            ]
+
+    def delete_sentences(self, document_id: str) -> int:
+        with self._lock:
+            doomed = [
+                chunk_id for chunk_id, records in self.sentences.items()
+                if records and records[0]["document_id"] == document_id
+            ]
+            return sum(len(self.sentences.pop(chunk_id)) for chunk_id in doomed)
+
+    def iter_vectors(
+        self,
+        vector_field: str,
+        version: Optional[str],
+        namespace: Optional[str] = None,
+        document_ids: Optional[List[str]] = None
+    ) -> Iterator[Dict[str, Any]]:
+        wanted = set(document_ids) if document_ids is not None else None
+        with self._lock:
+            rows = [
+                {"chunk_id": chunk["chunk_id"], "document_id": chunk["document_id"], vector_field: chunk[vector_field]}
+                for chunk in self.chunks.values()
+                if self._has_vectors(chunk, vector_field, version) and self._in_namespace(chunk, namespace)
+                and (wanted is None or chunk["document_id"] in wanted)
+            ]
+        return iter(rows)
+
+    def count_vectors(self, vector_field: str, version: Optional[str], namespace: Optional[str] = None) -> int:
+        with self._lock:
+            return sum(
+                1 for chunk in self.chunks.values()
+                if self._has_vectors(chunk, vector_field, version) and self._in_namespace(chunk, namespace)
+            )
+
+    def sample_embeddings(self, size: int) -> List[List[float]]:
+        with self._lock:
+            embeddings = [chunk["embedding"] for chunk in self.chunks.values() if "embedding" in chunk]
+        return random.sample(embeddings, min(size, len(embeddings)))
+
+    def iter_embeddings(self) -> Iterator[Tuple[str, List[float]]]:
+        with self._lock:
+            rows = [(cid, chunk["embedding"]) for cid, chunk in self.chunks.items() if "embedding" in chunk]
+        return iter(rows)
+
+    def set_search_vectors(self, updates: List[Tuple[str, List[float], str]]) -> None:
+        with self._lock:
+            for chunk_id, vector, version in updates:
+                if chunk_id in self.chunks:
+                    self.chunks[chunk_id]["search_embedding"] = vector
+                    self.chunks[chunk_id]["projection_version"] = version
+
+    def save_projection(self, record: Dict[str, Any]) -> None:
+        with self._lock:
+            self.projections.append(copy.deepcopy(record))
+
+    def latest_projection(self, mode: str, target_dim: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            matches = [
+                record for record in self.projections
+                if record["mode"] == mode and record["target_dim"] == target_dim
+            ]
+        if not matches:
+            return None
+        return copy.deepcopy(max(matches, key=lambda record: record["fitted_at"]))
+
+    def record_change(self, op: str, namespace: Optional[str], document_ids: Optional[List[str]] = None) -> int:
+        with self._lock:
+            self.generation += 1
+            self.changes.append({
+                "generation": self.generation,
+                "op": op,
+                "namespace": namespace,
+                "document_ids": list(document_ids or ()),
+                "at": datetime.utcnow()
+            })
+            return self.generation
+
+    def current_generation(self) -> int:
+        return self.generation
+
+    def changes_since(self, generation: int, limit: int = 1000) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [copy.deepcopy(change) for change in self.changes if change["generation"] > generation][:limit]
+
+    def append_chat_messages(self, records: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            for record in records:
+                messages = self.chat.setdefault(record["session_id"], deque(maxlen=self.chat_max_messages))
+                messages.append(copy.deepcopy(record))
+
+    def get_chat_messages(self, session_id: str, before_seq: Optional[int], limit: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            messages = [
+                copy.deepcopy(record) for record in reversed(self.chat.get(session_id, ()))
+                if before_seq is None or record["seq"] < before_seq
+            ]
+        return messages[:limit]
+
+    def latest_chat_seqs(self, session_id: str, limit: int) -> List[int]:
+        with self._lock:
+            messages = self.chat.get(session_id) or ()
+            return [record["seq"] for record in reversed(messages)][:limit]
+
+    def clear_chat_messages(self, session_id: Optional[str]) -> None:
+        with self._lock:
+            if session_id is None:
+                self.chat.clear()
+            else:
+                self.chat.pop(session_id, None)
+
+    def log_slow_query(self, record: Dict[str, Any]) -> None:
+        self.slow_queries.append(copy.deepcopy(record))
+
+    def ping(self) -> bool:
+        return True
+
+    def clear(self, namespace: Optional[str] = None) -> None:
+        with self._lock:
+            if namespace is None:
+                self.chunks.clear()
+                self.sentences.clear()
+                self.documents.clear()
+                self.deleted_documents.clear()
+                return
+            for collection in (self.chunks, self.documents, self.deleted_documents):
+                for key in [key for key, record in collection.items() if self._in_namespace(record, namespace)]:
+                    del collection[key]
+            for chunk_id in [
+                chunk_id for chunk_id, records in self.sentences.items()
+                if records and self._in_namespace(records[0], namespace)
+            ]:
+                del self.sentences[chunk_id]
+
+
+def create_backend() -> VectorStoreBackend:
+    """
+    Create the storage backend selected by VECTOR_STORE_BACKEND
+
+    Returns:
+        MongoBackend ("mongodb", default) or InMemoryBackend ("memory")
+    """
+    backend = os.getenv("VECTOR_STORE_BACKEND", "mongodb").lower()
+
+    if backend == "memory":
+        print("🧪 Using in-memory vector store backend (data is not persisted)")
+        return InMemoryBackend()
+    if backend == "mongodb":
+        return MongoBackend()
+
+    raise ValueError(f"Unsupported VECTOR_STORE_BACKEND: {backend}")
@@ -0,0 +1,246 @@
+"""
+Summarizer Module
+Map-reduce document summarization with summaries persisted on the document record
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Callable
+from dotenv import load_dotenv
+
+from models import ProcessingStatus
+from vector_store import VectorStore
+from context_builder import merge_overlapping_text
+
+load_dotenv()
+
+# Called as generate(prompt, max_new_tokens, temperature) and returns the completion text
+GenerateFunction = Callable[[str, int, float], str]
+
+MAP_PROMPT = """Summarize the following part of the document "{document_name}" in {length}. Keep names, numbers and key terms.
+
+{text}
+
+Summary:"""
+
+REDUCE_PROMPT = """The following are summaries of consecutive parts of the document "{document_name}". Combine them into one concise summary of {length}.
+
+{text}
+
+Summary:"""
+
+
+def summary_version(document: Dict[str, Any]) -> Optional[str]:
+    """
+    Version of the document content a summary is valid for
+
+    processed_at changes whenever the document is (re)processed, so a
+    summary stored under an older version is stale.
+
+    Args:
+        document: Document record
+
+    Returns:
+        Version string, or None if the document is not completely processed
+    """
+    processed_at = document.get("processed_at")
+    if document.get("status") != ProcessingStatus.COMPLETED.value or processed_at is None:
+        return None
+    if isinstance(processed_at, datetime):
+        processed_at = processed_at.isoformat()
+    return f"{document.get('total_chunks', 0)}:{processed_at}"
+
+
+class DocumentSummarizer:
+    """
+    Hierarchical (map-reduce) summarizer
+
+    Consecutive chunks are grouped up to a token budget and each group is
+    summarized in parallel on a bounded thread pool (map). The partial
+    summaries are combined the same way until they fit one prompt, which
+    produces the final summary (reduce). The result is stored on the
+    document record with the content version it was made from, so reading
+    it back is a single lookup until the document changes.
+    """
+
+    def __init__(self, generate: GenerateFunction, vector_store: VectorStore):
+        """
+        Initialize the summarizer
+
+        Args:
+            generate: LLM completion function
+            vector_store: Vector store holding documents and chunks
+        """
+        self.generate = generate
+        self.vector_store = vector_store
+        self.group_tokens = int(os.getenv("SUMMARY_GROUP_TOKENS", "3000"))
+        self.concurrency = int(os.getenv("SUMMARY_CONCURRENCY", "4"))
+        self.summarize_on_ingest = os.getenv("SUMMARIZE_ON_INGEST", "false").lower() == "true"
+
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="summary-map")
+        # Ingest-time summaries run one document at a time
+        self._background = ThreadPoolExecutor(max_workers=1, thread_name_prefix="summary")
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, Future] = {}
+
+    def get_summary(self, document: Dict[str, Any]) -> Optional[str]:
+        """
+        Get a document's summary, generating and storing it if needed
+
+        Args:
+            document: Document record
+
+        Returns:
+            Summary text, or None if the document has no content or the LLM failed
+        """
+        version = summary_version(document)
+        if version is None:
+            return None
+        if document.get("summary") and document.get("summary_version") == version:
+            return document["summary"]
+        return self._run(document["document_id"]).result()
+
+    def schedule(self, document_id: str):
+        """
+        Summarize a document in the background
+
+        Args:
+            document_id: Document ID
+        """
+        self._run(document_id, self._background)
+
+    def on_document_completed(self, document_id: str):
+        """Ingestion hook: summarize right away if SUMMARIZE_ON_INGEST is enabled"""
+        if self.summarize_on_ingest:
+            self.schedule(document_id)
+
+    def _run(self, document_id: str, executor: Optional[ThreadPoolExecutor] = None) -> Future:
+        """
+        Summarize a document unless that is already under way
+
+        Args:
+            document_id: Document ID
+            executor: Run on this executor (None = in the calling thread)
+
+        Returns:
+            Future of the summary, shared by concurrent callers
+        """
+        with self._lock:
+            future = self._in_flight.get(document_id)
+            if future is not None:
+                return future
+            future = Future()
+            self._in_flight[document_id] = future
+
+        if executor is None:
+            self._resolve(document_id, future)
+        else:
+            executor.submit(self._resolve, document_id, future)
+        return future
+
+    def _resolve(self, document_id: str, future: Future):
+        """Summarize into the shared future and release it"""
+        try:
+            future.set_result(self.summarize(document_id))
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._in_flight.pop(document_id, None)
+
+    def summarize(self, document_id: str) -> Optional[str]:
+        """
+        Generate, store and return a document's summary
+
+        Args:
+            document_id: Document ID
+
+        Returns:
+            Summary text, or None if the document has no content or the LLM failed
+        """
+        document = self.vector_store.get_document(document_id)
+        version = summary_version(document) if document else None
+        if version is None:
+            return None
+
+        chunks = self.vector_store.get_document_chunks(document_id, document.get("namespace"))
+        if not chunks:
+            return None
+
+        try:
+            summary = self._map_reduce(document["filename"], chunks)
+        except Exception as e:
+            print(f"⚠️  Summarizing {document_id} failed: {e}")
+            return None
+
+        self.vector_store.backend.update_document(document_id, {
+            "summary": summary,
+            "summary_version": version,
+            "summarized_at": datetime.utcnow()
+        })
+        print(f"📝 Summarized {document['filename']} ({len(chunks)} chunks)")
+        return summary
+
+    def _map_reduce(self, document_name: str, chunks: List[Dict[str, Any]]) -> str:
+        """Summarize chunk groups in parallel, then combine the partial summaries"""
+        chunks = sorted(chunks, key=lambda chunk: chunk["chunk_index"])
+        groups = self._group(
+            [chunk["content"] for chunk in chunks],
+            [chunk.get("metadata", {}).get("token_count") for chunk in chunks],
+            merge_overlapping_text
+        )
+
+        if len(groups) == 1:
+            return self._call(MAP_PROMPT, document_name, groups[0], 250, length="3-4 sentences")
+
+        partials = list(self._executor.map(
+            lambda text: self._call(MAP_PROMPT, document_name, text, 150, length="2-3 sentences"), groups
+        ))
+
+        # Reduce in rounds until the partial summaries fit one prompt; at least
+        # two partials per group halve them each round, however long they are
+        while True:
+            groups = self._group(partials, [None] * len(partials), lambda a, b: f"{a}\n\n{b}", min_texts=2)
+            if len(groups) == 1:
+                return self._call(REDUCE_PROMPT, document_name, groups[0], 250, length="3-4 sentences")
+            partials = list(self._executor.map(
+                lambda text: self._call(REDUCE_PROMPT, document_name, text, 200, length="2-3 sentences"), groups
+            ))
+
+    def _group(
+        self,
+        texts: List[str],
+        token_counts: List[Optional[int]],
+        join: Callable[[str, str], str],
+        min_texts: int = 1
+    ) -> List[str]:
+        """Join consecutive texts into groups of at most group_tokens, unless that leaves fewer than min_texts in a group"""
+        groups = []
+        current, current_tokens, current_texts = None, 0, 0
+        for text, tokens in zip(texts, token_counts):
+            tokens = tokens if tokens is not None else len(text) // 4
+            if current is not None and current_tokens + tokens > self.group_tokens and current_texts >= min_texts:
+                groups.append(current)
+                current, current_tokens, current_texts = None, 0, 0
+            current = text if current is None else join(current, text)
+            current_tokens += tokens
+            current_texts += 1
+        if current is not None:
+            groups.append(current)
+        return groups
+
+    def _call(self, template: str, document_name: str, text: str, max_new_tokens: int, length: str) -> str:
+        """Run one map or reduce prompt"""
+        prompt = template.format(document_name=document_name, text=text, length=length)
+        summary = self.generate(prompt, max_new_tokens, 0.3).strip()
+        if len(summary) < 20:
+            raise ValueError("LLM returned an empty summary")
+        return summary
+
+    def shutdown(self):
+        """Stop the worker threads"""
+        self._background.shutdown(wait=False, cancel_futures=True)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
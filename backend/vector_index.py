@@ -0,0 +1,524 @@
+"""
+Vector Index Module
+Search vectors (in memory or memory-mapped) with a binary-quantized prefilter
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import List, Tuple, Dict, Any, Optional, Iterable, Callable
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Set bits per byte value, for popcount on NumPy versions without bitwise_count
+_POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def pack_sign_bits(vectors: np.ndarray) -> np.ndarray:
+    """
+    Binary-quantize vectors to one sign bit per dimension
+
+    Args:
+        vectors: Matrix (n x d)
+
+    Returns:
+        Packed codes (n x ceil(d / 8)) as uint8
+    """
+    return np.packbits(vectors > 0, axis=1)
+
+
+def hamming_distances(codes: np.ndarray, query_code: np.ndarray) -> np.ndarray:
+    """
+    Hamming distance between every code and the query code
+
+    Args:
+        codes: Packed codes (n x bytes) as uint8
+        query_code: Packed query code (bytes,) as uint8
+
+    Returns:
+        Distances (n,)
+    """
+    # Compare 64 bits at a time when the code width allows it
+    if codes.shape[1] % 8 == 0:
+        xor = codes.view(np.uint64) ^ query_code.view(np.uint64)
+    else:
+        xor = codes ^ query_code
+
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(xor).sum(axis=1, dtype=np.uint32)
+
+    return _POPCOUNT_TABLE[xor.view(np.uint8)].sum(axis=1, dtype=np.uint32)
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """Scale rows to unit length (zero rows stay zero)"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+
+def smallest(values: np.ndarray, k: int, rows: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Positions of the k smallest values, ties broken toward lower rows
+
+    argpartition alone picks arbitrarily among values tied at the cut-off,
+    which would let the shard layout change which rows are returned.
+
+    Args:
+        values: Values to rank (n,)
+        k: Number of positions to return
+        rows: Global row of each value (None = its position)
+
+    Returns:
+        Positions ordered by (value, row)
+    """
+    k = min(k, len(values))
+    if k == 0:
+        return np.empty(0, dtype=np.int64)
+    rows = np.arange(len(values)) if rows is None else rows
+    cutoff = np.partition(values, k - 1)[k - 1]
+    below = np.flatnonzero(values < cutoff)
+    tied = np.flatnonzero(values == cutoff)
+    chosen = np.concatenate([below, tied[np.argsort(rows[tied], kind="stable")][:k - len(below)]])
+    return chosen[np.lexsort((rows[chosen], values[chosen]))]
+
+
+def mmr_select(relevance: np.ndarray, vectors: np.ndarray, k: int, mmr_lambda: float) -> np.ndarray:
+    """
+    Greedy maximal-marginal-relevance selection
+
+    Candidate-candidate similarities come from one matrix product, and each
+    greedy step is a vectorized update of every candidate's maximum
+    similarity to the selection so far.
+
+    Args:
+        relevance: Query similarity of each candidate (n,)
+        vectors: Normalized candidate vectors (n x d)
+        k: Number of candidates to select
+        mmr_lambda: Trade-off between relevance (1.0) and diversity (0.0)
+
+    Returns:
+        Indices of the selected candidates, in selection order
+    """
+    n = len(relevance)
+    k = min(k, n)
+    similarity = vectors @ vectors.T
+    max_similarity = np.full(n, -np.inf, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+    selected = np.empty(k, dtype=np.int64)
+
+    for step in range(k):
+        if step == 0:
+            marginal = relevance.astype(np.float32, copy=True)
+        else:
+            marginal = mmr_lambda * relevance - (1.0 - mmr_lambda) * max_similarity
+        marginal[~available] = -np.inf
+        pick = int(np.argmax(marginal))
+        selected[step] = pick
+        available[pick] = False
+        np.maximum(max_similarity, similarity[pick], out=max_similarity)
+
+    return selected
+
+
+class ShardedScorer:
+    """
+    Thread pool shared by all indexes for scoring row shards in parallel
+
+    NumPy releases the GIL in matrix products and reductions, so shards of
+    one index scan on separate cores. The SEARCH_THREADS budget is divided
+    among the searches in flight: a single query on an idle system gets
+    every thread, concurrent queries get a share each instead of
+    oversubscribing the CPU.
+    """
+
+    def __init__(self):
+        """Read the thread budget (the pool itself starts on first use)"""
+        self.threads = int(os.getenv("SEARCH_THREADS", "0")) or os.cpu_count() or 1
+        # Shards per search (0 = one per thread of the query's budget)
+        self.shards = int(os.getenv("SEARCH_SHARDS", "0"))
+        # Smaller scans stay on the calling thread
+        self.min_rows = int(os.getenv("SEARCH_PARALLEL_MIN_ROWS", "100000"))
+
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._active = 0
+
+    @contextmanager
+    def budget(self, threads: Optional[int] = None):
+        """
+        Reserve a share of the thread budget for one search
+
+        Args:
+            threads: Threads to use instead of the fair share
+
+        Yields:
+            Number of threads the search may use
+        """
+        with self._lock:
+            self._active += 1
+            share = max(1, self.threads // self._active)
+        try:
+            yield min(threads, self.threads) if threads else share
+        finally:
+            with self._lock:
+                self._active -= 1
+
+    def shard_count(self, rows: int, threads: int) -> int:
+        """Number of shards to split a scan of this many rows into (1 = no parallelism)"""
+        if threads <= 1 or rows < self.min_rows:
+            return 1
+        return max(1, self.shards or threads)
+
+    def map(self, function: Callable, shards: List[Any]) -> List[Any]:
+        """Run function over the shards on the pool, in order"""
+        if len(shards) <= 1:
+            return [function(shard) for shard in shards]
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="search")
+        return list(self._executor.map(function, shards))
+
+
+# One pool for every namespace's index
+SCORER = ShardedScorer()
+
+
+def split_rows(lengths: List[int], count: int) -> List[Tuple[int, int, int]]:
+    """
+    Split consecutive segments into about count contiguous row ranges
+
+    Args:
+        lengths: Rows of each segment
+        count: Number of shards wanted
+
+    Returns:
+        List of (segment index, start, stop); a shard never spans segments
+    """
+    size = max(1, -(-sum(lengths) // count))
+    shards = []
+    for s, length in enumerate(lengths):
+        for start in range(0, length, size):
+            shards.append((s, start, min(start + size, length)))
+    return shards
+
+
+class IndexSegment:
+    """A block of normalized vectors, their codes and chunk IDs"""
+
+    def __init__(
+        self,
+        chunk_ids: List[str],
+        document_ids: List[str],
+        vectors: np.ndarray,
+        codes: np.ndarray,
+        alive: Optional[np.ndarray] = None
+    ):
+        """
+        Initialize a segment
+
+        Args:
+            chunk_ids: Chunk ID of each row
+            document_ids: Document ID of each row
+            vectors: Normalized vectors (may be a read-only memmap)
+            codes: Packed sign-bit codes (may be a read-only memmap)
+            alive: Optional mask of rows not tombstoned (None = all alive)
+        """
+        self.chunk_ids = list(chunk_ids)
+        self.document_ids = np.array(document_ids, dtype=object)
+        self.vectors = vectors
+        self.codes = codes
+        self.alive = alive
+
+    def __len__(self) -> int:
+        return len(self.chunk_ids)
+
+    @property
+    def mapped(self) -> bool:
+        """True if vectors are served from a memory-mapped file"""
+        return isinstance(self.vectors, np.memmap)
+
+
+class VectorIndex:
+    """Index of normalized search vectors and their sign-bit codes"""
+
+    def __init__(self):
+        """Initialize an empty index"""
+        self.use_binary = os.getenv("BINARY_PREFILTER", "true").lower() == "true"
+        # Below this size an exact scan is cheaper than prefilter + rescore
+        self.binary_min_size = int(os.getenv("BINARY_PREFILTER_MIN_SIZE", "20000"))
+        self.rescore_candidates = int(os.getenv("BINARY_RESCORE_CANDIDATES", "300"))
+        # In-memory appends are coalesced up to this many rows per segment
+        self.segment_rows = int(os.getenv("INDEX_SEGMENT_ROWS", "50000"))
+
+        self._lock = threading.Lock()
+        self.segments: List[IndexSegment] = []
+        # Deleted documents whose rows are still present until compaction
+        self.tombstones = set()
+        # Bumped whenever rows are removed; rows are only appended in between
+        self.epoch = 0
+
+    def __len__(self) -> int:
+        return sum(len(segment) for segment in self.segments)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory (or mapped file size) held by vectors and codes"""
+        return sum(seg.vectors.nbytes + seg.codes.nbytes for seg in self.segments)
+
+    def _alive_mask(self, document_ids: np.ndarray) -> Optional[np.ndarray]:
+        """Mask of rows not belonging to tombstoned documents (None = all alive)"""
+        if not self.tombstones or len(document_ids) == 0:
+            return None
+        alive = ~np.isin(document_ids, list(self.tombstones))
+        return None if alive.all() else alive
+
+    def add(self, chunk_ids: List[str], document_ids: List[str], vectors: np.ndarray):
+        """
+        Add vectors to the index
+
+        Args:
+            chunk_ids: Chunk IDs
+            document_ids: Document ID of each chunk
+            vectors: Search vectors (n x d)
+        """
+        if not chunk_ids:
+            return
+
+        vectors = normalize_rows(np.asarray(vectors, dtype=np.float32))
+        codes = pack_sign_bits(vectors)
+
+        with self._lock:
+            last = self.segments[-1] if self.segments else None
+            if last is not None and not last.mapped and len(last) < self.segment_rows:
+                document_ids = np.concatenate([last.document_ids, np.array(document_ids, dtype=object)])
+                merged = IndexSegment(
+                    last.chunk_ids + list(chunk_ids),
+                    document_ids,
+                    np.vstack([last.vectors, vectors]),
+                    np.vstack([last.codes, codes]),
+                    self._alive_mask(document_ids)
+                )
+                self.segments = self.segments[:-1] + [merged]
+            else:
+                segment = IndexSegment(chunk_ids, document_ids, vectors, codes)
+                segment.alive = self._alive_mask(segment.document_ids)
+                self.segments = self.segments + [segment]
+
+    def add_segment(self, segment: IndexSegment):
+        """
+        Add a prepared segment without copying its arrays
+
+        Args:
+            segment: Segment with normalized vectors and codes
+        """
+        if len(segment) == 0:
+            return
+        with self._lock:
+            # Rows the segment already masks (deleted in its store) stay masked
+            alive = self._alive_mask(segment.document_ids)
+            if alive is not None and segment.alive is not None:
+                segment.alive = segment.alive & alive
+            elif alive is not None:
+                segment.alive = alive
+            self.segments = self.segments + [segment]
+
+    def tombstone(self, document_id: str):
+        """
+        Hide a document's vectors from search without moving any data
+
+        Args:
+            document_id: Document ID
+        """
+        with self._lock:
+            self.tombstones.add(document_id)
+            for segment in self.segments:
+                dead = segment.document_ids == document_id
+                if dead.any():
+                    alive = segment.alive.copy() if segment.alive is not None else np.ones(len(segment), dtype=bool)
+                    alive[dead] = False
+                    segment.alive = alive
+
+    def purge(self, document_ids: Iterable[str]):
+        """
+        Physically drop the rows of tombstoned documents and release their tombstones
+
+        Segments without dead rows are kept as they are. Memory-mapped segments
+        are never copied: their dead rows stay masked until the segment store
+        rewrites them.
+
+        Args:
+            document_ids: Documents to purge
+        """
+        document_ids = set(document_ids)
+        if not document_ids:
+            return
+
+        with self._lock:
+            segments = []
+            for segment in self.segments:
+                keep = ~np.isin(segment.document_ids, list(document_ids))
+                if keep.all():
+                    segments.append(segment)
+                elif segment.mapped:
+                    segment.alive = keep if segment.alive is None else segment.alive & keep
+                    segments.append(segment)
+                elif keep.any():
+                    segments.append(IndexSegment(
+                        [cid for cid, k in zip(segment.chunk_ids, keep) if k],
+                        segment.document_ids[keep],
+                        np.asarray(segment.vectors[keep]),
+                        np.asarray(segment.codes[keep]),
+                        segment.alive[keep] if segment.alive is not None else None
+                    ))
+            self.segments = segments
+            self.tombstones -= document_ids
+            self.epoch += 1
+
+    def clear(self, tombstones: bool = True):
+        """
+        Remove everything from the index
+
+        Args:
+            tombstones: Also forget deleted documents (False when reloading segments)
+        """
+        with self._lock:
+            self.segments = []
+            self.epoch += 1
+            if tombstones:
+                self.tombstones = set()
+
+    def search(
+        self,
+        query: np.ndarray,
+        top_k: int,
+        min_score: float = 0.0,
+        stats: Optional[Dict[str, Any]] = None,
+        mmr_lambda: Optional[float] = None,
+        mmr_candidates: int = 50,
+        threads: Optional[int] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Find the chunks most similar to the query
+
+        Large scans are split into row shards scored in parallel; each
+        shard keeps its own best rows and only those are merged.
+
+        Args:
+            query: Query search vector (d,)
+            top_k: Number of results to return
+            min_score: Minimum cosine similarity
+            stats: Optional dict that receives "chunks_scanned"
+            mmr_lambda: If set, pick top_k of the best mmr_candidates by
+                maximal marginal relevance (1.0 = pure relevance)
+            mmr_candidates: Candidate pool size for MMR
+            threads: Scoring threads for this search (default: fair share of SEARCH_THREADS)
+
+        Returns:
+            List of (chunk_id, score), best first (in MMR selection order with mmr_lambda)
+        """
+        with SCORER.budget(threads) as threads:
+            return self._search(query, top_k, min_score, stats, mmr_lambda, mmr_candidates, threads)
+
+    def _search(
+        self,
+        query: np.ndarray,
+        top_k: int,
+        min_score: float,
+        stats: Optional[Dict[str, Any]],
+        mmr_lambda: Optional[float],
+        mmr_candidates: int,
+        threads: int
+    ) -> List[Tuple[str, float]]:
+        with self._lock:
+            segments = self.segments
+
+        total = sum(len(segment) for segment in segments)
+        # Tombstoned rows are masked out of both scoring stages
+        if any(segment.alive is not None for segment in segments):
+            alive = np.concatenate([
+                segment.alive if segment.alive is not None else np.ones(len(segment), dtype=bool)
+                for segment in segments
+            ])
+        else:
+            alive = None
+        if stats is not None:
+            stats["chunks_scanned"] = total
+        if total == 0:
+            return []
+
+        query = normalize_rows(np.asarray(query, dtype=np.float32)[None, :])[0]
+        pool_k = max(top_k, mmr_candidates) if mmr_lambda is not None else top_k
+        # Global row offset of each segment
+        offsets = np.cumsum([0] + [len(segment) for segment in segments])
+        shard_count = SCORER.shard_count(total, threads)
+        shards = split_rows([len(segment) for segment in segments], shard_count) if shard_count > 1 else None
+
+        if self.use_binary and total >= self.binary_min_size:
+            # First stage: Hamming scan over sign bits
+            query_code = pack_sign_bits(query[None, :])[0]
+            num_candidates = min(max(self.rescore_candidates, pool_k), total)
+            if shards:
+                def nearest(shard):
+                    s, start, stop = shard
+                    distances = hamming_distances(segments[s].codes[start:stop], query_code)
+                    if segments[s].alive is not None:
+                        distances[~segments[s].alive[start:stop]] = np.iinfo(distances.dtype).max
+                    rows = smallest(distances, num_candidates)
+                    return offsets[s] + start + rows, distances[rows]
+
+                rows, distances = (np.concatenate(part) for part in zip(*SCORER.map(nearest, shards)))
+                candidates = rows[smallest(distances, num_candidates, rows)]
+            else:
+                distances = np.concatenate([hamming_distances(seg.codes, query_code) for seg in segments])
+                if alive is not None:
+                    distances[~alive] = np.iinfo(distances.dtype).max
+                candidates = smallest(distances, num_candidates)
+            candidates.sort()
+
+            # Second stage: exact cosine on the candidates only
+            scores = np.empty(len(candidates), dtype=np.float32)
+            seg_of = np.searchsorted(offsets, candidates, side="right") - 1
+            for s, segment in enumerate(segments):
+                rows = seg_of == s
+                if rows.any():
+                    scores[rows] = segment.vectors[candidates[rows] - offsets[s]] @ query
+        elif shards:
+            def best_rows(shard):
+                s, start, stop = shard
+                scores = segments[s].vectors[start:stop] @ query
+                if segments[s].alive is not None:
+                    scores[~segments[s].alive[start:stop]] = -np.inf
+                rows = smallest(-scores, pool_k)
+                return offsets[s] + start + rows, scores[rows]
+
+            # Only each shard's best pool_k rows reach the merge below
+            candidates, scores = (np.concatenate(part) for part in zip(*SCORER.map(best_rows, shards)))
+        else:
+            candidates = np.arange(total)
+            scores = np.concatenate([segment.vectors @ query for segment in segments])
+
+        if alive is not None:
+            scores[~alive[candidates]] = -np.inf
+
+        best = smallest(-scores, pool_k, candidates)
+        best = best[scores[best] >= min_score]
+
+        rows = candidates[best]
+        seg_of = np.searchsorted(offsets, rows, side="right") - 1
+
+        if mmr_lambda is not None and len(best) > top_k:
+            vectors = np.empty((len(rows), query.shape[0]), dtype=np.float32)
+            for s in np.unique(seg_of):
+                in_segment = seg_of == s
+                vectors[in_segment] = segments[s].vectors[rows[in_segment] - offsets[s]]
+            order = mmr_select(scores[best], vectors, top_k, mmr_lambda)
+        else:
+            order = np.arange(min(top_k, len(best)))
+
+        return [
+            (segments[seg_of[i]].chunk_ids[rows[i] - offsets[seg_of[i]]], float(scores[best[i]]))
+            for i in order
+        ]
@@ -1,71 +1,604 @@
 """
 Vector Store Module
-Handles MongoDB vector storage and similarity search
+Handles vector storage (MongoDB or in-memory backend) and similarity search
 """
 
 import os
-from typing import List, Dict, Any, Optional
-from datetime import datetime
+import time
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple, Callable
+from datetime import datetime, timedelta
 import numpy as np
-from pymongo import MongoClient
-from pymongo.errors import DuplicateKeyError
+from pymongo.errors import BulkWriteError
 from dotenv import load_dotenv
 
-from models import DocumentChunk, Document, ProcessingStatus
+from models import DocumentChunk, Document, ProcessingStatus, DEFAULT_NAMESPACE
+from dim_reduction import EmbeddingReducer, evaluate_recall
+from vector_index import VectorIndex
+from segment_store import SegmentStore
+from index_snapshot import IndexSnapshotStore
+from metrics import QUERY_STAGE_SECONDS, time_stage
+from store_backends import VectorStoreBackend, create_backend, encode_document_cursor, failed_writes, namespace_of
 
 load_dotenv()
 
 
+class _NamespaceIndex:
+    """Search index of one namespace, with its optional on-disk segments"""
+
+    def __init__(self, segment_store: Optional[SegmentStore]):
+        self.index = VectorIndex()
+        self.loaded = False
+        self.segment_store = segment_store
+        self.last_used = time.monotonic()
+        # Every change up to this generation is reflected in the index
+        self.generation = 0
+        # Last change of this namespace that touched the index, and the one
+        # the latest snapshot reflects
+        self.index_generation = 0
+        self.snapshot_generation: Optional[int] = None
+        # Snapshot the index rows are known to extend: (snapshot ID, rows, index epoch)
+        self.snapshot_base: Optional[Tuple[str, int, int]] = None
+        # Documents with rows in the index (to skip replayed inserts)
+        self.documents = set()
+
+
 class VectorStore:
-    """MongoDB-based vector store for document chunks"""
+    """
+    Vector store for document chunks over a pluggable storage backend
+
+    Every namespace (tenant corpus) has its own search index, loaded on
+    the first search in that namespace. At most INDEX_MAX_NAMESPACES
+    indexes stay in memory (least recently used go first), and indexes
+    unused for INDEX_IDLE_SECONDS are dropped by evict_idle_indexes().
+    An evicted namespace is simply reloaded on its next search.
+
+    Writes are numbered in the backend's change log. A loaded index
+    remembers the generation it reflects; with INDEX_SNAPSHOT_DIR set it
+    is periodically written to disk and restored from there on startup,
+    replaying only the changes logged after the snapshot. Changes made
+    by other workers are picked up by poll_changes(), which also tells
+    registered listeners so they can drop cached state.
+    """
     
-    def __init__(self):
-        """Initialize MongoDB connection"""
-        mongodb_uri = os.getenv("MONGODB_URI")
-        db_name = os.getenv("MONGODB_DB_NAME", "document_qa")
+    def __init__(self, backend: Optional[VectorStoreBackend] = None):
+        """
+        Initialize the vector store
+        
+        Args:
+            backend: Storage backend (defaults to the one selected by VECTOR_STORE_BACKEND)
+        """
+        self.backend = backend or create_backend()
         
-        if not mongodb_uri:
-            raise ValueError("MONGODB_URI environment variable not set")
+        # Optional reduced-dimension search vectors
+        self.reducer = EmbeddingReducer()
+        self._load_projection()
         
-        self.client = MongoClient(mongodb_uri)
-        self.db = self.client[db_name]
+        # Per-namespace search indexes, least recently used first
+        self._indexes: "OrderedDict[str, _NamespaceIndex]" = OrderedDict()
+        self.max_indexes = int(os.getenv("INDEX_MAX_NAMESPACES", "32"))
+        self.idle_seconds = float(os.getenv("INDEX_IDLE_SECONDS", "900"))
+        # Serializes index loads, appends and compaction
+        self._index_lock = threading.RLock()
         
-        # Collections
-        self.chunks_collection = self.db["chunks"]
-        self.documents_collection = self.db["documents"]
+        # Optional memory-mapped vector segments (the backend stays the system of record)
+        self.segment_dir = os.getenv("VECTOR_SEGMENT_DIR") or None
+        # Snapshots for warm restarts (segment stores are already on disk)
+        self.snapshots = (
+            IndexSnapshotStore() if os.getenv("INDEX_SNAPSHOT_DIR") and self.segment_dir is None else None
+        )
+        # How long a missing generation may still be in flight before it is skipped
+        self.change_gap_seconds = float(os.getenv("CHANGE_LOG_GAP_SECONDS", "10"))
+        # Last generation handed to poll_changes() listeners
+        self._seen_generation = self.backend.current_generation()
+        self._change_listeners: List[Callable[[List[Dict[str, Any]]], None]] = []
+    
+    def _load_projection(self):
+        """Load the active projection, if stored chunks have been re-projected"""
+        if self.reducer.mode == "none":
+            return
+        
+        record = self.backend.latest_projection(self.reducer.mode, self.reducer.target_dim)
+        if record:
+            self.reducer.load_record(record)
+            print(f"📐 Using search projection {self.reducer.version}")
+        else:
+            print(f"⚠️  No {self.reducer.mode} projection applied yet, searching full embeddings")
+    
+    def _to_record(self, chunk: DocumentChunk) -> Dict[str, Any]:
+        """
+        Convert a chunk to its stored form, adding the reduced search vector
         
-        # Create indexes
-        self._create_indexes()
+        Args:
+            chunk: Document chunk with embedding
+            
+        Returns:
+            Dictionary to insert
+        """
+        record = chunk.model_dump()
+        if self.reducer.active and record.get("embedding") is not None:
+            record["search_embedding"] = self.reducer.transform(record["embedding"]).tolist()
+            record["projection_version"] = self.reducer.version
+        return record
+    
+    def _search_vectors(self):
+        """
+        Field and projection version of the vectors to score
+        
+        Only reduced vectors of the active projection are used, so stored
+        vectors and the query are always in the same space.
+        
+        Returns:
+            Tuple of (vector field name, projection version or None)
+        """
+        if self.reducer.active:
+            return "search_embedding", self.reducer.version
+        return "embedding", None
+    
+    def _segment_store(self, namespace: str) -> Optional[SegmentStore]:
+        """Segment store of a namespace (the default one keeps the top-level directory)"""
+        if self.segment_dir is None:
+            return None
+        if namespace == DEFAULT_NAMESPACE:
+            return SegmentStore(self.segment_dir)
+        return SegmentStore(str(Path(self.segment_dir) / "namespaces" / namespace))
+    
+    def _namespace_index(self, namespace: str) -> _NamespaceIndex:
+        """Get (or create) the index entry of a namespace and mark it used"""
+        with self._index_lock:
+            entry = self._indexes.get(namespace)
+            if entry is None:
+                entry = _NamespaceIndex(self._segment_store(namespace))
+                self._indexes[namespace] = entry
+                # Make room by dropping the least recently used indexes
+                while len(self._indexes) > max(1, self.max_indexes):
+                    evicted, _ = self._indexes.popitem(last=False)
+                    print(f"🗂️  Evicted search index of namespace {evicted}")
+            else:
+                self._indexes.move_to_end(namespace)
+            entry.last_used = time.monotonic()
+            return entry
+    
+    def _ensure_index(self, namespace: str) -> _NamespaceIndex:
+        """Load a namespace's search vectors into its index once"""
+        entry = self._namespace_index(namespace)
+        if not entry.loaded:
+            with self._index_lock:
+                if not entry.loaded:
+                    self._load_index(namespace, entry)
+        return entry
+    
+    def _load_index(self, namespace: str, entry: _NamespaceIndex, reuse: bool = True):
+        """(Re)build a namespace's index from a snapshot, its segment store or the backend"""
+        vector_field, version = self._search_vectors()
+        index, segment_store = entry.index, entry.segment_store
+        # Read first: changes logged while loading are replayed afterwards
+        generation = self.backend.current_generation()
+        index.clear()
+        entry.documents = set()
+        # Documents deleted but not yet compacted stay hidden
+        for deleted in self.backend.list_deleted_documents(namespace):
+            index.tombstone(deleted["document_id"])
+        
+        if reuse and self.snapshots is not None:
+            snapshot = self.snapshots.load(namespace, version or "full")
+            if snapshot is not None:
+                for document_id in snapshot["tombstones"]:
+                    index.tombstone(document_id)
+                for segment in snapshot["segments"]:
+                    index.add_segment(segment)
+                    entry.documents.update(segment.document_ids)
+                entry.generation = snapshot["generation"]
+                entry.index_generation = entry.snapshot_generation = snapshot["index_generation"]
+                entry.snapshot_base = (snapshot["id"], len(index), index.epoch)
+                entry.loaded = True
+                print(
+                    f"🗂️  Restored {len(index)} vectors of namespace {namespace} "
+                    f"from snapshot generation {snapshot['generation']}"
+                )
+                replayed = self._catch_up(namespace, entry)
+                if replayed:
+                    print(f"🗂️  Replayed {replayed} changes of namespace {namespace} since the snapshot")
+                return
+        
+        # Reuse on-disk segments: replay the changes logged since they were
+        # written, then check them against the system of record
+        if segment_store is not None:
+            reusable = segment_store.reusable_generation(version or "full") if reuse else None
+            # A generation ahead of the log was written against another database
+            if reusable is not None and reusable <= generation and self._pending_changes(reusable) is not None:
+                self._reload_segments(entry)
+                entry.generation = entry.index_generation = reusable
+                entry.loaded = True
+                self._catch_up(namespace, entry)
+                if not entry.loaded or segment_store.live_rows() == self.backend.count_vectors(vector_field, version, namespace):
+                    print(f"🗂️  Mapped {len(index)} vectors of namespace {namespace} from {segment_store.directory}")
+                    return
+                print(f"⚠️  Segments of namespace {namespace} do not match the stored chunks, rebuilding")
+                entry.loaded = False
+                self._load_index(namespace, entry, reuse=False)
+                return
+            segment_store.reset(version or "full")
+        
+        self._load_vectors(namespace, entry)
+        entry.generation = entry.index_generation = generation
+        entry.loaded = True
+        
+        if segment_store is not None:
+            # Loading appends many small segments: combine them before serving
+            for names in segment_store.merge_plan():
+                segment_store.merge(names)
+            self._reload_segments(entry)
+            segment_store.set_generation(generation)
+        print(f"🗂️  Loaded {len(index)} vectors of namespace {namespace} into the search index")
+    
+    def _load_vectors(self, namespace: str, entry: _NamespaceIndex, document_ids: Optional[List[str]] = None):
+        """Add a namespace's stored vectors (or only those of some documents) to its index"""
+        vector_field, version = self._search_vectors()
+        chunk_ids, chunk_document_ids, vectors = [], [], []
+        for chunk in self.backend.iter_vectors(vector_field, version, namespace, document_ids=document_ids):
+            chunk_ids.append(chunk["chunk_id"])
+            chunk_document_ids.append(chunk["document_id"])
+            vectors.append(chunk[vector_field])
+            if len(chunk_ids) >= 5000:
+                self._add_vectors(entry, chunk_ids, chunk_document_ids, vectors)
+                chunk_ids, chunk_document_ids, vectors = [], [], []
+        
+        self._add_vectors(entry, chunk_ids, chunk_document_ids, vectors)
+    
+    def _add_vectors(self, entry: _NamespaceIndex, chunk_ids: List[str], document_ids: List[str], vectors):
+        """Add vectors (lists or a matrix) to an index (through its segment store if enabled)"""
+        if not chunk_ids:
+            return
+        
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if entry.segment_store is not None:
+            entry.index.add_segment(entry.segment_store.append(chunk_ids, document_ids, matrix))
+        else:
+            entry.index.add(chunk_ids, document_ids, matrix)
+        entry.documents.update(document_ids)
+    
+    def _pending_changes(self, generation: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        Changes logged after a generation, in order and without gaps
+        
+        A writer numbers its change before logging it, so a missing
+        generation may still be in flight: reading stops there until it
+        is CHANGE_LOG_GAP_SECONDS old, after which it is skipped (the
+        writer failed in between).
+        
+        Args:
+            generation: Generation already applied
+            
+        Returns:
+            Changes to apply, or None if the log no longer reaches back that far
+        """
+        pending = []
+        expected = generation + 1
+        gap_cutoff = datetime.utcnow() - timedelta(seconds=self.change_gap_seconds)
+        while True:
+            changes = self.backend.changes_since(expected - 1)
+            for change in changes:
+                if change["generation"] != expected:
+                    if change["at"] > gap_cutoff:
+                        return pending
+                    if expected == generation + 1:
+                        # Oldest entries fell off the capped log
+                        return None
+                pending.append(change)
+                expected = change["generation"] + 1
+            if len(changes) < 1000:
+                return pending
+    
+    def _catch_up(self, namespace: str, entry: _NamespaceIndex) -> int:
+        """
+        Apply the changes logged since a loaded index's generation
+        
+        Args:
+            namespace: Namespace of the index
+            entry: Loaded index entry
+            
+        Returns:
+            Number of changes of this namespace applied
+        """
+        with self._index_lock:
+            changes = self._pending_changes(entry.generation)
+            if changes is None:
+                print(f"⚠️  Change log does not reach generation {entry.generation}, reloading namespace {namespace}")
+                self._load_index(namespace, entry, reuse=False)
+                return 0
+            
+            applied = 0
+            inserted = {}
+            for change in changes:
+                if change["namespace"] not in (None, namespace) or change["op"] == "status":
+                    continue
+                applied += 1
+                entry.index_generation = change["generation"]
+                if change["op"] in ("clear", "reload", "projection"):
+                    # Rebuilding reads the current state, which covers all later changes
+                    self._load_index(namespace, entry, reuse=False)
+                    return applied
+                if change["op"] == "insert":
+                    inserted.update(
+                        (document_id, None) for document_id in change["document_ids"]
+                        if document_id not in entry.documents
+                    )
+                elif change["op"] == "delete":
+                    for document_id in change["document_ids"]:
+                        entry.index.tombstone(document_id)
+                elif change["op"] == "compact":
+                    if entry.segment_store is not None:
+                        for document_id in change["document_ids"]:
+                            entry.segment_store.delete_document(document_id)
+                    entry.index.purge(change["document_ids"])
+                    entry.documents.difference_update(change["document_ids"])
+            
+            if inserted:
+                self._load_vectors(namespace, entry, list(inserted))
+            if changes:
+                entry.generation = changes[-1]["generation"]
+                if entry.segment_store is not None:
+                    entry.segment_store.set_generation(entry.generation)
+            return applied
+    
+    def _reload_segments(self, entry: _NamespaceIndex):
+        """Swap an index's contents for its on-disk segments"""
+        segments = entry.segment_store.load()
+        entry.index.clear(tombstones=False)
+        entry.documents = set()
+        for segment in segments:
+            entry.index.add_segment(segment)
+            alive = segment.document_ids if segment.alive is None else segment.document_ids[segment.alive]
+            entry.documents.update(alive)
+    
+    def _index_records(self, records: List[Dict[str, Any]], vectors: Optional[np.ndarray] = None):
+        """
+        Log freshly stored chunk records and add them to the loaded indexes of their namespaces
+        
+        Args:
+            records: Stored chunk records
+            vectors: Search vectors of all records as one matrix (None = read them from the records)
+        """
+        vector_field, _ = self._search_vectors()
+        by_namespace: Dict[str, List[int]] = {}
+        for i, record in enumerate(records):
+            if vectors is not None or record.get(vector_field) is not None:
+                by_namespace.setdefault(namespace_of(record), []).append(i)
+        
+        with self._index_lock:
+            for namespace, rows in by_namespace.items():
+                self.backend.record_change(
+                    "insert", namespace, list(dict.fromkeys(records[i]["document_id"] for i in rows))
+                )
+                entry = self._indexes.get(namespace)
+                if entry is None or not entry.loaded:
+                    continue
+                self._add_vectors(
+                    entry,
+                    [records[i]["chunk_id"] for i in rows],
+                    [records[i]["document_id"] for i in rows],
+                    vectors[rows] if vectors is not None else [records[i][vector_field] for i in rows]
+                )
+    
+    def _invalidate_index(self, namespace: str):
+        """Have a namespace's index rebuilt on its next search (in every worker)"""
+        with self._index_lock:
+            self.backend.record_change("reload", namespace)
+            entry = self._indexes.get(namespace)
+            if entry is not None:
+                entry.loaded = False
+    
+    def evict_idle_indexes(self) -> int:
+        """
+        Drop the search indexes of namespaces not searched for INDEX_IDLE_SECONDS
+        
+        Returns:
+            Number of indexes dropped
+        """
+        if self.idle_seconds <= 0:
+            return 0
+        cutoff = time.monotonic() - self.idle_seconds
+        with self._index_lock:
+            idle = [namespace for namespace, entry in self._indexes.items() if entry.last_used < cutoff]
+            for namespace in idle:
+                del self._indexes[namespace]
+        if idle:
+            print(f"🗂️  Evicted idle search indexes: {', '.join(idle)}")
+        return len(idle)
+    
+    def index_stats(self) -> Dict[str, int]:
+        """
+        Size of the search indexes currently in memory
+        
+        Returns:
+            Dictionary with loaded namespaces, vectors and bytes
+        """
+        with self._index_lock:
+            indexes = [entry.index for entry in self._indexes.values() if entry.loaded]
+        return {
+            "namespaces": len(indexes),
+            "vectors": sum(len(index) for index in indexes),
+            "bytes": sum(index.nbytes for index in indexes)
+        }
+    
+    def add_change_listener(self, listener: Callable[[List[Dict[str, Any]]], None]):
+        """
+        Register a callback for changes seen by poll_changes()
+        
+        Args:
+            listener: Called with the new change-log entries, oldest first
+        """
+        self._change_listeners.append(listener)
+    
+    def poll_changes(self) -> int:
+        """
+        Bring this worker up to date with writes logged by any worker
+        
+        Costs one counter read when nothing changed. Otherwise the loaded
+        indexes replay the new changes, a projection fitted elsewhere is
+        loaded, and listeners are called with the changes.
+        
+        Returns:
+            Number of new changes
+        """
+        generation = self.backend.current_generation()
+        if generation == self._seen_generation:
+            return 0
+        
+        changes = self._pending_changes(self._seen_generation)
+        if changes is None:
+            # Too far behind to tell what changed: treat everything as stale
+            changes = [{"generation": generation, "op": "reload", "namespace": None, "document_ids": []}]
+        if not changes:
+            return 0
+        
+        if any(change["op"] == "projection" for change in changes) and self.reducer.mode != "none":
+            record = self.backend.latest_projection(self.reducer.mode, self.reducer.target_dim)
+            if record and record["version"] != self.reducer.version:
+                reducer = EmbeddingReducer(self.reducer.mode, self.reducer.target_dim)
+                reducer.load_record(record)
+                with self._index_lock:
+                    self.reducer = reducer
+                    self._indexes.clear()
+                print(f"📐 Switched to search projection {reducer.version}")
+        
+        with self._index_lock:
+            entries = [(namespace, entry) for namespace, entry in self._indexes.items() if entry.loaded]
+        for namespace, entry in entries:
+            with self._index_lock:
+                if entry.loaded:
+                    self._catch_up(namespace, entry)
+        
+        for listener in self._change_listeners:
+            try:
+                listener(changes)
+            except Exception as e:
+                print(f"⚠️  Change listener failed: {e}")
+        self._seen_generation = changes[-1]["generation"]
+        return len(changes)
+    
+    def merge_segments(self) -> int:
+        """
+        Merge the on-disk segments of loaded indexes that need it (run by the compactor)
+        
+        Segment files are written without holding the index lock; the
+        index only swaps in the merged segments afterwards.
+        
+        Returns:
+            Number of merges done
+        """
+        with self._index_lock:
+            entries = [entry for entry in self._indexes.values() if entry.loaded and entry.segment_store is not None]
+        
+        merged = 0
+        for entry in entries:
+            plan = entry.segment_store.merge_plan()
+            for names in plan:
+                entry.segment_store.merge(names)
+            if plan:
+                merged += len(plan)
+                with self._index_lock:
+                    if entry.loaded:
+                        self._reload_segments(entry)
+        return merged
+    
+    def restore_indexes(self) -> int:
+        """
+        Load the indexes of namespaces that have a snapshot (up to INDEX_MAX_NAMESPACES)
+        
+        Returns:
+            Number of indexes loaded
+        """
+        if self.snapshots is None:
+            return 0
+        namespaces = self.snapshots.namespaces()[:max(1, self.max_indexes)]
+        # Least recently saved first, so the LRU order matches
+        for namespace in reversed(namespaces):
+            self._ensure_index(namespace)
+        return len(namespaces)
     
-    def _create_indexes(self):
-        """Create necessary indexes"""
-        # Index for document_id lookups
-        self.chunks_collection.create_index("document_id")
-        self.documents_collection.create_index("document_id", unique=True)
+    def snapshot_indexes(self) -> int:
+        """
+        Write snapshots of the loaded indexes that changed since their last one
+        
+        Only changes of a namespace's own index count, and rows added since
+        the snapshot this worker last saved or loaded are appended to it.
+        
+        Returns:
+            Number of snapshots written
+        """
+        if self.snapshots is None:
+            return 0
+        version = self._search_vectors()[1] or "full"
+        with self._index_lock:
+            entries = [(namespace, entry) for namespace, entry in self._indexes.items() if entry.loaded]
         
-        # Index for chunk_id
-        self.chunks_collection.create_index("chunk_id", unique=True)
+        written = 0
+        for namespace, entry in entries:
+            with self._index_lock:
+                if not entry.loaded:
+                    continue
+                self._catch_up(namespace, entry)
+                generation, index_generation = entry.generation, entry.index_generation
+                if index_generation == entry.snapshot_generation:
+                    continue
+                segments, tombstones = entry.index.segments, set(entry.index.tombstones)
+                rows, epoch = len(entry.index), entry.index.epoch
+                base = entry.snapshot_base
+                # Rows removed since: the snapshot no longer is a prefix of the index
+                base = base[:2] if base is not None and base[2] == epoch else None
+            
+            # Written outside the lock: segments are replaced, never modified in place
+            saved = self.snapshots.save(namespace, segments, tombstones, generation, index_generation, version, base)
+            if saved is None:
+                # Another worker is writing; retried on the next pass
+                continue
+            entry.snapshot_generation = index_generation
+            if saved["id"] is None:
+                # Already saved by another worker, whose rows are not a prefix of ours
+                entry.snapshot_base = None
+                continue
+            entry.snapshot_base = (saved["id"], rows, epoch)
+            written += 1
+            print(f"💾 Snapshot of namespace {namespace}: {saved['rows']} vectors written at generation {generation}")
+        return written
     
     def store_document(self, document: Document) -> bool:
         """
         Store document metadata
         
+        Re-storing a deleted (not yet compacted) document makes it live
+        again; the chunks it had before deletion are removed first.
+        
         Args:
             document: Document metadata
             
         Returns:
             True if successful
         """
-        try:
-            self.documents_collection.insert_one(document.model_dump())
-            return True
-        except DuplicateKeyError:
-            # Update existing document
-            self.documents_collection.update_one(
-                {"document_id": document.document_id},
-                {"$set": document.model_dump()}
-            )
-            return True
+        namespace = self.backend.upsert_document(document.model_dump())
+        if namespace is not None:
+            self.backend.delete_chunks(document.document_id, namespace=namespace)
+            self.backend.delete_sentences(document.document_id)
+            self._purge_document(document.document_id, namespace)
+        return True
+    
+    def store_documents_batch(self, documents: List[Document]) -> int:
+        """
+        Store metadata of many new documents in one write
+        
+        Args:
+            documents: Document metadata
+            
+        Returns:
+            Number of documents stored
+        """
+        if not documents:
+            return 0
+        return self.backend.insert_documents([document.model_dump() for document in documents])
     
     def store_chunk(self, chunk: DocumentChunk) -> bool:
         """
@@ -77,16 +610,13 @@ class VectorStore:
         Returns:
             True if successful
         """
-        try:
-            self.chunks_collection.insert_one(chunk.model_dump())
-            return True
-        except DuplicateKeyError:
-            # Update existing chunk
-            self.chunks_collection.update_one(
-                {"chunk_id": chunk.chunk_id},
-                {"$set": chunk.model_dump()}
-            )
-            return True
+        record = self._to_record(chunk)
+        if self.backend.upsert_chunk(record):
+            self._index_records([record])
+        else:
+            # Reload the index rather than patch a replaced vector
+            self._invalidate_index(chunk.namespace)
+        return True
     
     def store_chunks_batch(self, chunks: List[DocumentChunk]) -> int:
         """
@@ -101,15 +631,72 @@ class VectorStore:
         if not chunks:
             return 0
         
-        chunk_dicts = [chunk.model_dump() for chunk in chunks]
-        result = self.chunks_collection.insert_many(chunk_dicts, ordered=False)
-        return len(result.inserted_ids)
+        chunk_dicts = [self._to_record(chunk) for chunk in chunks]
+        return self._insert_records(chunk_dicts)
+    
+    def store_chunk_records(self, records: List[Dict[str, Any]]) -> int:
+        """
+        Store chunk records built as plain dictionaries (bulk ingestion path)
+        
+        Records carry the DocumentChunk fields with the embedding as a list
+        of floats. Instead of building and dumping a model per chunk, the
+        first record is validated against DocumentChunk and the embeddings
+        are checked as one matrix, which also feeds the projection and the
+        index. The records are stored as given (search vectors are added).
+        
+        Args:
+            records: Chunk records with embeddings
+            
+        Returns:
+            Number of chunks stored
+        """
+        if not records:
+            return 0
+        
+        DocumentChunk.model_validate(records[0])
+        try:
+            vectors = np.asarray([record["embedding"] for record in records], dtype=np.float32)
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Chunk embeddings must be float lists of one dimension: {e}")
+        if vectors.ndim != 2:
+            raise ValueError("Chunk embeddings must be float lists of one dimension")
+        
+        if self.reducer.active:
+            vectors = self.reducer.transform(vectors)
+            for record, vector in zip(records, vectors.tolist()):
+                record["search_embedding"] = vector
+                record["projection_version"] = self.reducer.version
+        
+        return self._insert_records(records, vectors)
+    
+    def _insert_records(self, records: List[Dict[str, Any]], vectors: Optional[np.ndarray] = None) -> int:
+        """
+        Insert chunk records and index them
+        
+        Chunk IDs that already exist raise BulkWriteError (from either
+        backend) after the other records are written; those are still
+        indexed, so the index matches the stored chunks.
+        """
+        try:
+            inserted = self.backend.insert_chunks(records)
+        except BulkWriteError as e:
+            failed = failed_writes(e)
+            written = [i for i in range(len(records)) if i not in failed]
+            self._index_records([records[i] for i in written], vectors[written] if vectors is not None else None)
+            raise
+        self._index_records(records, vectors)
+        return inserted
     
     def similarity_search(
         self, 
         query_embedding: List[float], 
         top_k: int = 5,
-        min_score: float = 0.0
+        min_score: float = 0.0,
+        stats: Optional[Dict[str, Any]] = None,
+        mmr_lambda: Optional[float] = None,
+        mmr_candidates: int = 50,
+        namespace: str = DEFAULT_NAMESPACE,
+        threads: Optional[int] = None
     ) -> List[Dict[str, Any]]:
         """
         Perform similarity search using cosine similarity
@@ -118,108 +705,303 @@ class VectorStore:
             query_embedding: Query embedding vector
             top_k: Number of results to return
             min_score: Minimum similarity score threshold
+            stats: Optional dict that receives "chunks_scanned" and the
+                "search_ms" (index) and "fetch_ms" (chunk records) stage times
+            mmr_lambda: Optional relevance/diversity trade-off for MMR selection
+            mmr_candidates: Candidate pool size for MMR
+            namespace: Namespace to search
+            threads: Scoring threads (default: fair share of SEARCH_THREADS)
             
         Returns:
             List of matching chunks with scores
         """
-        # Get all chunks with embeddings
-        all_chunks = list(self.chunks_collection.find({"embedding": {"$exists": True}}))
-        
-        if not all_chunks:
+        with time_stage(QUERY_STAGE_SECONDS, "search", stats):
+            entry = self._ensure_index(namespace)
+            hits = entry.index.search(
+                self.reducer.transform(query_embedding),
+                top_k=top_k,
+                min_score=min_score,
+                stats=stats,
+                mmr_lambda=mmr_lambda,
+                mmr_candidates=mmr_candidates,
+                threads=threads
+            )
+        if not hits:
             return []
         
-        # Calculate cosine similarity for each chunk
-        results = []
-        query_vec = np.array(query_embedding)
-        query_norm = np.linalg.norm(query_vec)
+        # Fetch chunk text for the hits only (a database round trip, timed on its own)
+        with time_stage(QUERY_STAGE_SECONDS, "fetch", stats):
+            chunks = {
+                chunk["chunk_id"]: chunk
+                for chunk in self.backend.get_chunks_by_ids([chunk_id for chunk_id, _ in hits], namespace)
+            }
         
-        for chunk in all_chunks:
-            chunk_vec = np.array(chunk["embedding"])
-            chunk_norm = np.linalg.norm(chunk_vec)
-            
-            # Cosine similarity
-            if query_norm > 0 and chunk_norm > 0:
-                similarity = np.dot(query_vec, chunk_vec) / (query_norm * chunk_norm)
-            else:
-                similarity = 0.0
+        return [
+            {"chunk": chunks[chunk_id], "score": score}
+            for chunk_id, score in hits
+            if chunk_id in chunks
+        ]
+    
+    def fit_projection(self, sample_size: int = 5000) -> Dict[str, Any]:
+        """
+        Fit the configured projection and re-apply it to all stored chunks
+        
+        Args:
+            sample_size: Number of stored embeddings to fit on
             
-            if similarity >= min_score:
-                results.append({
-                    "chunk": chunk,
-                    "score": float(similarity)
-                })
+        Returns:
+            Report with the projection version and its recall@10 on held-out queries
+        """
+        if self.reducer.mode == "none":
+            raise ValueError("EMBEDDING_REDUCTION is not enabled")
+        
+        embeddings = np.array(self.backend.sample_embeddings(sample_size), dtype=np.float32)
+        # Recall is measured with queries the projection was not fitted on
+        num_queries = min(100, len(embeddings) // 5)
+        queries, embeddings = embeddings[:num_queries], embeddings[num_queries:]
         
-        # Sort by score and return top_k
-        results.sort(key=lambda x: x["score"], reverse=True)
-        return results[:top_k]
+        reducer = EmbeddingReducer(self.reducer.mode, self.reducer.target_dim)
+        reducer.fit(embeddings)
+        recall = evaluate_recall(embeddings, queries, reducer)
+        
+        # Re-project every stored chunk before activating the new version
+        updates = []
+        for chunk_id, embedding in self.backend.iter_embeddings():
+            updates.append((chunk_id, reducer.transform(embedding).tolist(), reducer.version))
+            if len(updates) >= 1000:
+                self.backend.set_search_vectors(updates)
+                updates = []
+        self.backend.set_search_vectors(updates)
+        
+        record = reducer.to_record()
+        record["recall_at_10"] = recall
+        record["sample_size"] = len(embeddings)
+        self.backend.save_projection(record)
+        self.reducer = reducer
+        # Every namespace reloads in the new space on its next search
+        with self._index_lock:
+            self.backend.record_change("projection", None)
+            self._indexes.clear()
+        
+        print(f"📐 Projection {reducer.version} active, recall@10 = {recall:.3f}")
+        return {
+            "version": reducer.version,
+            "mode": reducer.mode,
+            "target_dim": reducer.target_dim,
+            "recall_at_10": recall,
+            "sample_size": len(embeddings)
+        }
     
-    def get_document(self, document_id: str) -> Optional[Dict[str, Any]]:
-        """Get document metadata by ID"""
-        return self.documents_collection.find_one({"document_id": document_id})
+    def get_document(self, document_id: str, namespace: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Get document metadata by ID (only from the given namespace, if any)"""
+        return self.backend.get_document(document_id, namespace)
     
-    def get_all_documents(self) -> List[Dict[str, Any]]:
-        """Get all documents"""
-        return list(self.documents_collection.find())
+    def get_all_documents(self, namespace: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get all documents (of one namespace, if given)"""
+        return self.backend.list_documents(namespace=namespace)
     
-    def get_chunks_by_document(self, document_id: str) -> List[Dict[str, Any]]:
-        """Get all chunks for a document"""
-        return list(self.chunks_collection.find({"document_id": document_id}))
+    def list_documents(
+        self,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        fields: Optional[List[str]] = None,
+        namespace: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Get a page of documents, newest first
+        
+        Args:
+            cursor: Cursor returned with the previous page (None = first page)
+            limit: Maximum number of documents
+            fields: Document fields to return (None = all)
+            namespace: Namespace to list (None = all)
+            
+        Returns:
+            Tuple of (documents, cursor of the next page or None)
+        """
+        # One extra record tells whether another page exists
+        documents = self.backend.list_documents(cursor, limit + 1, fields, namespace)
+        next_cursor = encode_document_cursor(documents[limit - 1]) if len(documents) > limit else None
+        return documents[:limit], next_cursor
+    
+    def get_chunks_by_document(self, document_id: str, namespace: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get all chunks for a document (only from the given namespace, if any)"""
+        return self.backend.get_chunks(document_id, namespace)
     
-    def get_document_chunks(self, document_id: str) -> List[Dict[str, Any]]:
+    def get_document_chunks(self, document_id: str, namespace: Optional[str] = None) -> List[Dict[str, Any]]:
         """
         Get all chunks for a document, sorted by chunk index
         
         Args:
             document_id: Document ID
+            namespace: Namespace of the document (None = any)
             
         Returns:
-            List of chunks sorted by chunk_index
+            List of chunks sorted by chunk_index (empty for deleted documents)
         """
-        return list(self.chunks_collection.find(
-            {"document_id": document_id}
-        ).sort("chunk_index", 1))
+        if self.backend.get_document(document_id, namespace) is None:
+            return []
+        return self.backend.get_chunks(document_id, namespace)
     
-    def delete_document(self, document_id: str) -> bool:
+    def delete_document(self, document_id: str, namespace: Optional[str] = None) -> bool:
         """
-        Delete a document and all its chunks
+        Delete a document
+        
+        The document is tombstoned: it disappears from listings and search
+        immediately, and compact_deleted() removes its chunks later.
         
         Args:
             document_id: Document ID to delete
+            namespace: Only delete it from this namespace (None = any)
             
         Returns:
             True if successful
         """
-        # Delete chunks
-        self.chunks_collection.delete_many({"document_id": document_id})
+        namespace = self.backend.mark_document_deleted(document_id, namespace)
+        if namespace is None:
+            return False
+        with self._index_lock:
+            self.backend.record_change("delete", namespace, [document_id])
+            entry = self._indexes.get(namespace)
+            if entry is not None:
+                entry.index.tombstone(document_id)
+        return True
+    
+    def remove_document_chunks(self, document_id: str, namespace: str = DEFAULT_NAMESPACE) -> int:
+        """
+        Remove a document's chunks, sentences and index rows, keeping its record
+        
+        Used before (re-)indexing a document under a stable ID, so chunks
+        left by an interrupted attempt cannot collide with the new ones.
+        
+        Args:
+            document_id: Document ID
+            namespace: Namespace of the document
+            
+        Returns:
+            Number of chunks removed
+        """
+        removed = self.backend.delete_chunks(document_id, namespace=namespace)
+        self.backend.delete_sentences(document_id)
+        if removed:
+            self._purge_document(document_id, namespace)
+        return removed
+    
+    def _purge_document(self, document_id: str, namespace: str):
+        """Drop a document's index rows and tombstone, here and (via the change log) in other workers"""
+        with self._index_lock:
+            self.backend.record_change("compact", namespace, [document_id])
+            entry = self._indexes.get(namespace)
+            if entry is not None:
+                if entry.segment_store is not None and entry.loaded:
+                    entry.segment_store.delete_document(document_id)
+                entry.index.purge([document_id])
+                entry.documents.discard(document_id)
+    
+    def compact_deleted(self, batch_size: int = 1000, pause_seconds: float = 0.0) -> int:
+        """
+        Physically remove tombstoned documents, their chunks and index rows
+        
+        Args:
+            batch_size: Chunks deleted per backend call
+            pause_seconds: Pause between batches, to leave room for foreground traffic
+            
+        Returns:
+            Number of documents compacted
+        """
+        documents = self.backend.list_deleted_documents()
+        if not documents:
+            return 0
         
-        # Delete document
-        result = self.documents_collection.delete_one({"document_id": document_id})
+        removed_rows = {}
+        namespaces: Dict[str, List[str]] = {}
+        for document in documents:
+            document_id = document["document_id"]
+            namespaces.setdefault(document["namespace"], []).append(document_id)
+            removed = 0
+            while True:
+                deleted = self.backend.delete_chunks(document_id, limit=batch_size, namespace=document["namespace"])
+                removed += deleted
+                if deleted < batch_size:
+                    break
+                time.sleep(pause_seconds)
+            self.backend.delete_sentences(document_id)
+            self.backend.delete_document(document_id)
+            removed_rows[document_id] = removed
         
-        return result.deleted_count > 0
+        with self._index_lock:
+            for namespace, document_ids in namespaces.items():
+                self.backend.record_change("compact", namespace, document_ids)
+                entry = self._indexes.get(namespace)
+                if entry is None:
+                    # Not in memory: the next load replays the compaction (or rebuilds)
+                    continue
+                if entry.segment_store is not None and entry.loaded:
+                    # Rows are masked; merge_segments() rewrites only the segments holding them
+                    for document_id in document_ids:
+                        entry.segment_store.delete_document(document_id)
+                entry.index.purge(document_ids)
+                entry.documents.difference_update(document_ids)
+        
+        print(f"🧹 Compacted {len(documents)} deleted documents ({sum(removed_rows.values())} chunks)")
+        return len(documents)
     
-    def clear_all(self) -> bool:
+    def clear_all(self, namespace: Optional[str] = None) -> bool:
         """
         Clear all documents and chunks
         
+        Args:
+            namespace: Only clear this namespace (None = everything)
+        
         Returns:
             True if successful
         """
-        self.chunks_collection.delete_many({})
-        self.documents_collection.delete_many({})
+        with self._index_lock:
+            self.backend.clear(namespace)
+            self.backend.record_change("clear", namespace)
+            # Segment stores of unloaded namespaces are found stale on their next load
+            for name in list(self._indexes) if namespace is None else [namespace]:
+                entry = self._indexes.pop(name, None)
+                if entry is not None and entry.segment_store is not None:
+                    entry.segment_store.reset(self.reducer.version or "full")
         return True
     
-    def get_stats(self) -> Dict[str, int]:
+    def get_stats(self, namespace: Optional[str] = None) -> Dict[str, int]:
         """
-        Get knowledge base statistics
+        Get knowledge base statistics (from counters maintained on write)
+        
+        Args:
+            namespace: Namespace to count (None = all)
         
         Returns:
             Dictionary with counts
         """
         return {
-            "total_documents": self.documents_collection.count_documents({}),
-            "total_chunks": self.chunks_collection.count_documents({})
+            "total_documents": self.backend.count_documents(namespace),
+            "total_chunks": self.backend.count_chunks(namespace)
         }
     
+    def ping(self) -> bool:
+        """
+        Check that the storage backend is reachable
+        
+        Returns:
+            True if it responded
+        """
+        return self.backend.ping()
+    
+    def count_documents_by_status(self, namespace: Optional[str] = None) -> Dict[str, int]:
+        """
+        Count documents per processing status
+        
+        Args:
+            namespace: Namespace to count (None = all)
+        
+        Returns:
+            Mapping of status value to document count
+        """
+        return self.backend.count_documents_by_status(namespace)
+    
     def update_document_status(
         self, 
         document_id: str, 
@@ -250,9 +1032,11 @@ class VectorStore:
         if error_message is not None:
             update_data["error_message"] = error_message
         
-        result = self.documents_collection.update_one(
-            {"document_id": document_id},
-            {"$set": update_data}
-        )
+        if status == ProcessingStatus.PROCESSING:
+            # The content is about to change
+            update_data["summary"] = None
         
-        return result.modified_count > 0
+        if not self.backend.update_document(document_id, update_data):
+            return False
+        self.backend.record_change("status", None, [document_id])
+        return True
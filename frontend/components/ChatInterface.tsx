@@ -27,6 +27,8 @@ export default function ChatInterface({ refreshTrigger }: ChatInterfaceProps) {
     const [loading, setLoading] = useState(false);
     const [selectedCitation, setSelectedCitation] = useState<Citation | null>(null);
     const messagesEndRef = useRef<HTMLDivElement>(null);
+    // Chat session started by the first answer; sent back so follow-ups share its history
+    const sessionIdRef = useRef<string | null>(null);
 
     const scrollToBottom = () => {
         messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
@@ -55,10 +57,12 @@ export default function ChatInterface({ refreshTrigger }: ChatInterfaceProps) {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
+                    ...(sessionIdRef.current ? { 'X-Session-ID': sessionIdRef.current } : {}),
                 },
                 body: JSON.stringify({
                     question: userMessage.content,
                     top_k: 5,
+                    ...(sessionIdRef.current ? { session_id: sessionIdRef.current } : {}),
                 }),
             });
 
@@ -67,6 +71,9 @@ export default function ChatInterface({ refreshTrigger }: ChatInterfaceProps) {
             }
 
             const data = await response.json();
+            if (data.session_id) {
+                sessionIdRef.current = data.session_id;
+            }
 
             const assistantMessage: Message = {
                 role: 'assistant',
@@ -89,8 +96,23 @@ export default function ChatInterface({ refreshTrigger }: ChatInterfaceProps) {
         }
     };
 
-    const handleClearChat = () => {
+    const handleClearChat = async () => {
         setMessages([]);
+
+        const sessionId = sessionIdRef.current;
+        sessionIdRef.current = null;
+        if (!sessionId) return;
+
+        try {
+            const response = await fetch(`${API_URL}/api/chat/clear`, {
+                method: 'DELETE',
+                headers: { 'X-Session-ID': sessionId },
+            });
+
+            if (!response.ok) throw new Error('Failed to clear chat history');
+        } catch (error) {
+            console.error('Error clearing chat history:', error);
+        }
     };
 
     return (
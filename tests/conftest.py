@@ -0,0 +1,7 @@
+import os
+import sys
+from pathlib import Path
+
+# Backend modules import each other as top-level modules
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+os.environ.setdefault("VECTOR_STORE_BACKEND", "memory")
@@ -0,0 +1,40 @@
+import argparse
+import os
+
+import bulk_index
+from store_backends import InMemoryBackend
+from test_ingestion import WordCountEmbedder
+from vector_store import VectorStore
+
+
+def run(root, checkpoint):
+    return bulk_index.run_bulk_index(argparse.Namespace(
+        root=str(root), workers=1, checkpoint=str(checkpoint), retry_failed=False,
+        embed_batch_size=None, chunk_size=800, chunk_overlap=0, report_every=60.0,
+        namespace="default"
+    ))
+
+
+def test_a_changed_file_replaces_its_previous_version(tmp_path, monkeypatch):
+    vector_store = VectorStore(InMemoryBackend())
+    monkeypatch.setattr(bulk_index, "VectorStore", lambda: vector_store)
+    monkeypatch.setattr(bulk_index, "create_embedding_generator", WordCountEmbedder)
+    root = tmp_path / "docs"
+    root.mkdir()
+    path = root / "notes.txt"
+    checkpoint = tmp_path / "docs.checkpoint.json"
+
+    path.write_text("the first version of the notes", encoding="utf-8")
+    assert run(root, checkpoint)["files"] == 1
+    [old] = vector_store.get_all_documents()
+
+    path.write_text("a second and rather longer version of the notes", encoding="utf-8")
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert run(root, checkpoint)["files"] == 1
+
+    [new] = vector_store.get_all_documents()
+    assert new["document_id"] != old["document_id"]
+    assert vector_store.get_document_chunks(old["document_id"]) == []
+    results = vector_store.similarity_search([9.0, 1.0], top_k=5)
+    assert {result["chunk"]["document_id"] for result in results} == {new["document_id"]}
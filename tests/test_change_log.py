@@ -0,0 +1,122 @@
+from datetime import datetime
+
+from grounding import GroundingVerifier
+from rag_engine import RAGEngine
+from store_backends import InMemoryBackend
+from vector_store import VectorStore
+
+
+class InFlightBackend(InMemoryBackend):
+    """In-memory backend that can hold numbered changes back, like a writer between numbering and logging"""
+
+    def __init__(self):
+        super().__init__()
+        self.hold = False
+        self.held = []
+
+    def record_change(self, op, namespace, document_ids=None):
+        generation = super().record_change(op, namespace, document_ids)
+        if self.hold:
+            with self._lock:
+                self.held.append(self.changes.pop())
+        return generation
+
+    def release(self):
+        with self._lock:
+            changes = sorted([*self.changes, *self.held], key=lambda change: change["generation"])
+            self.changes.clear()
+            self.changes.extend(changes)
+            self.held = []
+
+
+def records(document_id, content, embedding):
+    return [{
+        "chunk_id": f"{document_id}_chunk_0", "document_id": document_id, "document_name": document_id,
+        "content": content, "embedding": embedding, "metadata": {}, "chunk_index": 0,
+        "total_chunks": 1, "created_at": datetime.utcnow(), "namespace": "default"
+    }]
+
+
+def make_engine(vector_store):
+    # Only the cache side of the engine: no LLM or embedding model
+    engine = RAGEngine.__new__(RAGEngine)
+    engine.grounding = GroundingVerifier(None, None)
+    engine.reranker = None
+    vector_store.add_change_listener(engine._invalidate_caches)
+    return engine
+
+
+def search(vector_store):
+    return [result["chunk"] for result in vector_store.similarity_search([1.0, 0.0], min_score=-1)]
+
+
+def scores(vector_store):
+    return [round(result["score"], 3) for result in vector_store.similarity_search([1.0, 0.0], min_score=-1)]
+
+
+def test_a_reindexed_document_is_picked_up_once_the_log_has_no_gap(monkeypatch):
+    monkeypatch.delenv("INDEX_SNAPSHOT_DIR", raising=False)
+    monkeypatch.delenv("VECTOR_SEGMENT_DIR", raising=False)
+    backend = InFlightBackend()
+    backend.insert_documents([{"document_id": "a", "filename": "a", "namespace": "default"}])
+    writer, reader = VectorStore(backend), VectorStore(backend)
+    engine = make_engine(reader)
+    writer.store_chunk_records(records("a", "old text", [1.0, 0.0]))
+    reader.poll_changes()
+    [chunk] = search(reader)
+    engine.grounding.chunk_hashes(chunk)
+    assert ("a", "a_chunk_0") in engine.grounding._cache
+
+    # The compaction is numbered but not yet logged when the re-insert lands
+    backend.hold = True
+    writer.remove_document_chunks("a")
+    backend.hold = False
+    writer.store_chunk_records(records("a", "new text", [0.0, 1.0]))
+
+    # Applying the insert before the compaction would purge the new rows: wait for the gap
+    assert reader.poll_changes() == 0
+    assert scores(reader) == [1.0]
+    assert ("a", "a_chunk_0") in engine.grounding._cache
+
+    backend.release()
+    assert reader.poll_changes() == 2
+    assert scores(reader) == [0.0]
+    assert engine.grounding._cache == {}
+
+
+def test_a_change_that_never_arrives_is_skipped_after_the_gap_timeout(monkeypatch):
+    monkeypatch.delenv("INDEX_SNAPSHOT_DIR", raising=False)
+    monkeypatch.delenv("VECTOR_SEGMENT_DIR", raising=False)
+    backend = InFlightBackend()
+    backend.insert_documents([{"document_id": d, "filename": d, "namespace": "default"} for d in "abc"])
+    writer, reader, late_reader = VectorStore(backend), VectorStore(backend), VectorStore(backend)
+    engine, late_engine = make_engine(reader), make_engine(late_reader)
+    writer.store_chunk_records(records("a", "a text", [1.0, 0.0]))
+    writer.store_chunk_records(records("c", "c text", [1.0, 0.2]))
+    for vector_store, cached_engine in [(reader, engine), (late_reader, late_engine)]:
+        vector_store.poll_changes()
+        for chunk in search(vector_store):
+            cached_engine.grounding.chunk_hashes(chunk)
+
+    # The writer numbered an insert and failed before logging it
+    writer.delete_document("c")
+    backend.hold = True
+    writer.store_chunk_records(records("b", "b text", [1.0, 0.1]))
+    backend.hold = False
+    writer.delete_document("a")
+
+    assert reader.poll_changes() == 1
+    assert [chunk["chunk_id"] for chunk in search(reader)] == ["a_chunk_0"]
+    assert set(engine.grounding._cache) == {("a", "a_chunk_0")}
+
+    # Past the timeout, a gap inside the new changes is skipped...
+    monkeypatch.setattr(late_reader, "change_gap_seconds", 0)
+    assert late_reader.poll_changes() == 2
+    assert search(late_reader) == []
+    assert late_engine.grounding._cache == {}
+
+    # ...while one right after the applied generation looks like a truncated log: reload everything
+    monkeypatch.setattr(reader, "change_gap_seconds", 0)
+    assert reader.poll_changes() == 1
+    assert [chunk["chunk_id"] for chunk in search(reader)] == ["b_chunk_0"]
+    assert engine.grounding._cache == {}
@@ -0,0 +1,84 @@
+import threading
+
+from chat_history import ChatHistoryStore
+from models import ChatMessage
+from store_backends import InMemoryBackend
+
+
+class CountingBackend(InMemoryBackend):
+    """In-memory backend that counts buffer checks"""
+
+    def __init__(self):
+        super().__init__()
+        self.checks = 0
+
+    def latest_chat_seqs(self, session_id, limit):
+        self.checks += 1
+        return super().latest_chat_seqs(session_id, limit)
+
+
+def message(content):
+    return ChatMessage(role="user", content=content)
+
+
+def contents(store, session_id):
+    return [record["content"] for record in store.get_page(session_id)[0]]
+
+
+def test_buffers_are_checked_at_most_once_per_interval(monkeypatch):
+    monkeypatch.setenv("CHAT_HISTORY_CHECK_SECONDS", "3600")
+    backend = CountingBackend()
+    store = ChatHistoryStore(backend)
+    for i in range(5):
+        store.append("s", [message(str(i))])
+        store.get_page("s")
+
+    assert backend.checks == 0
+    assert contents(store, "s") == ["0", "1", "2", "3", "4"]
+
+
+def test_messages_of_another_worker_between_own_appends_are_picked_up(monkeypatch):
+    monkeypatch.setenv("CHAT_HISTORY_CHECK_SECONDS", "0")
+    backend = InMemoryBackend()
+    worker, other = ChatHistoryStore(backend), ChatHistoryStore(backend)
+    worker.append("s", [message("a")])
+    other.append("s", [message("b")])
+    monkeypatch.setattr(worker, "check_seconds", 3600)
+    worker.append("s", [message("c")])
+
+    monkeypatch.setattr(worker, "check_seconds", 0)
+    assert contents(worker, "s") == ["a", "b", "c"]
+
+
+class BlockingBackend(InMemoryBackend):
+    """In-memory backend whose writes to session "slow" wait for a release"""
+
+    def __init__(self):
+        super().__init__()
+        self.writing = threading.Event()
+        self.release = threading.Event()
+
+    def append_chat_messages(self, records):
+        if records[0]["session_id"] == "slow":
+            self.writing.set()
+            assert self.release.wait(5)
+        super().append_chat_messages(records)
+
+
+def test_a_slow_write_does_not_block_other_sessions(monkeypatch):
+    monkeypatch.setenv("CHAT_HISTORY_CHECK_SECONDS", "3600")
+    backend = BlockingBackend()
+    store = ChatHistoryStore(backend)
+    monkeypatch.setattr(store, "_session_locks", [threading.Lock() for _ in range(2)])
+    monkeypatch.setattr(store, "_session_lock", lambda session_id: store._session_locks[session_id == "slow"])
+    slow = threading.Thread(target=store.append, args=("slow", [message("a")]))
+    slow.start()
+    assert backend.writing.wait(5)
+
+    store.append("fast", [message("b")])
+    assert contents(store, "fast") == ["b"]
+    store.clear("fast")
+
+    backend.release.set()
+    slow.join(5)
+    assert contents(store, "slow") == ["a"]
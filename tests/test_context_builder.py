@@ -0,0 +1,49 @@
+from context_builder import ContextBuilder
+
+
+def result(document_id, chunk_index, content, score, start_token=None, end_token=None):
+    metadata = {} if start_token is None else {"start_token": start_token, "end_token": end_token}
+    return {
+        "chunk": {
+            "chunk_id": f"{document_id}_chunk_{chunk_index}", "document_id": document_id,
+            "document_name": f"{document_id}.txt", "chunk_index": chunk_index, "content": content,
+            "metadata": metadata
+        },
+        "score": score
+    }
+
+
+def words(prefix, count):
+    return " ".join(f"{prefix}{i}" for i in range(count))
+
+
+def test_passages_past_the_budget_are_left_out_and_not_cited():
+    builder = ContextBuilder(token_budget=1)
+    builder.token_budget = 3 * len(builder.encoding.encode(words("alpha", 20)))
+    context, citations = builder.build([
+        result("a", 0, words("alpha", 20), 0.9),
+        result("b", 0, words("beta", 200), 0.8),
+        result("c", 0, words("gamma", 10), 0.7),
+    ])
+
+    assert "alpha0" in context and "gamma0" in context and "beta0" not in context
+    assert [citation.document_name for citation in citations] == ["a.txt", "c.txt"]
+    assert len(builder.encoding.encode(context)) <= builder.token_budget
+
+
+def test_a_truncated_passage_cites_only_the_chunks_it_kept():
+    first, second, third = words("one", 60), words("two", 60), words("three", 60)
+    builder = ContextBuilder(token_budget=1)
+    # Room for the full header and the first two chunks only
+    builder.token_budget = len(builder.encoding.encode(
+        f"[Source 1] Document: a.txt, Sections: 0, 1, 2\n{first}\n{second}"
+    ))
+    context, citations = builder.build([
+        result("a", 0, first, 0.9, 0, 60),
+        result("a", 1, second, 0.8, 60, 120),
+        result("a", 2, third, 0.7, 120, 180),
+    ])
+
+    assert context.startswith("[Source 1] Document: a.txt, Sections: 0, 1\n")
+    assert "two59" in context and "three5" not in context
+    assert [citation.chunk_index for citation in citations] == [0, 1]
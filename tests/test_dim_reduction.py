@@ -0,0 +1,36 @@
+from datetime import datetime
+
+import numpy as np
+
+from store_backends import InMemoryBackend
+from vector_store import VectorStore
+
+
+def store_chunks(vector_store, count, dim=32, seed=0):
+    rng = np.random.default_rng(seed)
+    vector_store.store_chunk_records([
+        {
+            "chunk_id": f"d_chunk_{i}", "document_id": "d", "document_name": "d.txt", "content": "text",
+            "embedding": rng.standard_normal(dim).tolist(), "metadata": {}, "chunk_index": i,
+            "total_chunks": count, "created_at": datetime.utcnow()
+        }
+        for i in range(count)
+    ])
+    return rng.standard_normal(dim).tolist()
+
+
+def test_matryoshka_searches_full_embeddings_until_applied(monkeypatch):
+    monkeypatch.setenv("EMBEDDING_REDUCTION", "matryoshka")
+    monkeypatch.setenv("EMBEDDING_REDUCED_DIM", "8")
+    backend = InMemoryBackend()
+    vector_store = VectorStore(backend)
+    query = store_chunks(vector_store, 50)
+
+    assert not vector_store.reducer.active
+    assert len(vector_store.similarity_search(query, top_k=5, min_score=-1)) == 5
+
+    report = vector_store.fit_projection()
+    assert report["version"] == "matryoshka-8"
+    assert len(vector_store.similarity_search(query, top_k=5, min_score=-1)) == 5
+    # A restarted worker picks up the applied version
+    assert VectorStore(backend).reducer.version == "matryoshka-8"
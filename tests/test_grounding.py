@@ -0,0 +1,42 @@
+from grounding import GroundingVerifier
+
+RESULTS = [
+    {"chunk": {"chunk_id": "a_chunk_0", "document_id": "a", "content": (
+        "The reactor is cooled by a closed water loop. Coolant pumps run on two independent power feeds."
+    )}, "score": 0.9},
+    {"chunk": {"chunk_id": "b_chunk_0", "document_id": "b", "content": (
+        "Maintenance windows are scheduled every second Tuesday of the month."
+    )}, "score": 0.8},
+]
+
+
+def test_an_answer_copied_from_the_context_is_grounded():
+    result = GroundingVerifier().verify(
+        "The reactor is cooled by a closed water loop [Source 1]. "
+        "Maintenance windows are scheduled every second Tuesday [Source 2].",
+        RESULTS
+    )
+
+    assert result == {"score": 1.0, "sentences": 2, "supported_sentences": 2}
+
+
+def test_an_answer_the_context_does_not_support_is_not_grounded():
+    verifier = GroundingVerifier()
+    result = verifier.verify(
+        "The reactor is cooled by a closed water loop [Source 1]. "
+        "Its fuel rods are replaced by robots during the annual summer shutdown.",
+        RESULTS
+    )
+
+    assert result["sentences"] == 2 and result["supported_sentences"] == 1
+    assert result["score"] < verifier.threshold
+
+
+def test_citation_markers_are_not_scored():
+    verifier = GroundingVerifier()
+    cited = verifier.verify("Coolant pumps run on two independent power feeds [Source 1].", RESULTS)
+    uncited = verifier.verify("Coolant pumps run on two independent power feeds.", RESULTS)
+
+    assert cited == uncited == {"score": 1.0, "sentences": 1, "supported_sentences": 1}
+    assert verifier.verify("[Source 1] [Document: a.txt, Section 0]", RESULTS)["score"] is None
+    assert verifier.verify("Coolant pumps run on two independent power feeds.", [])["score"] is None
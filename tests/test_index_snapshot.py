@@ -0,0 +1,87 @@
+import json
+from datetime import datetime
+
+import numpy as np
+
+from models import ProcessingStatus
+from store_backends import InMemoryBackend
+from vector_store import VectorStore
+
+
+def records(backend, document_id, count, rng, namespace="default"):
+    backend.insert_documents([{"document_id": document_id, "filename": document_id, "namespace": namespace}])
+    return [
+        {
+            "chunk_id": f"{document_id}_chunk_{i}", "document_id": document_id, "document_name": document_id,
+            "content": "text", "embedding": rng.standard_normal(16).tolist(), "metadata": {}, "chunk_index": i,
+            "total_chunks": count, "created_at": datetime.utcnow(), "namespace": namespace
+        }
+        for i in range(count)
+    ]
+
+
+def chunk_ids(vector_store, query):
+    return [result["chunk"]["chunk_id"] for result in vector_store.similarity_search(query, top_k=100, min_score=-1)]
+
+
+def meta(tmp_path):
+    return json.loads((tmp_path / "default" / "snapshot.json").read_text())
+
+
+def test_snapshots_append_new_rows_and_skip_unrelated_changes(tmp_path, monkeypatch):
+    monkeypatch.setenv("INDEX_SNAPSHOT_DIR", str(tmp_path))
+    monkeypatch.delenv("VECTOR_SEGMENT_DIR", raising=False)
+    rng = np.random.default_rng(0)
+    backend = InMemoryBackend()
+    vector_store = VectorStore(backend)
+    query = rng.standard_normal(16).tolist()
+    vector_store.store_chunk_records(records(backend, "a", 5, rng))
+    vector_store.similarity_search(query)
+    assert vector_store.snapshot_indexes() == 1
+    first = meta(tmp_path)
+
+    # Changes elsewhere do not rewrite the snapshot
+    vector_store.store_chunk_records(records(backend, "t", 5, rng, namespace="tenant"))
+    vector_store.update_document_status("a", ProcessingStatus.COMPLETED)
+    assert vector_store.snapshot_indexes() == 0
+    assert meta(tmp_path)["id"] == first["id"]
+
+    # New rows are written as a new part, deletes only update the tombstones
+    vector_store.store_chunk_records(records(backend, "b", 3, rng))
+    vector_store.delete_document("a")
+    assert vector_store.snapshot_indexes() == 1
+    second = meta(tmp_path)
+    assert second["parts"][0] == first["parts"][0] and len(second["parts"]) == 2
+    assert second["tombstones"] == ["a"]
+
+    restored = VectorStore(backend)
+    assert restored.restore_indexes() == 1
+    assert sorted(chunk_ids(restored, query)) == sorted(chunk_ids(vector_store, query)) == [f"b_chunk_{i}" for i in range(3)]
+
+    # Compaction removes rows, so the next snapshot is rewritten as one part
+    vector_store.compact_deleted()
+    assert vector_store.snapshot_indexes() == 1
+    assert len(meta(tmp_path)["parts"]) == 1
+    assert sorted(chunk_ids(VectorStore(backend), query)) == [f"b_chunk_{i}" for i in range(3)]
+
+
+def test_only_one_worker_writes_a_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setenv("INDEX_SNAPSHOT_DIR", str(tmp_path))
+    monkeypatch.delenv("VECTOR_SEGMENT_DIR", raising=False)
+    rng = np.random.default_rng(0)
+    backend = InMemoryBackend()
+    vector_store = VectorStore(backend)
+    vector_store.store_chunk_records(records(backend, "a", 5, rng))
+    vector_store.similarity_search(rng.standard_normal(16).tolist())
+
+    (tmp_path / "default").mkdir()
+    (tmp_path / "default" / "snapshot.lock").write_text("1")
+    assert vector_store.snapshot_indexes() == 0
+    (tmp_path / "default" / "snapshot.lock").unlink()
+    assert vector_store.snapshot_indexes() == 1
+
+    # A second worker in the same state finds the snapshot already written
+    other = VectorStore(backend)
+    other.similarity_search(rng.standard_normal(16).tolist())
+    other._indexes["default"].snapshot_generation = None
+    assert other.snapshot_indexes() == 0
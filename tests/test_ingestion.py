@@ -0,0 +1,105 @@
+from ingestion import IngestionPipeline
+from models import Document, ProcessingStatus
+from store_backends import InMemoryBackend
+from vector_store import VectorStore
+
+
+class WordCountEmbedder:
+    """Embeds a text as [word count, 1]; skips blank texts like the real generators"""
+
+    def generate_embeddings_batch(self, texts):
+        texts = [text.replace("\n", " ").strip() for text in texts]
+        return [[float(len(text.split())), 1.0] for text in texts if text]
+
+
+def make_pipeline():
+    vector_store = VectorStore(InMemoryBackend())
+    return IngestionPipeline(None, WordCountEmbedder(), vector_store), vector_store
+
+
+def chunks(*texts):
+    return [(text, {"chunk_index": i, "total_chunks": len(texts)}) for i, text in enumerate(texts)]
+
+
+def test_blank_chunks_do_not_shift_vectors_of_other_documents():
+    pipeline, vector_store = make_pipeline()
+    statuses = {}
+    pipeline.ingest_processed(
+        [
+            ("a", "a.txt", chunks("   \n ")),
+            ("b", "b.txt", chunks("one two three", "  ", "four five")),
+        ],
+        on_status=lambda document_id, status, total, error: statuses.__setitem__(document_id, (status, total))
+    )
+
+    assert statuses["a"] == (ProcessingStatus.COMPLETED, 0)
+    assert statuses["b"] == (ProcessingStatus.COMPLETED, 2)
+    stored = sorted(vector_store.backend.chunks.values(), key=lambda chunk: chunk["chunk_index"])
+    assert [chunk["document_id"] for chunk in stored] == ["b", "b"]
+    assert [chunk["embedding"][0] for chunk in stored] == [3.0, 2.0]
+    assert [(chunk["chunk_index"], chunk["total_chunks"]) for chunk in stored] == [(0, 2), (1, 2)]
+
+
+def test_embedding_count_mismatch_fails_the_batch():
+    pipeline, vector_store = make_pipeline()
+    pipeline.embedding_generator.generate_embeddings_batch = lambda texts: [[1.0, 1.0]]
+    statuses = {}
+    pipeline.ingest_processed(
+        [("a", "a.txt", chunks("one", "two"))],
+        on_status=lambda document_id, status, total, error: statuses.__setitem__(document_id, status)
+    )
+
+    assert statuses["a"] == ProcessingStatus.FAILED
+    assert not vector_store.backend.chunks
+
+
+def test_reindexing_replaces_chunks_left_by_an_interrupted_run():
+    pipeline, vector_store = make_pipeline()
+    pipeline.ingest_processed([("a", "a.txt", chunks("one two", "three"))])
+    vector_store.similarity_search([1.0, 1.0], top_k=5, min_score=-1)
+
+    assert vector_store.remove_document_chunks("a") == 2
+    assert vector_store.similarity_search([1.0, 1.0], top_k=5, min_score=-1) == []
+
+    statuses = {}
+    pipeline.ingest_processed(
+        [("a", "a.txt", chunks("one two", "three"))],
+        on_status=lambda document_id, status, total, error: statuses.__setitem__(document_id, status)
+    )
+    assert statuses["a"] == ProcessingStatus.COMPLETED
+    assert len(vector_store.backend.chunks) == 2
+    assert len(vector_store.similarity_search([1.0, 1.0], top_k=5, min_score=-1)) == 2
+
+
+def test_reuploading_a_deleted_document_replaces_its_chunks():
+    pipeline, vector_store = make_pipeline()
+    record = Document(document_id="a", filename="a.txt", file_type="txt", file_size=1, status=ProcessingStatus.COMPLETED)
+    vector_store.store_document(record)
+    pipeline.ingest_processed([("a", "a.txt", chunks("one two", "three"))])
+    vector_store.similarity_search([1.0, 1.0], top_k=5, min_score=-1)
+    assert vector_store.delete_document("a")
+    assert vector_store.get_document_chunks("a") == []
+
+    vector_store.store_document(record)
+    pipeline.ingest_processed([("a", "a.txt", chunks("four five six"))])
+    assert [chunk["content"] for chunk in vector_store.get_document_chunks("a")] == ["four five six"]
+    assert len(vector_store.similarity_search([1.0, 1.0], top_k=5, min_score=-1)) == 1
+
+
+def test_a_duplicate_chunk_fails_only_its_document():
+    pipeline, vector_store = make_pipeline()
+    pipeline.insert_batch_size = 100
+    vector_store.backend.insert_chunks([{
+        "chunk_id": "b_chunk_1", "document_id": "b", "document_name": "b.txt", "content": "stale",
+        "embedding": [1.0, 1.0], "metadata": {}, "chunk_index": 1, "total_chunks": 2
+    }])
+    statuses = {}
+    pipeline.ingest_processed(
+        [("a", "a.txt", chunks("one two", "three")), ("b", "b.txt", chunks("four", "five six"))],
+        on_status=lambda document_id, status, total, error: statuses.__setitem__(document_id, status)
+    )
+
+    assert statuses == {"a": ProcessingStatus.COMPLETED, "b": ProcessingStatus.FAILED}
+    assert sorted(chunk["document_id"] for chunk in vector_store.backend.chunks.values()) == ["a", "a"]
+    results = vector_store.similarity_search([1.0, 1.0], top_k=5, min_score=-1)
+    assert sorted(result["chunk"]["chunk_id"] for result in results) == ["a_chunk_0", "a_chunk_1"]
@@ -0,0 +1,56 @@
+import threading
+
+import pytest
+
+pytest.importorskip("transformers")
+import llm_local
+from llm_local import LocalTransformersBackend
+
+
+class FakeTokenizer:
+    pad_token = "<pad>"
+
+    @classmethod
+    def from_pretrained(cls, *args, **kwargs):
+        return cls()
+
+
+class FakeModel:
+    @classmethod
+    def from_pretrained(cls, *args, **kwargs):
+        return cls()
+
+    def eval(self):
+        pass
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    monkeypatch.setattr(llm_local, "AutoTokenizer", FakeTokenizer)
+    monkeypatch.setattr(llm_local, "AutoModelForCausalLM", FakeModel)
+    monkeypatch.setenv("LLM_BATCH_WAIT_MS", "0")
+    return LocalTransformersBackend("/models/fake")
+
+
+def test_requests_after_close_fail_instead_of_blocking(backend):
+    started, release = threading.Event(), threading.Event()
+
+    def generate_batch(requests):
+        started.set()
+        release.wait(5)
+        return [request.prompt.upper() for request in requests]
+
+    backend._generate_batch = generate_batch
+    results = []
+    worker = threading.Thread(target=lambda: results.append(backend.generate("queued", 8, 0.0)))
+    worker.start()
+    assert started.wait(5)
+    backend.close()
+    release.set()
+    worker.join(5)
+
+    assert results == ["QUEUED"]
+    with pytest.raises(RuntimeError):
+        backend.generate("late", 8, 0.0)
+    backend._worker.join(5)
+    assert not backend._worker.is_alive()
@@ -0,0 +1,40 @@
+import threading
+
+from prometheus_client import REGISTRY
+
+import metrics
+from grounding import GroundingVerifier
+from metrics import record_cache_lookups
+
+
+def count(cache, result):
+    return REGISTRY.get_sample_value("rag_cache_requests_total", {"cache": cache, "result": result}) or 0
+
+
+def test_concurrent_lookups_are_all_tallied():
+    def record():
+        for _ in range(1000):
+            record_cache_lookups("test_concurrent", 1, 1)
+
+    threads = [threading.Thread(target=record) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert metrics._cache_tallies["test_concurrent"] == (8000, 16000)
+    assert count("test_concurrent", "hit") == count("test_concurrent", "miss") == 8000
+
+
+def test_grounding_checks_count_chunk_cache_hits_and_misses():
+    results = [
+        {"chunk": {"chunk_id": f"a_chunk_{i}", "document_id": "a", "content": f"Section {i} of the manual."}, "score": 0.9}
+        for i in range(3)
+    ]
+    hits, misses = count("grounding_chunks", "hit"), count("grounding_chunks", "miss")
+    verifier = GroundingVerifier()
+    verifier.verify("Section 1 of the manual says so.", results[:2])
+    verifier.verify("Section 1 of the manual says so.", results)
+
+    assert count("grounding_chunks", "hit") - hits == 2
+    assert count("grounding_chunks", "miss") - misses == 3
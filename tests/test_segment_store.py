@@ -0,0 +1,91 @@
+from datetime import datetime
+
+import numpy as np
+
+from segment_store import SegmentStore
+from store_backends import InMemoryBackend
+from vector_store import VectorStore
+
+
+def records(document_id, count, rng):
+    return [
+        {
+            "chunk_id": f"{document_id}_chunk_{i}", "document_id": document_id, "document_name": document_id,
+            "content": "text", "embedding": rng.standard_normal(16).tolist(), "metadata": {}, "chunk_index": i,
+            "total_chunks": count, "created_at": datetime.utcnow()
+        }
+        for i in range(count)
+    ]
+
+
+def search_documents(vector_store, query):
+    return {result["chunk"]["document_id"] for result in vector_store.similarity_search(query, top_k=100, min_score=-1)}
+
+
+def test_deletes_mask_mapped_rows_and_merges_rewrite_only_affected_segments(tmp_path, monkeypatch):
+    monkeypatch.setenv("VECTOR_SEGMENT_DIR", str(tmp_path))
+    monkeypatch.setenv("VECTOR_SEGMENT_MAX_SEGMENTS", "8")
+    rng = np.random.default_rng(0)
+    backend = InMemoryBackend()
+    vector_store = VectorStore(backend)
+    query = rng.standard_normal(16).tolist()
+    vector_store.similarity_search(query)
+    for document_id in ("a", "b", "c"):
+        backend.insert_documents([{"document_id": document_id, "filename": document_id}])
+        vector_store.store_chunk_records(records(document_id, 5, rng))
+
+    vector_store.delete_document("b")
+    vector_store.compact_deleted()
+    entry = vector_store._indexes["default"]
+    assert all(segment.mapped for segment in entry.index.segments)
+    assert search_documents(vector_store, query) == {"a", "c"}
+
+    untouched = [name for name in entry.segment_store.manifest["segments"] if not entry.segment_store.manifest["deleted"].get(name)]
+    assert entry.segment_store.merge_plan() == [[name] for name in entry.segment_store.manifest["segments"] if name not in untouched]
+    vector_store.merge_segments()
+    assert entry.segment_store.manifest["segments"] == untouched
+    assert entry.segment_store.manifest["deleted"] == {}
+    assert search_documents(vector_store, query) == {"a", "c"}
+
+
+def test_segments_of_another_corpus_with_the_same_row_count_are_rebuilt(tmp_path, monkeypatch):
+    monkeypatch.setenv("VECTOR_SEGMENT_DIR", str(tmp_path))
+    rng = np.random.default_rng(0)
+    query = rng.standard_normal(16).tolist()
+    first = VectorStore(InMemoryBackend())
+    first.store_chunk_records(records("old", 5, rng))
+    assert search_documents(first, query) == {"old"}
+
+    backend = InMemoryBackend()
+    backend.insert_chunks(records("new", 5, rng))
+    assert search_documents(VectorStore(backend), query) == {"new"}
+
+
+def test_tiered_merge_leaves_the_largest_segment_alone(tmp_path):
+    store = SegmentStore(str(tmp_path))
+    store.max_segments = 2
+    rng = np.random.default_rng(0)
+    for rows in (100, 3, 4, 5):
+        store.append([f"c{i}" for i in range(rows)], ["d"] * rows, rng.standard_normal((rows, 8)))
+
+    largest = store.manifest["segments"][0]
+    assert store.merge_plan() == [[store.manifest["segments"][1], store.manifest["segments"][2], store.manifest["segments"][3]]]
+    store.merge(store.merge_plan()[0])
+    assert store.manifest["segments"][0] == largest
+    assert [len(segment) for segment in store.load()] == [100, 12]
+
+
+def test_rows_reindexed_under_a_deleted_id_stay_visible(tmp_path, monkeypatch):
+    monkeypatch.setenv("VECTOR_SEGMENT_DIR", str(tmp_path))
+    rng = np.random.default_rng(0)
+    query = rng.standard_normal(16).tolist()
+    backend = InMemoryBackend()
+    vector_store = VectorStore(backend)
+    vector_store.store_chunk_records(records("a", 5, rng))
+    vector_store.similarity_search(query)
+
+    assert vector_store.remove_document_chunks("a") == 5
+    vector_store.store_chunk_records(records("a", 3, rng))
+    assert len(vector_store.similarity_search(query, top_k=100, min_score=-1)) == 3
+    vector_store.merge_segments()
+    assert len(VectorStore(backend).similarity_search(query, top_k=100, min_score=-1)) == 3
@@ -0,0 +1,15 @@
+from slow_query_log import SlowQueryLog
+from store_backends import InMemoryBackend
+
+
+def test_only_outliers_of_recent_queries_are_logged(monkeypatch):
+    monkeypatch.setenv("SLOW_QUERY_THRESHOLD_MS", "1000")
+    monkeypatch.setenv("SLOW_QUERY_PERCENTILE", "99")
+    monkeypatch.setenv("SLOW_QUERY_WINDOW", "200")
+    log = SlowQueryLog(InMemoryBackend())
+
+    # Every LLM query takes 3-4 s: above the floor, but not outliers
+    logged = [log.maybe_log("q", 5, 3000 + (i % 10) * 100, {}) for i in range(300)]
+    assert sum(logged[100:]) == 0
+    assert log.maybe_log("q", 5, 20000, {"fetch_ms": 15000.0})
+    assert not log.maybe_log("q", 5, 500, {})
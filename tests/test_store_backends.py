@@ -0,0 +1,91 @@
+from datetime import datetime
+
+import pytest
+from pymongo.errors import BulkWriteError
+
+import store_backends
+from store_backends import InMemoryBackend, MongoBackend, failed_writes
+from vector_store import VectorStore
+
+
+@pytest.fixture(params=["memory", "mongo"])
+def backend(request, monkeypatch):
+    if request.param == "memory":
+        return InMemoryBackend()
+    mongomock = pytest.importorskip("mongomock")
+    monkeypatch.setattr(store_backends, "MongoClient", mongomock.MongoClient)
+    # mongomock has no capped collections
+    monkeypatch.setattr(MongoBackend, "_capped_collection", lambda self, name, max_bytes: self.db[name])
+    return MongoBackend("mongodb://localhost")
+
+
+def document(document_id, **fields):
+    return {
+        "document_id": document_id, "filename": f"{document_id}.txt", "status": "completed",
+        "uploaded_at": datetime.utcnow(), "namespace": "default", **fields
+    }
+
+
+def test_upserting_a_deleted_document_makes_it_live_again(backend):
+    assert backend.upsert_document(document("a")) is None
+    assert backend.mark_document_deleted("a") == "default"
+    assert backend.get_document("a") is None
+
+    assert backend.upsert_document(document("a", filename="new.txt")) == "default"
+    assert backend.get_document("a")["filename"] == "new.txt"
+    assert "deleted" not in backend.get_document("a")
+    assert backend.list_deleted_documents() == []
+    assert backend.count_documents() == 1
+    assert backend.upsert_document(document("a")) is None
+
+
+def chunk(chunk_id, **fields):
+    return {
+        "chunk_id": chunk_id, "document_id": "a", "document_name": "a.txt", "content": "text",
+        "embedding": [1.0, 0.0], "metadata": {}, "chunk_index": 0, "total_chunks": 1, "namespace": "default",
+        **fields
+    }
+
+
+def test_duplicate_chunk_ids_fail_after_the_other_chunks_are_written(backend):
+    assert backend.insert_chunks([chunk("a_0")]) == 1
+    with pytest.raises(BulkWriteError) as error:
+        backend.insert_chunks([chunk("a_1"), chunk("a_0"), chunk("a_2")])
+
+    assert failed_writes(error.value) == {1}
+    assert sorted(c["chunk_id"] for c in backend.get_chunks("a")) == ["a_0", "a_1", "a_2"]
+    assert backend.count_chunks() == 3
+
+
+def test_duplicate_document_ids_fail_after_the_other_documents_are_written(backend):
+    backend.insert_documents([document("a")])
+    with pytest.raises(BulkWriteError) as error:
+        backend.insert_documents([document("a"), document("b")])
+
+    assert failed_writes(error.value) == {0}
+    assert backend.get_document("b") is not None
+    assert backend.count_documents() == 2
+
+
+def test_chunk_reads_and_deletes_stay_in_their_namespace(backend):
+    backend.insert_chunks([chunk("a_0", namespace="A"), chunk("a_1", namespace="B")])
+
+    assert [c["chunk_id"] for c in backend.get_chunks("a", "A")] == ["a_0"]
+    assert [c["chunk_id"] for c in backend.get_chunks_by_ids(["a_0", "a_1"], "B")] == ["a_1"]
+    assert backend.delete_chunks("a", namespace="A") == 1
+    assert [c["chunk_id"] for c in backend.get_chunks("a")] == ["a_1"]
+
+
+def test_search_and_chunk_fetch_in_one_namespace_never_return_another(backend):
+    vector_store = VectorStore(backend)
+    for namespace, document_id, embedding in [("A", "a", [1.0, 0.0]), ("B", "b", [0.9, 0.1])]:
+        backend.upsert_document(document(document_id, namespace=namespace))
+        vector_store.store_chunk_records([chunk(
+            f"{document_id}_0", document_id=document_id, embedding=embedding, namespace=namespace
+        )])
+
+    results = vector_store.similarity_search([1.0, 0.0], top_k=5, namespace="A")
+    assert [result["chunk"]["chunk_id"] for result in results] == ["a_0"]
+    assert vector_store.get_document_chunks("b", "A") == []
+    assert vector_store.get_chunks_by_document("b", "A") == []
+    assert [c["chunk_id"] for c in vector_store.get_document_chunks("b", "B")] == ["b_0"]
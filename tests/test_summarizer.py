@@ -0,0 +1,25 @@
+from summarizer import DocumentSummarizer
+
+
+def chunk(index, content):
+    return {"chunk_id": f"a_chunk_{index}", "chunk_index": index, "content": content, "metadata": {"token_count": 50}}
+
+
+def test_reduce_rounds_end_when_partials_exceed_the_group_budget(monkeypatch):
+    monkeypatch.setenv("SUMMARY_GROUP_TOKENS", "10")
+    prompts = []
+
+    def generate(prompt, max_new_tokens, temperature):
+        prompts.append(prompt)
+        # Every summary alone is over the group budget
+        return f"Summary number {len(prompts)} " + "padding " * 20
+
+    summarizer = DocumentSummarizer(generate, None)
+    try:
+        summary = summarizer._map_reduce("a.txt", [chunk(i, f"Chunk text {i} " * 20) for i in range(5)])
+    finally:
+        summarizer.shutdown()
+
+    # 5 map calls, reduce rounds from 5 to 3 to 2 partials, then the final reduce
+    assert len(prompts) == 5 + 3 + 2 + 1
+    assert summary.startswith(f"Summary number {len(prompts)} ")
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+import vector_index
+from vector_index import VectorIndex
+
+
+def make_index(vectors, segment_rows=1000):
+    index = VectorIndex()
+    for start in range(0, len(vectors), segment_rows):
+        stop = min(start + segment_rows, len(vectors))
+        index.add([f"c{i}" for i in range(start, stop)], [f"d{i % 50}" for i in range(start, stop)], vectors[start:stop])
+    return index
+
+
+@pytest.mark.parametrize("binary", [False, True])
+def test_sharded_scoring_matches_a_single_shard_with_a_tie_at_k(monkeypatch, binary):
+    monkeypatch.setenv("BINARY_PREFILTER", "true" if binary else "false")
+    monkeypatch.setenv("BINARY_PREFILTER_MIN_SIZE", "0")
+    monkeypatch.setenv("BINARY_RESCORE_CANDIDATES", "40")
+    monkeypatch.setenv("INDEX_SEGMENT_ROWS", "1000")
+    monkeypatch.setattr(vector_index.SCORER, "threads", 4)
+    monkeypatch.setattr(vector_index.SCORER, "min_rows", 1000)
+    rng = np.random.default_rng(0)
+    query = rng.standard_normal(16).astype(np.float32)
+    vectors = rng.standard_normal((3000, 16)).astype(np.float32)
+    # Copies of one strong match in every segment and shard: five rows tie at the k-th score
+    vectors[[5, 700, 1400, 2100, 2999]] = vectors[0] + 3 * query
+    index = make_index(vectors)
+
+    single = index.search(query, 3, min_score=-1, threads=1)
+    sharded = index.search(query, 3, min_score=-1, threads=4)
+
+    assert len({score for _, score in single}) == 1
+    assert sharded == single
+    # Ties go to the earliest rows
+    assert [chunk_id for chunk_id, _ in single] == ["c5", "c700", "c1400"]
+
+
+@pytest.mark.parametrize("binary", [False, True])
+def test_mmr_with_lambda_one_matches_plain_top_k(monkeypatch, binary):
+    monkeypatch.setenv("BINARY_PREFILTER", "true" if binary else "false")
+    monkeypatch.setenv("BINARY_PREFILTER_MIN_SIZE", "0")
+    rng = np.random.default_rng(1)
+    query = rng.standard_normal(16).astype(np.float32)
+    index = make_index(rng.standard_normal((2000, 16)).astype(np.float32))
+
+    plain = index.search(query, 10, min_score=-1)
+    assert index.search(query, 10, min_score=-1, mmr_lambda=1.0, mmr_candidates=50) == plain
+
+
+def test_mmr_skips_a_near_duplicate_of_a_selected_row():
+    query = np.array([1.0, 0.0, 0.0], dtype=np.float32)
+    index = make_index(np.array([
+        [0.9, 0.436, 0.0],
+        [0.89, 0.456, 0.0],
+        [0.8, -0.6, 0.0],
+        [0.0, 0.0, 1.0],
+    ], dtype=np.float32))
+
+    assert [chunk_id for chunk_id, _ in index.search(query, 2, min_score=-1)] == ["c0", "c1"]
+    assert [chunk_id for chunk_id, _ in index.search(query, 2, min_score=-1, mmr_lambda=0.5)] == ["c0", "c2"]